@@ -1,6 +1,7 @@
 import 'package:flutter/material.dart';
 import 'package:flutter_secure_storage/flutter_secure_storage.dart';
 import 'package:shared_preferences/shared_preferences.dart';
+import 'flaskRegUsr.dart';
 import 'theme/app_theme.dart';
 import 'widgets/gradient_header.dart';
 import 'widgets/app_card.dart';
@@ -18,6 +19,8 @@ class DeactivatedScreen extends StatelessWidget {
     // Clear local measurement cache to prevent cross-account data leakage
     final prefs = await SharedPreferences.getInstance();
     await prefs.remove('measurements');
+    await prefs.remove('readings_since');
+    FlaskRegUsr.clearEtagCache();
     await SyncService.instance.clearQueue();
     if (context.mounted) {
       Navigator.of(context).pushNamedAndRemoveUntil('/login', (route) => false);
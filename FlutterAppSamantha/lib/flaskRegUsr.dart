@@ -56,6 +56,35 @@ class FlaskRegUsr {
 
   String get baseUrl => Environment.baseUrl;
 
+  /// Last ETag and body per token and URL, so repeat GETs of readings and
+  /// the profile can be answered with 304 Not Modified.
+  static final Map<String, MapEntry<String, String>> _etagCache = {};
+
+  /// Drop cached responses (call on logout).
+  static void clearEtagCache() => _etagCache.clear();
+
+  /// GET with If-None-Match; a 304 is returned as a 200 carrying the cached body.
+  Future<http.Response> _getWithEtag(http.Client client, Uri uri, String token) async {
+    final key = "$token $uri";
+    final cached = _etagCache[key];
+    final resp = await client.get(
+      uri,
+      headers: {
+        "Content-Type": "application/json",
+        "Authorization": "Bearer $token",
+        if (cached != null) "If-None-Match": cached.key,
+      },
+    );
+    if (resp.statusCode == 304 && cached != null) {
+      return http.Response(cached.value, 200, headers: resp.headers);
+    }
+    final etag = resp.headers['etag'];
+    if (resp.statusCode == 200 && etag != null) {
+      _etagCache[key] = MapEntry(etag, resp.body);
+    }
+    return resp;
+  }
+
   /// HTTP client for union fetch — SSL bypass only in debug builds.
   http.Client get _unionClient {
     if (kDebugMode && !kIsWeb) {
@@ -259,13 +288,7 @@ class FlaskRegUsr {
       final uri = Uri.parse("$baseUrl/consumer/readings");
       dev.log("Fetching readings from $uri");
 
-      final resp = await client.get(
-        uri,
-        headers: {
-          "Content-Type": "application/json",
-          "Authorization": "Bearer $token",
-        },
-      );
+      final resp = await _getWithEtag(client, uri, token);
 
       dev.log("Readings response status: ${resp.statusCode}");
 
@@ -284,6 +307,43 @@ class FlaskRegUsr {
     }
   }
 
+  /// Fetches readings added since the watermark [since] (a previous
+  /// next_since; null for everything), following has_more.
+  /// Returns {readings, next_since}, or null on failure.
+  Future<Map<String, dynamic>?> getReadingChanges(String token, {String? since}) async {
+    final client = _unionClient;
+    try {
+      final readings = <Map<String, dynamic>>[];
+      var cursor = since;
+      while (true) {
+        final uri = Uri.parse("$baseUrl/consumer/readings/changes")
+            .replace(queryParameters: cursor != null ? {"since": cursor} : null);
+        final resp = await client.get(
+          uri,
+          headers: {
+            "Content-Type": "application/json",
+            "Authorization": "Bearer $token",
+          },
+        );
+        if (resp.statusCode != 200) {
+          dev.log("Failed to fetch reading changes: ${resp.statusCode} ${resp.body}");
+          return null;
+        }
+        final data = jsonDecode(resp.body) as Map<String, dynamic>;
+        readings.addAll((data['readings'] as List).cast<Map<String, dynamic>>());
+        cursor = data['next_since'] as String?;
+        if (data['has_more'] != true) break;
+      }
+      dev.log("Fetched ${readings.length} changed reading(s)");
+      return {'readings': readings, 'next_since': cursor};
+    } catch (e, stack) {
+      dev.log("Error fetching reading changes: $e\n$stack");
+      return null;
+    } finally {
+      client.close();
+    }
+  }
+
   /// Fetches the authenticated user's profile.
   Future<Map<String, dynamic>?> getProfile(String token) async {
     final client = _unionClient;
@@ -291,13 +351,7 @@ class FlaskRegUsr {
       final uri = Uri.parse("$baseUrl/consumer/profile");
       dev.log("Fetching profile from $uri");
 
-      final resp = await client.get(
-        uri,
-        headers: {
-          "Content-Type": "application/json",
-          "Authorization": "Bearer $token",
-        },
-      );
+      final resp = await _getWithEtag(client, uri, token);
 
       dev.log("Profile response status: ${resp.statusCode}");
 
@@ -1,11 +1,10 @@
 import 'dart:convert';
 import 'package:flutter/material.dart';
 import 'package:fl_chart/fl_chart.dart';
-import 'package:flutter_secure_storage/flutter_secure_storage.dart';
 import 'package:shared_preferences/shared_preferences.dart';
 import 'package:intl/intl.dart';
 import 'dart:developer' as dev;
-import 'flaskRegUsr.dart';
+import 'sourceManager.dart';
 import 'msg.dart';
 import 'theme/app_theme.dart';
 import 'widgets/gradient_header.dart';
@@ -75,40 +74,12 @@ class _HistoryViewState extends State<HistoryView> {
     }
   }
 
-  /// Fetch readings from the backend API and cache them locally.
+  /// Sync readings from the backend into the local cache (only readings
+  /// added since the last sync are downloaded), then return the cache.
   Future<List<String>?> _fetchFromBackend(SharedPreferences prefs) async {
-    try {
-      const storage = FlutterSecureStorage();
-      final token = await storage.read(key: 'auth_token');
-      if (token == null) return null;
-
-      final api = FlaskRegUsr();
-      final readings = await api.getReadings(token);
-      if (readings == null || readings.isEmpty) return null;
-
-      // Convert backend format to local cache format
-      final localEntries = <String>[];
-      for (final r in readings) {
-        final entry = jsonEncode({
-          'date': r['reading_date'],
-          'values': [
-            r['systolic'],
-            r['diastolic'],
-            r['heart_rate'] ?? 0,
-          ],
-          if (r['notes'] != null) 'notes': r['notes'],
-        });
-        localEntries.add(entry);
-      }
-
-      // Persist to local cache
-      await prefs.setStringList('measurements', localEntries);
-      dev.log('Fetched ${localEntries.length} readings from backend into local cache');
-      return localEntries;
-    } catch (e, stack) {
-      dev.log('Error fetching readings from backend: $e\n$stack');
-      return null;
-    }
+    await SourceManager.shared.syncMeasurementsFromBackend();
+    final stored = prefs.getStringList('measurements') ?? [];
+    return stored.isEmpty ? null : stored;
   }
 
   List<Map<DateTime, List<int>>> get _filteredMeasurements {
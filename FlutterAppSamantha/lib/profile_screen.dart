@@ -304,6 +304,8 @@ class _ProfileScreenState extends State<ProfileScreen> {
     // Clear local measurement cache to prevent cross-account data leakage
     final prefs = await SharedPreferences.getInstance();
     await prefs.remove('measurements');
+    await prefs.remove('readings_since');
+    FlaskRegUsr.clearEtagCache();
     await SyncService.instance.clearQueue();
     // Keep userEmail for autofill on next login
     if (mounted) {
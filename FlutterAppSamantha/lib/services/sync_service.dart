@@ -36,6 +36,9 @@ class SyncService extends ChangeNotifier {
 
   String get baseUrl => Environment.baseUrl;
 
+  /// Readings per POST /consumer/readings/batch request (server max is 500)
+  static const int _batchSize = 200;
+
   SyncService._();
 
   static SyncService get instance {
@@ -185,13 +188,24 @@ class SyncService extends ChangeNotifier {
           continue;
         }
 
-        // Sync each reading
-        for (final reading in readings) {
-          final success = await _syncSingleReading(reading, token);
-          if (success) {
-            synced++;
-          } else {
-            failed++;
+        // Upload in batches; fall back to one request per reading if the
+        // server doesn't support the batch endpoint
+        for (var start = 0; start < readings.length; start += _batchSize) {
+          final chunk = readings.sublist(
+              start, (start + _batchSize).clamp(0, readings.length));
+          final result = await _syncBatch(chunk, token);
+          if (result != null) {
+            synced += result.synced;
+            failed += result.failed;
+            continue;
+          }
+          for (final reading in chunk) {
+            final success = await _syncSingleReading(reading, token);
+            if (success) {
+              synced++;
+            } else {
+              failed++;
+            }
           }
         }
       }
@@ -221,17 +235,79 @@ class SyncService extends ChangeNotifier {
     return token;
   }
 
-  Future<bool> _syncSingleReading(QueuedReading reading, String token) async {
-    final client = _httpClient;
-
-    try {
-      final payload = jsonEncode({
+  Map<String, dynamic> _readingPayload(QueuedReading reading) => {
         "systolic": reading.systolic,
         "diastolic": reading.diastolic,
         "heartRate": reading.heartRate,
         "readingDate": reading.readingDate.toIso8601String(),
         if (reading.notes != null) "notes": reading.notes,
-      });
+      };
+
+  /// Upload readings with POST /consumer/readings/batch.
+  /// Returns null if the batch endpoint is unavailable (older backend).
+  Future<SyncResult?> _syncBatch(List<QueuedReading> readings, String token) async {
+    final client = _httpClient;
+
+    try {
+      final uri = Uri.parse("$baseUrl/consumer/readings/batch");
+
+      final resp = await client.post(
+        uri,
+        headers: {
+          "Content-Type": "application/json",
+          "Authorization": "Bearer $token",
+        },
+        body: jsonEncode({"readings": readings.map(_readingPayload).toList()}),
+      ).timeout(const Duration(seconds: 30));
+
+      if (resp.statusCode == 404 || resp.statusCode == 405) {
+        return null;
+      }
+
+      if (resp.statusCode != 200) {
+        for (final reading in readings) {
+          await _queue.markFailed(reading.id!, 'HTTP ${resp.statusCode}: ${resp.body}');
+        }
+        dev.log('Failed to sync batch of ${readings.length}: ${resp.statusCode}');
+        return SyncResult(synced: 0, failed: readings.length, skipped: 0);
+      }
+
+      final results = (jsonDecode(resp.body)['results'] as List).cast<Map<String, dynamic>>();
+      int synced = 0;
+      int failed = 0;
+      for (final result in results) {
+        final reading = readings[result['index'] as int];
+        if (result['status'] == 'invalid') {
+          await _queue.markFailed(reading.id!, 'Invalid: ${result['errors']}');
+          failed++;
+        } else {
+          // created, or already on the server (duplicate)
+          await _queue.markSynced(reading.id!);
+          synced++;
+        }
+      }
+      dev.log('Synced batch: $synced synced, $failed failed');
+      return SyncResult(synced: synced, failed: failed, skipped: 0);
+    } on TimeoutException {
+      for (final reading in readings) {
+        await _queue.markFailed(reading.id!, 'Request timed out');
+      }
+      return SyncResult(synced: 0, failed: readings.length, skipped: 0);
+    } catch (e) {
+      for (final reading in readings) {
+        await _queue.markFailed(reading.id!, e.toString());
+      }
+      return SyncResult(synced: 0, failed: readings.length, skipped: 0);
+    } finally {
+      client.close();
+    }
+  }
+
+  Future<bool> _syncSingleReading(QueuedReading reading, String token) async {
+    final client = _httpClient;
+
+    try {
+      final payload = jsonEncode(_readingPayload(reading));
 
       final uri = Uri.parse("$baseUrl/consumer/readings");
 
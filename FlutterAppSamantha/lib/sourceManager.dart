@@ -537,21 +537,23 @@ class SourceManager extends ChangeNotifier {
   //------------------------------------------------------
   /// Fetch this user's readings from the backend and sync into local cache.
   /// Call after login / MFA verify so recent-measurements are up to date.
+  /// Only readings added since the stored watermark (readings_since) are
+  /// downloaded and merged; an empty local cache triggers a full sync.
+  /// The server re-sends a few minutes of overlap behind the watermark;
+  /// writeMeasurementsToDefaults drops the readings already cached.
   Future<void> syncMeasurementsFromBackend() async {
     try {
       const storage = FlutterSecureStorage();
       final token = await storage.read(key: 'auth_token');
       if (token == null) return;
 
+      final stored = sharedPrefs.getStringList('measurements') ?? [];
+      final since = stored.isEmpty ? null : sharedPrefs.getString('readings_since');
+
       final api = FlaskRegUsr();
-      final readings = await api.getReadings(token);
-      if (readings == null || readings.isEmpty) {
-        // Clear stale local data from a different account
-        sharedMeasurements = [];
-        await sharedPrefs.setStringList('measurements', []);
-        dev.log('🔹 No backend readings — cleared local measurements');
-        return;
-      }
+      final changes = await api.getReadingChanges(token, since: since);
+      if (changes == null) return;
+      final readings = changes['readings'] as List<Map<String, dynamic>>;
 
       final localEntries = <String>[];
       final parsed = <Map<DateTime, List<int>>>[];
@@ -565,14 +567,31 @@ class SourceManager extends ChangeNotifier {
           r['diastolic'] as int? ?? 0,
           r['heart_rate'] as int? ?? 0,
         ];
-        localEntries.add(jsonEncode({'date': date.toIso8601String(), 'values': values}));
+        localEntries.add(jsonEncode({
+          'date': date.toIso8601String(),
+          'values': values,
+          if (r['notes'] != null) 'notes': r['notes'],
+        }));
         parsed.add({date: values});
       }
 
-      parsed.sort((a, b) => b.keys.first.compareTo(a.keys.first));
-      sharedMeasurements = parsed;
-      await sharedPrefs.setStringList('measurements', localEntries);
-      dev.log('🔹 Synced ${parsed.length} measurements from backend');
+      if (since == null) {
+        // Full sync replaces the cache, clearing stale data from another account
+        parsed.sort((a, b) => b.keys.first.compareTo(a.keys.first));
+        sharedMeasurements = parsed;
+        await sharedPrefs.setStringList('measurements', localEntries);
+        dev.log('🔹 Synced ${parsed.length} measurements from backend');
+      } else if (parsed.isNotEmpty) {
+        await writeMeasurementsToDefaults(parsed);
+        dev.log('🔹 Merged ${parsed.length} new measurements from backend');
+      } else {
+        dev.log('🔹 Measurements already up to date');
+      }
+
+      final nextSince = changes['next_since'] as String?;
+      if (nextSince != null) {
+        await sharedPrefs.setString('readings_since', nextSince);
+      }
     } catch (e) {
       dev.log('⚠️ syncMeasurementsFromBackend error: $e');
     }
@@ -1,3 +1,4 @@
+import { useState, useCallback } from 'react'
 import styles from './Pagination.module.css'
 
 export default function Pagination({ offset, limit, total, onChange }) {
@@ -52,3 +53,58 @@ export default function Pagination({ offset, limit, total, onChange }) {
     </div>
   )
 }
+
+// Cursor (keyset) paging. List endpoints return next_cursor instead of
+// supporting page jumps, so remember the cursor of every page visited to
+// allow going back. An empty cursor asks for the first page.
+export function useCursorPages() {
+  const [cursors, setCursors] = useState([''])
+  const [nextCursor, setNextCursor] = useState(null)
+
+  const next = useCallback(() => {
+    if (nextCursor) setCursors(prev => [...prev, nextCursor])
+  }, [nextCursor])
+  const prev = useCallback(() => setCursors(c => (c.length > 1 ? c.slice(0, -1) : c)), [])
+  const reset = useCallback(() => setCursors(c => (c.length === 1 ? c : [''])), [])
+
+  return {
+    cursor: cursors[cursors.length - 1],
+    pageIndex: cursors.length - 1,
+    hasNext: Boolean(nextCursor),
+    setNextCursor,
+    next,
+    prev,
+    reset,
+  }
+}
+
+export function CursorPagination({ pages, limit, count, total, estimate = false }) {
+  const startItem = count > 0 ? pages.pageIndex * limit + 1 : 0
+  const endItem = pages.pageIndex * limit + count
+
+  if (pages.pageIndex === 0 && !pages.hasNext) {
+    return (
+      <div className={styles.pagination}>
+        <span className={styles.info}>
+          {count > 0 ? `1-${count} of ${count}` : 'No results'}
+        </span>
+      </div>
+    )
+  }
+
+  return (
+    <div className={styles.pagination}>
+      <span className={styles.info}>
+        {startItem}-{endItem}{total != null ? ` of ${estimate ? 'up to ' : ''}${total.toLocaleString()}` : ''}
+      </span>
+      <div className={styles.btns}>
+        <button className={styles.pageBtn} onClick={pages.prev} disabled={pages.pageIndex === 0}>
+          Previous
+        </button>
+        <button className={styles.pageBtn} onClick={pages.next} disabled={!pages.hasNext}>
+          Next
+        </button>
+      </div>
+    </div>
+  )
+}
@@ -8,6 +8,8 @@ import SearchInput from '../components/shared/SearchInput'
 import ExportButton from '../components/shared/ExportButton'
 import styles from './CallReports.module.css'
 
+const PAGE_SIZE = 100
+
 const OUTCOME_COLORS = {
   completed: { bg: '#e8f5e9', color: '#2e7d32' },
   left_vm: { bg: '#fff3e0', color: '#e65100' },
@@ -45,6 +47,9 @@ export default function CallReports() {
   const [filteredAttempts, setFilteredAttempts] = useState([])
   const [summary, setSummary] = useState({ total_all: 0, total_week: 0, by_outcome: {} })
   const [loading, setLoading] = useState(true)
+  const [nextCursor, setNextCursor] = useState(null)
+  const [totalCount, setTotalCount] = useState(0)
+  const [loadingMore, setLoadingMore] = useState(false)
 
   // Filters
   const [dateFrom, setDateFrom] = useState('')
@@ -53,17 +58,24 @@ export default function CallReports() {
   const [outcomeFilter, setOutcomeFilter] = useState([])
   const [patientSearch, setPatientSearch] = useState('')
 
+  function filterParams() {
+    const params = new URLSearchParams()
+    if (dateFrom) params.set('date_from', dateFrom)
+    if (dateTo) params.set('date_to', dateTo)
+    if (listTypeFilter.length) params.set('list_type', listTypeFilter.join(','))
+    if (outcomeFilter.length) params.set('outcome', outcomeFilter.join(','))
+    return params
+  }
+
   async function loadData() {
     setLoading(true)
     try {
-      const params = new URLSearchParams()
-      if (dateFrom) params.set('date_from', dateFrom)
-      if (dateTo) params.set('date_to', dateTo)
-      if (listTypeFilter.length === 1) params.set('list_type', listTypeFilter[0])
-      if (outcomeFilter.length === 1) params.set('outcome', outcomeFilter[0])
-
+      const params = filterParams()
+      params.set('limit', PAGE_SIZE)
       const data = await fetchApi(`/admin/call-reports?${params.toString()}`)
       setAttempts(data.attempts || [])
+      setNextCursor(data.next_cursor || null)
+      setTotalCount(data.total_count || 0)
       setSummary(data.summary || { total_all: 0, total_week: 0, by_outcome: {} })
     } catch {
       // fail gracefully
@@ -72,11 +84,28 @@ export default function CallReports() {
     }
   }
 
+  async function loadMore() {
+    if (!nextCursor) return
+    setLoadingMore(true)
+    try {
+      const params = filterParams()
+      params.set('limit', PAGE_SIZE)
+      params.set('cursor', nextCursor)
+      const data = await fetchApi(`/admin/call-reports?${params.toString()}`)
+      setAttempts(prev => [...prev, ...(data.attempts || [])])
+      setNextCursor(data.next_cursor || null)
+    } catch {
+      // fail gracefully
+    } finally {
+      setLoadingMore(false)
+    }
+  }
+
   useEffect(() => {
     loadData()
   }, [dateFrom, dateTo, listTypeFilter, outcomeFilter])
 
-  // Client-side filter for patient name search and multi-select filters
+  // Client-side filter for patient name search over the loaded pages
   useEffect(() => {
     let filtered = attempts
 
@@ -87,16 +116,8 @@ export default function CallReports() {
       )
     }
 
-    if (listTypeFilter.length > 1) {
-      filtered = filtered.filter(a => listTypeFilter.includes(a.list_type))
-    }
-
-    if (outcomeFilter.length > 1) {
-      filtered = filtered.filter(a => outcomeFilter.includes(a.outcome))
-    }
-
     setFilteredAttempts(filtered)
-  }, [attempts, patientSearch, listTypeFilter, outcomeFilter])
+  }, [attempts, patientSearch])
 
   function handleClear() {
     setDateFrom('')
@@ -198,7 +219,9 @@ export default function CallReports() {
       {/* Table */}
       <div className={styles.tableCard}>
         <div className={styles.tableHeader}>
-          <span className={styles.tableTitle}>Call Attempts ({filteredAttempts.length})</span>
+          <span className={styles.tableTitle}>
+            Call Attempts ({patientSearch ? filteredAttempts.length : `${attempts.length} of ${totalCount}`})
+          </span>
         </div>
         <table className={styles.table}>
           <thead>
@@ -250,6 +273,13 @@ export default function CallReports() {
             )}
           </tbody>
         </table>
+        {nextCursor && (
+          <div className={styles.loadMore}>
+            <button className={styles.clearBtn} onClick={loadMore} disabled={loadingMore}>
+              {loadingMore ? 'Loading...' : 'Load more'}
+            </button>
+          </div>
+        )}
       </div>
     </>
   )
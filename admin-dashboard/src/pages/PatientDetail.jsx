@@ -5,7 +5,7 @@ import { fetchApi } from '../api/client'
 import Header from '../components/layout/Header'
 import BpCategoryBadge from '../components/shared/BpCategoryBadge'
 import Badge from '../components/shared/Badge'
-import Pagination from '../components/shared/Pagination'
+import { CursorPagination, useCursorPages } from '../components/shared/Pagination'
 import Modal from '../components/shared/Modal'
 import { classifyBP } from '../utils/bpCategory'
 import styles from './PatientDetail.module.css'
@@ -47,7 +47,7 @@ export default function PatientDetail() {
   const [chartReadings, setChartReadings] = useState([])
   const [notes, setNotes] = useState([])
   const [callHistory, setCallHistory] = useState([])
-  const [readingOffset, setReadingOffset] = useState(0)
+  const readingPages = useCursorPages()
   const [totalReadings, setTotalReadings] = useState(0)
   const [noteText, setNoteText] = useState('')
   const [loading, setLoading] = useState(true)
@@ -61,14 +61,16 @@ export default function PatientDetail() {
     try {
       const [userData, readingsData, chartData] = await Promise.all([
         fetchApi(`/admin/users/${id}`),
-        fetchApi(`/admin/readings?user_id=${id}&limit=${readingLimit}&offset=${readingOffset}`),
-        fetchApi(`/admin/readings?user_id=${id}&limit=200&offset=0`),
+        fetchApi(`/admin/readings?user_id=${id}&limit=${readingLimit}&cursor=${encodeURIComponent(readingPages.cursor)}`),
+        fetchApi(`/admin/readings?user_id=${id}&limit=200&offset=0&include_total=false`),
       ])
 
       setUser(userData.user || userData)
       const rList = readingsData.readings || readingsData || []
       setReadings(rList)
-      setTotalReadings(readingsData.total_count ?? rList.length)
+      readingPages.setNextCursor(readingsData.next_cursor ?? null)
+      // Only the first page of a cursor walk carries the total
+      if (readingsData.total_count != null) setTotalReadings(readingsData.total_count)
 
       // Full chart data (up to 200 readings)
       const cList = chartData.readings || chartData || []
@@ -97,9 +99,13 @@ export default function PatientDetail() {
     }
   }
 
+  useEffect(() => {
+    readingPages.reset()
+  }, [id])
+
   useEffect(() => {
     loadData()
-  }, [id, readingOffset])
+  }, [id, readingPages.cursor])
 
   async function handleAddNote() {
     if (!noteText.trim()) return
@@ -431,7 +437,7 @@ export default function PatientDetail() {
               )}
             </tbody>
           </table>
-          <Pagination offset={readingOffset} limit={readingLimit} total={totalReadings} onChange={setReadingOffset} />
+          <CursorPagination pages={readingPages} limit={readingLimit} count={readings.length} total={totalReadings} />
         </div>
 
         <div className={styles.card}>
@@ -3,7 +3,7 @@ import { Link, useSearchParams } from 'react-router-dom'
 import { fetchApi } from '../api/client'
 import Header from '../components/layout/Header'
 import BpCategoryBadge from '../components/shared/BpCategoryBadge'
-import Pagination from '../components/shared/Pagination'
+import { CursorPagination, useCursorPages } from '../components/shared/Pagination'
 import MultiSelectDropdown from '../components/shared/MultiSelectDropdown'
 import DateRangeFilter from '../components/shared/DateRangeFilter'
 import RangeFilter from '../components/shared/RangeFilter'
@@ -21,7 +21,7 @@ export default function Readings() {
   const [userSearch, setUserSearch] = useState('')
   const [fromDate, setFromDate] = useState('')
   const [toDate, setToDate] = useState('')
-  const [offset, setOffset] = useState(0)
+  const pages = useCursorPages()
   const [loading, setLoading] = useState(true)
 
   // Multi-select filters
@@ -40,11 +40,12 @@ export default function Readings() {
   const [sortOrder, setSortOrder] = useState('desc')
 
   const limit = 15
+  const offset = pages.pageIndex * limit
 
   async function loadReadings() {
     setLoading(true)
     try {
-      const params = new URLSearchParams({ limit, offset, sort_by: sortBy, sort_order: sortOrder })
+      const params = new URLSearchParams({ limit, cursor: pages.cursor, sort_by: sortBy, sort_order: sortOrder })
       if (userSearch) params.set('user_search', userSearch)
       if (fromDate) params.set('from_date', fromDate)
       if (toDate) params.set('to_date', toDate)
@@ -58,7 +59,9 @@ export default function Readings() {
       const data = await fetchApi(`/admin/readings?${params}`)
       const list = data.readings || data || []
       setReadings(list)
-      setTotalCount(data.total_count ?? list.length)
+      pages.setNextCursor(data.next_cursor ?? null)
+      // Only the first page of a cursor walk carries the total
+      if (data.total_count != null) setTotalCount(data.total_count)
     } catch {
       setReadings([])
     } finally {
@@ -68,7 +71,7 @@ export default function Readings() {
 
   useEffect(() => {
     loadReadings()
-  }, [offset, sortBy, sortOrder, bpCategoryFilter, unionFilter, fromDate, toDate, systolicMin, systolicMax, diastolicMin, diastolicMax])
+  }, [pages.cursor, sortBy, sortOrder, bpCategoryFilter, unionFilter, fromDate, toDate, systolicMin, systolicMax, diastolicMin, diastolicMax])
 
   // Load unions for filter dropdown
   useEffect(() => {
@@ -88,7 +91,7 @@ export default function Readings() {
 
   function handleSearchChange(val) {
     setUserSearch(val)
-    setOffset(0)
+    pages.reset()
     loadReadings()
   }
 
@@ -102,7 +105,7 @@ export default function Readings() {
     setSystolicMax(null)
     setDiastolicMin(null)
     setDiastolicMax(null)
-    setOffset(0)
+    pages.reset()
     setSortBy('reading_date')
     setSortOrder('desc')
   }
@@ -114,7 +117,7 @@ export default function Readings() {
       setSortBy(col)
       setSortOrder('asc')
     }
-    setOffset(0)
+    pages.reset()
   }
 
   function sortArrow(col) {
@@ -180,27 +183,27 @@ export default function Readings() {
           label="Date Range"
           fromDate={fromDate}
           toDate={toDate}
-          onChange={(from, to) => { setFromDate(from); setToDate(to); setOffset(0) }}
+          onChange={(from, to) => { setFromDate(from); setToDate(to); pages.reset() }}
         />
         <MultiSelectDropdown
           label="HTN Category"
           options={HTN_CATEGORY_OPTIONS}
           selected={bpCategoryFilter}
-          onChange={(v) => { setBpCategoryFilter(v); setOffset(0) }}
+          onChange={(v) => { setBpCategoryFilter(v); pages.reset() }}
         />
         {unionOptions.length > 0 && (
           <MultiSelectDropdown
             label="Union"
             options={unionOptions}
             selected={unionFilter}
-            onChange={(v) => { setUnionFilter(v); setOffset(0) }}
+            onChange={(v) => { setUnionFilter(v); pages.reset() }}
           />
         )}
         <RangeFilter
           label="Systolic"
           minValue={systolicMin}
           maxValue={systolicMax}
-          onChange={(min, max) => { setSystolicMin(min); setSystolicMax(max); setOffset(0) }}
+          onChange={(min, max) => { setSystolicMin(min); setSystolicMax(max); pages.reset() }}
           minPlaceholder="60"
           maxPlaceholder="200"
         />
@@ -208,7 +211,7 @@ export default function Readings() {
           label="Diastolic"
           minValue={diastolicMin}
           maxValue={diastolicMax}
-          onChange={(min, max) => { setDiastolicMin(min); setDiastolicMax(max); setOffset(0) }}
+          onChange={(min, max) => { setDiastolicMin(min); setDiastolicMax(max); pages.reset() }}
           minPlaceholder="40"
           maxPlaceholder="120"
         />
@@ -283,7 +286,7 @@ export default function Readings() {
                 )}
               </tbody>
             </table>
-            <Pagination offset={offset} limit={limit} total={totalCount} onChange={setOffset} />
+            <CursorPagination pages={pages} limit={limit} count={readings.length} total={totalCount} />
           </>
         )}
       </div>
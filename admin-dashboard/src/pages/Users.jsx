@@ -3,13 +3,15 @@ import { Link, useSearchParams, useNavigate } from 'react-router-dom'
 import { fetchApi } from '../api/client'
 import Header from '../components/layout/Header'
 import Badge from '../components/shared/Badge'
-import Pagination from '../components/shared/Pagination'
+import { CursorPagination, useCursorPages } from '../components/shared/Pagination'
 import Modal from '../components/shared/Modal'
 import SearchInput from '../components/shared/SearchInput'
 import BulkSelectionBar from '../components/shared/BulkSelectionBar'
 import ExportButton from '../components/shared/ExportButton'
 import styles from './Users.module.css'
 
+const MIN_SEARCH_LENGTH = 3
+
 const TABS = [
   { key: 'all', label: 'All Users', color: null },
   { key: 'active', label: 'Active', color: 'green' },
@@ -43,10 +45,12 @@ export default function Users() {
   const [searchParams] = useSearchParams()
   const [users, setUsers] = useState([])
   const [totalCount, setTotalCount] = useState(0)
+  // Long name/email searches only count index candidates
+  const [totalIsEstimate, setTotalIsEstimate] = useState(false)
   const [tabCounts, setTabCounts] = useState({})
   const [activeTab, setActiveTab] = useState(searchParams.get('tab') || 'all')
   const [search, setSearch] = useState('')
-  const [page, setPage] = useState(1)
+  const pages = useCursorPages()
   const [loading, setLoading] = useState(true)
   const [error, setError] = useState(null)
   const [modal, setModal] = useState(null)
@@ -81,30 +85,36 @@ export default function Users() {
     setError(null)
     try {
       const params = new URLSearchParams({
-        page,
+        cursor: pages.cursor,
         per_page: perPage,
         sort: sortBy,
         dir: sortDir,
       })
-      if (searchVal) params.set('search', searchVal)
+      // The search index needs at least MIN_SEARCH_LENGTH characters
+      if (searchVal && searchVal.trim().length >= MIN_SEARCH_LENGTH) params.set('search', searchVal)
       if (unionFilter) params.set('union_id', unionFilter)
       if (genderFilter) params.set('gender', genderFilter)
       if (htnFilter) params.set('has_htn', htnFilter)
 
       const data = await fetchApi(`/admin/users/tab/${activeTab}?${params}`)
       setUsers(data.users || [])
-      setTotalCount(data.total || 0)
+      pages.setNextCursor(data.next_cursor ?? null)
+      // Only the first page of a cursor walk carries the total
+      if (data.total != null) {
+        setTotalCount(data.total)
+        setTotalIsEstimate(Boolean(data.total_is_estimate))
+      }
     } catch (err) {
       setError(err.message || 'Failed to load users')
       setUsers([])
     } finally {
       setLoading(false)
     }
-  }, [activeTab, page, sortBy, sortDir, unionFilter, genderFilter, htnFilter])
+  }, [activeTab, pages.cursor, sortBy, sortDir, unionFilter, genderFilter, htnFilter])
 
   useEffect(() => {
     loadUsers(search)
-  }, [activeTab, page, sortBy, sortDir, unionFilter, genderFilter, htnFilter])
+  }, [activeTab, pages.cursor, sortBy, sortDir, unionFilter, genderFilter, htnFilter])
 
   useEffect(() => {
     loadTabCounts()
@@ -119,13 +129,13 @@ export default function Users() {
 
   function handleTabChange(tab) {
     setActiveTab(tab)
-    setPage(1)
+    pages.reset()
     setSelectedIds(new Set())
   }
 
   function handleSearchChange(val) {
     setSearch(val)
-    setPage(1)
+    pages.reset()
     loadUsers(val)
   }
 
@@ -136,7 +146,7 @@ export default function Users() {
       setSortBy(col)
       setSortDir('asc')
     }
-    setPage(1)
+    pages.reset()
   }
 
   function sortArrow(col) {
@@ -261,9 +271,6 @@ export default function Users() {
     })
   }
 
-  // Convert page-based to offset-based for Pagination component
-  const offset = (page - 1) * perPage
-
   return (
     <>
       <Header title="User Management" />
@@ -297,7 +304,7 @@ export default function Users() {
         <div className={styles.filterGroup}>
           <select
             value={unionFilter}
-            onChange={(e) => { setUnionFilter(e.target.value); setPage(1) }}
+            onChange={(e) => { setUnionFilter(e.target.value); pages.reset() }}
             className={styles.select}
           >
             <option value="">All Unions</option>
@@ -308,7 +315,7 @@ export default function Users() {
 
           <select
             value={genderFilter}
-            onChange={(e) => { setGenderFilter(e.target.value); setPage(1) }}
+            onChange={(e) => { setGenderFilter(e.target.value); pages.reset() }}
             className={styles.select}
           >
             <option value="">All Genders</option>
@@ -319,7 +326,7 @@ export default function Users() {
 
           <select
             value={htnFilter}
-            onChange={(e) => { setHtnFilter(e.target.value); setPage(1) }}
+            onChange={(e) => { setHtnFilter(e.target.value); pages.reset() }}
             className={styles.select}
           >
             <option value="">Has HTN: All</option>
@@ -329,7 +336,7 @@ export default function Users() {
         </div>
 
         <span className={styles.resultCount}>
-          {totalCount} user{totalCount !== 1 ? 's' : ''}
+          {totalIsEstimate ? 'up to ' : ''}{totalCount} user{totalCount !== 1 ? 's' : ''}
         </span>
         <ExportButton onClick={handleExport} label="Export CSV" />
       </div>
@@ -424,12 +431,7 @@ export default function Users() {
                 )}
               </tbody>
             </table>
-            <Pagination
-              offset={offset}
-              limit={perPage}
-              total={totalCount}
-              onChange={(newOffset) => setPage(Math.floor(newOffset / perPage) + 1)}
-            />
+            <CursorPagination pages={pages} limit={perPage} count={users.length} total={totalCount} estimate={totalIsEstimate} />
           </>
         )}
       </div>
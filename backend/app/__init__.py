@@ -1,5 +1,6 @@
 import os
 import logging
+import click
 from flask import Flask, request, redirect
 from flask_sqlalchemy import SQLAlchemy
 from flask_migrate import Migrate
@@ -111,6 +112,10 @@ def create_app(config_name=None):
     from app.utils.audit_logger import setup_audit_logging
     setup_audit_logging(app)
 
+    # Request-scoped decrypted PHI memo, cleared on teardown
+    from app.utils.phi_cache import init_phi_cache
+    init_phi_cache(app)
+
     # Register blueprints
     from app.routes.consumer import consumer_bp
     from app.routes.admin import admin_bp
@@ -144,8 +149,192 @@ def create_app(config_name=None):
     @app.cli.command('cleanup-rate-limits')
     def cleanup_rate_limits():
         """Remove rate limit entries older than 5 minutes."""
-        from app.models.rate_limit_entry import RateLimitEntry
-        count = RateLimitEntry.cleanup_older_than(300)
-        print(f'Removed {count} old rate limit entry/entries.')
+        from app.utils.rate_limiter import get_backend
+        backend = get_backend()
+        count = backend.cleanup(300)
+        print(f'Removed {count} old rate limit entry/entries ({backend.name} backend).')
+
+    @app.cli.command('cleanup-export-jobs')
+    def cleanup_export_jobs_command():
+        """Fail abandoned export jobs and remove jobs and artifacts older than EXPORT_JOB_RETENTION_HOURS."""
+        from app.utils.export_jobs import cleanup_export_jobs, reap_stale_jobs
+        failed, _ = reap_stale_jobs(requeue=False)
+        print(f'Marked {failed} abandoned export job(s) failed.')
+        count = cleanup_export_jobs()
+        print(f'Removed {count} old export job(s).')
+
+    @app.cli.command('export-patient-pdfs')
+    @click.option('--user-id', 'user_ids', type=int, multiple=True, help='Patient id (repeatable)')
+    @click.option('--call-list', help='Every patient with an open item on this list (nurse, coach, no_reading)')
+    @click.option('--status', help='Users export status filter (pending, approved, deactivated)')
+    @click.option('--union-id', help='Comma-separated union ids')
+    @click.option('--output', '-o', required=True, help='ZIP file to write')
+    @click.option('--workers', type=int, default=None, help='Render processes (default PDF_WORKERS)')
+    def export_patient_pdfs(user_ids, call_list, status, union_id, output, workers):
+        """Write a ZIP of patient PDF reports."""
+        from app.routes.admin.exports import _bulk_pdf_user_ids
+        from app.utils.audit_logger import audit_log
+        from app.utils.export import iter_patient_pdfs_zip
+        if user_ids:
+            params = {'user_ids': list(user_ids)}
+        elif call_list:
+            params = {'call_list': call_list}
+        else:
+            params = {k: v for k, v in (('status', status), ('union_id', union_id)) if v}
+        ids = _bulk_pdf_user_ids(params)
+        if not ids:
+            print('No patients match the selection.')
+            return
+        with open(output, 'wb') as out:
+            for chunk in iter_patient_pdfs_zip(ids, workers=workers):
+                out.write(chunk)
+        audit_log('EXPORT', 'patient_pdf_bulk', details={'count': len(ids), 'user_ids': ids,
+                                                         'output': output}, user_id='cli')
+        print(f'Wrote {len(ids)} report(s) to {output}.')
+
+    @app.cli.command('rebuild-search-index')
+    def rebuild_search_index():
+        """Backfill the blind search index for every user's name and email."""
+        from app.models.user import User
+        indexed = 0
+        failed = 0
+        last_id = 0
+        while True:
+            batch = (User.query.filter(User.id > last_id)
+                     .order_by(User.id).limit(200).all())
+            if not batch:
+                break
+            for user in batch:
+                try:
+                    user._reindex_search_field('name', user.name)
+                    user._reindex_search_field('email', user.email)
+                    indexed += 1
+                except Exception:
+                    failed += 1
+            last_id = batch[-1].id
+            db.session.commit()
+        print(f'Indexed {indexed} user(s), {failed} could not be decrypted.')
+
+    @app.cli.command('rebuild-reading-stats')
+    def rebuild_reading_stats():
+        """Recompute the per-user reading rollup from the readings table."""
+        from app.models.user_reading_stats import UserReadingStats
+        count = UserReadingStats.rebuild()
+        db.session.commit()
+        print(f'Rebuilt reading stats for {count} user(s).')
+
+    @app.cli.command('refresh-reading-stats')
+    def refresh_reading_stats():
+        """Recompute rollup rows whose 7/30-day windows have aged out (suitable for cron)."""
+        from app.models.user_reading_stats import UserReadingStats
+        count = UserReadingStats.refresh_stale()
+        db.session.commit()
+        print(f'Refreshed reading stats for {count} user(s).')
+
+    @app.cli.command('refresh-call-list')
+    def refresh_call_list_command():
+        """Re-score users whose call list assignment is due (cooldowns, aged-out readings)."""
+        from app.utils.call_list import refresh_call_list
+        evaluated, created = refresh_call_list()
+        print(f'Evaluated {evaluated} user(s), created {created} call list item(s).')
+
+    @app.cli.command('rebuild-call-list')
+    def rebuild_call_list_command():
+        """Re-score every active user against the call list criteria (consistency check)."""
+        from app.utils.call_list import rebuild_call_list
+        evaluated, created = rebuild_call_list()
+        print(f'Evaluated {evaluated} user(s), created {created} call list item(s).')
+
+    @app.cli.command('dispatch-outbox')
+    @click.option('--once', is_flag=True, help='Deliver the messages due now, then exit')
+    @click.option('--requeue-dead', is_flag=True, help='Retry dead-lettered messages first')
+    def dispatch_outbox(once, requeue_dead):
+        """Deliver queued notifications (a dedicated alternative to the in-process dispatcher)."""
+        import time
+        from app.utils.outbox import (OUTBOX_BATCH_SIZE, OUTBOX_POLL_SECONDS, dispatch_due,
+                                      outbox_counts, requeue_dead as requeue)
+        if requeue_dead:
+            print(f'Requeued {requeue()} dead message(s).')
+        while True:
+            counts = dispatch_due()
+            if counts['claimed']:
+                print(f"Sent {counts['sent']}, retrying {counts['retried']}, "
+                      f"dead-lettered {counts['dead']} message(s).")
+            if counts['claimed'] >= OUTBOX_BATCH_SIZE:
+                continue
+            if once:
+                break
+            time.sleep(OUTBOX_POLL_SECONDS)
+        remaining = outbox_counts()
+        print(f"{remaining.get('pending', 0)} pending, {remaining.get('dead', 0)} dead.")
+
+    @app.cli.command('send-reading-reminders')
+    @click.option('--once', is_flag=True, help='Run one pass, then exit')
+    @click.option('--dry-run', is_flag=True, help='Report who would be reminded without sending')
+    def send_reading_reminders(once, dry_run):
+        """Remind patients who haven't submitted a reading recently."""
+        import time
+        from app.utils.reminders import REMINDER_INTERVAL_MINUTES, run_reminders
+        while True:
+            counts = run_reminders(dry_run=dry_run)
+            if counts is None:
+                print('Another reminder run holds the lock; skipped.')
+            elif dry_run:
+                print(f"{counts['candidates']} candidate(s): {len(counts['eligible'])} would be reminded, "
+                      f"{counts['quiet_hours']} in quiet hours, {counts['capped']} capped.")
+            else:
+                print(f"{counts['candidates']} candidate(s): {counts['push']} pushed, "
+                      f"{counts['email']} emailed, {counts['failed']} failed, "
+                      f"{counts['quiet_hours']} in quiet hours, {counts['capped']} capped.")
+            if once or dry_run:
+                break
+            time.sleep(REMINDER_INTERVAL_MINUTES * 60)
+
+    @app.cli.command('audit-query')
+    @click.option('--resource-id', help='Resource id, e.g. a patient id')
+    @click.option('--user-id', help='Acting user id')
+    @click.option('--action', help='READ, UPDATE, EXPORT, ...')
+    @click.option('--resource-type', help='user_profile, reading, ...')
+    @click.option('--since', help='ISO date/time (UTC), inclusive')
+    @click.option('--until', help='ISO date/time (UTC), exclusive')
+    @click.option('--limit', type=int, default=None, help='Stop after this many events')
+    def audit_query(resource_id, user_id, action, resource_type, since, until, limit):
+        """Print matching audit events as JSON lines, using the segment indexes."""
+        import json
+        from app.utils.audit_archive import query, parse_timestamp
+        from app.utils.audit_logger import audit_log, audit_log_file
+        try:
+            since_ts = parse_timestamp(since) if since else None
+            until_ts = parse_timestamp(until) if until else None
+        except ValueError as e:
+            raise click.BadParameter(str(e))
+        count = 0
+        for event in query(audit_log_file(), resource_id=resource_id, user_id=user_id, action=action,
+                           resource_type=resource_type, since=since_ts, until=until_ts):
+            print(json.dumps(event))
+            count += 1
+            if limit and count >= limit:
+                break
+        filters = {k: v for k, v in (('resource_id', resource_id), ('user_id', user_id),
+                                     ('action', action), ('resource_type', resource_type),
+                                     ('since', since), ('until', until)) if v}
+        audit_log('READ', 'audit_log', details={'filters': filters, 'matched': count}, user_id='cli')
+
+    @app.cli.command('audit-seal')
+    def audit_seal():
+        """Seal finished audit segments now instead of waiting for a writer to."""
+        from app.utils.audit_logger import seal_segments
+        sealed = seal_segments()
+        print(f'Sealed {len(sealed)} audit segment(s).')
+
+    @app.cli.command('audit-verify')
+    def audit_verify():
+        """Check every sealed audit segment against the hash chain."""
+        from app.utils.audit_archive import verify_chain
+        from app.utils.audit_logger import audit_log_file
+        verified, error = verify_chain(audit_log_file())
+        if error:
+            raise click.ClickException(f'Audit chain broken after {verified} segment(s): {error}')
+        print(f'Verified {verified} sealed audit segment(s).')
 
     return app
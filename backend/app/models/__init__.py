@@ -1,5 +1,6 @@
 from .user import User
 from .reading import BloodPressureReading
+from .user_reading_stats import UserReadingStats
 from .union import Union
 from .revoked_token import RevokedToken
 from .email_verification import EmailVerification
@@ -15,3 +16,7 @@ from .mfa_session import MfaSession
 from .dashboard_user import DashboardUser
 from .dashboard_mfa_secret import DashboardMfaSecret
 from .dashboard_mfa_session import DashboardMfaSession
+from .user_search_token import UserSearchToken
+from .export_job import ExportJob
+from .outbox_message import OutboxMessage
+from .reminder_delivery import ReminderDelivery
@@ -3,7 +3,7 @@ Admin Note model with encrypted text field for HIPAA compliance.
 """
 from datetime import datetime
 from app import db
-from app.utils.encryption import encrypt_phi, decrypt_phi
+from app.utils.phi_cache import cached_decrypt, cached_encrypt
 
 
 class AdminNote(db.Model):
@@ -25,18 +25,20 @@ class AdminNote(db.Model):
 
     @property
     def text(self) -> str:
-        return decrypt_phi(self._text_encrypted) if self._text_encrypted else None
+        return cached_decrypt(self._text_encrypted)
 
     @text.setter
     def text(self, value: str):
-        self._text_encrypted = encrypt_phi(value) if value else None
+        self._text_encrypted = cached_encrypt(value, self._text_encrypted)
 
-    def to_dict(self):
+    def to_dict(self, admin_name=None):
+        if admin_name is None:
+            admin_name = self.admin.name if self.admin else 'Admin'
         return {
             'id': self.id,
             'user_id': self.user_id,
             'admin_user_id': self.admin_user_id,
-            'admin_name': self.admin.name if self.admin else 'Admin',
+            'admin_name': admin_name,
             'text': self.text,
             'created_at': self.created_at.isoformat() if self.created_at else None,
         }
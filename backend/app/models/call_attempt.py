@@ -3,7 +3,7 @@ Call Attempt model — logs each outreach attempt with encrypted notes (PHI).
 """
 from datetime import datetime
 from app import db
-from app.utils.encryption import encrypt_phi, decrypt_phi
+from app.utils.phi_cache import cached_decrypt, cached_encrypt
 
 
 class CallAttempt(db.Model):
@@ -28,6 +28,10 @@ class CallAttempt(db.Model):
     referral_to = db.Column(db.String(200), nullable=True)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
+    __table_args__ = (
+        db.Index('ix_call_attempts_created_at_id', 'created_at', 'id'),
+    )
+
     # Relationships
     call_list_item = db.relationship('CallListItem', backref='attempts')
     patient = db.relationship('User', foreign_keys=[user_id])
@@ -35,19 +39,23 @@ class CallAttempt(db.Model):
 
     @property
     def notes(self) -> str:
-        return decrypt_phi(self._notes_encrypted) if self._notes_encrypted else None
+        return cached_decrypt(self._notes_encrypted)
 
     @notes.setter
     def notes(self, value: str):
-        self._notes_encrypted = encrypt_phi(value) if value else None
+        self._notes_encrypted = cached_encrypt(value, self._notes_encrypted)
 
-    def to_dict(self):
+    def to_dict(self, admin_name=None):
+        """admin_name: pre-resolved name of the calling admin (see
+        resolve_user_display_names); defaults to the admin relationship."""
+        if admin_name is None:
+            admin_name = self.admin.name if self.admin else 'Admin'
         return {
             'id': self.id,
             'call_list_item_id': self.call_list_item_id,
             'user_id': self.user_id,
             'admin_id': self.admin_id,
-            'admin_name': self.admin.name if self.admin else 'Admin',
+            'admin_name': admin_name,
             'outcome': self.outcome,
             'notes': self.notes,
             'follow_up_needed': self.follow_up_needed,
@@ -32,6 +32,14 @@ class CallListItem(db.Model):
     patient = db.relationship('User', foreign_keys=[user_id], backref='call_list_items')
     closer = db.relationship('User', foreign_keys=[closed_by])
 
+    __table_args__ = (
+        # At most one open item per user and list, so concurrent evaluations
+        # can't both add one (see evaluate_users)
+        db.Index('uq_call_list_items_open_user_id_list_type', 'user_id', 'list_type', unique=True,
+                 postgresql_where=db.text("status = 'open'"),
+                 sqlite_where=db.text("status = 'open'")),
+    )
+
     def to_dict(self):
         return {
             'id': self.id,
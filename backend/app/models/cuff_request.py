@@ -3,7 +3,7 @@ CuffRequest model for tracking blood pressure cuff shipment requests.
 """
 from datetime import datetime
 from app import db
-from app.utils.encryption import encrypt_phi, decrypt_phi
+from app.utils.phi_cache import cached_decrypt, cached_encrypt
 
 
 class CuffRequest(db.Model):
@@ -39,6 +39,10 @@ class CuffRequest(db.Model):
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
+    __table_args__ = (
+        db.Index('ix_cuff_requests_created_at_id', 'created_at', 'id'),
+    )
+
     # Relationships
     user = db.relationship('User', foreign_keys=[user_id], backref='cuff_requests')
     approved_by_user = db.relationship('User', foreign_keys=[approved_by])
@@ -47,11 +51,11 @@ class CuffRequest(db.Model):
     # PHI property: shipping address
     @property
     def shipping_address(self) -> str:
-        return decrypt_phi(self._address_encrypted) if self._address_encrypted else None
+        return cached_decrypt(self._address_encrypted)
 
     @shipping_address.setter
     def shipping_address(self, value: str):
-        self._address_encrypted = encrypt_phi(value) if value else None
+        self._address_encrypted = cached_encrypt(value, self._address_encrypted)
 
     def to_dict(self, include_address=False):
         """Convert to dictionary."""
@@ -0,0 +1,63 @@
+"""
+Export Job model — background CSV/PDF exports and their on-disk artifacts.
+"""
+import json
+from datetime import datetime
+from app import db
+
+EXPORT_JOB_STATUSES = ['queued', 'running', 'succeeded', 'failed']
+
+
+class ExportJob(db.Model):
+    """
+    A queued or finished admin export. The worker writes the artifact under
+    EXPORT_JOB_DIR and records progress here so any web worker can answer
+    polls and serve the download.
+    """
+    __tablename__ = 'export_jobs'
+
+    id = db.Column(db.Integer, primary_key=True)
+    kind = db.Column(db.String(30), nullable=False)  # users_csv | readings_csv | call_reports_csv | patient_pdf | patient_pdf_bulk
+    params = db.Column(db.Text, nullable=True)  # JSON object of export filters
+    status = db.Column(db.String(10), nullable=False, default='queued', index=True)
+    rows_done = db.Column(db.Integer, nullable=False, default=0)
+    rows_total = db.Column(db.Integer, nullable=True)
+    artifact_name = db.Column(db.String(255), nullable=True)  # file name inside EXPORT_JOB_DIR
+    download_name = db.Column(db.String(255), nullable=True)
+    mimetype = db.Column(db.String(50), nullable=True)
+    size_bytes = db.Column(db.Integer, nullable=True)
+    error = db.Column(db.Text, nullable=True)
+    requested_by = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False, index=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+    started_at = db.Column(db.DateTime, nullable=True)
+    finished_at = db.Column(db.DateTime, nullable=True)
+    heartbeat_at = db.Column(db.DateTime, nullable=True)  # stamped while running
+
+    @property
+    def params_dict(self):
+        return json.loads(self.params) if self.params else {}
+
+    @property
+    def is_finished(self):
+        return self.status in ('succeeded', 'failed')
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'kind': self.kind,
+            'params': self.params_dict,
+            'status': self.status,
+            'rows_done': self.rows_done,
+            'rows_total': self.rows_total,
+            'progress': round(self.rows_done / self.rows_total, 3) if self.rows_total else None,
+            'download_name': self.download_name if self.status == 'succeeded' else None,
+            'size_bytes': self.size_bytes,
+            'error': self.error,
+            'requested_by': self.requested_by,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'started_at': self.started_at.isoformat() if self.started_at else None,
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None,
+        }
+
+    def __repr__(self):
+        return f'<ExportJob {self.id} kind={self.kind} status={self.status}>'
@@ -41,7 +41,7 @@ class MfaSession(db.Model):
             expires_at=datetime.now(timezone.utc) + timedelta(minutes=10),
         )
         db.session.add(session)
-        db.session.commit()
+        db.session.flush()
         return session
 
     @property
@@ -0,0 +1,51 @@
+"""
+Outbox Message model — notifications written in the same transaction as the
+change that triggers them and delivered later by the outbox dispatcher.
+"""
+import json
+from datetime import datetime
+from app import db
+
+OUTBOX_STATUSES = ['pending', 'dead']
+
+
+class OutboxMessage(db.Model):
+    """
+    A notification waiting to be sent. Payloads hold ids only; handlers load
+    the recipient and content when they run, so no PHI is stored here.
+    Delivered messages are deleted; messages that exhaust their retries are
+    kept as dead letters.
+    """
+    __tablename__ = 'notification_outbox'
+    __table_args__ = (
+        db.Index('ix_notification_outbox_status_next_attempt_at', 'status', 'next_attempt_at'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    kind = db.Column(db.String(50), nullable=False)  # a handler registered in app.utils.outbox
+    payload = db.Column(db.Text, nullable=True)  # JSON object of ids for the handler
+    status = db.Column(db.String(10), nullable=False, default='pending')
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    # Due time; a claimed message is pushed out by the lease until it is settled
+    next_attempt_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    last_error = db.Column(db.Text, nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    @property
+    def payload_dict(self):
+        return json.loads(self.payload) if self.payload else {}
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'kind': self.kind,
+            'payload': self.payload_dict,
+            'status': self.status,
+            'attempts': self.attempts,
+            'next_attempt_at': self.next_attempt_at.isoformat() if self.next_attempt_at else None,
+            'last_error': self.last_error,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+        }
+
+    def __repr__(self):
+        return f'<OutboxMessage {self.id} kind={self.kind} status={self.status}>'
@@ -1,8 +1,64 @@
 """
 Blood Pressure Reading model.
 """
-from datetime import datetime
+from datetime import datetime, timezone
+from sqlalchemy.dialects import postgresql, sqlite
 from app import db
+from app.utils.cache import invalidate_on_commit
+
+BP_CATEGORIES = ('Normal', 'Elevated', 'Stage 1', 'Stage 2', 'Crisis')
+
+# AHA category as SQL; must stay in step with classify_bp()
+BP_CATEGORY_SQL = (
+    "CASE"
+    " WHEN systolic > 180 OR diastolic > 120 THEN 'Crisis'"
+    " WHEN systolic >= 140 OR diastolic >= 90 THEN 'Stage 2'"
+    " WHEN systolic >= 130 OR diastolic >= 80 THEN 'Stage 1'"
+    " WHEN systolic >= 120 AND diastolic < 80 THEN 'Elevated'"
+    " ELSE 'Normal' END"
+)
+
+
+def classify_bp(systolic, diastolic):
+    """Classify blood pressure reading into a category."""
+    if systolic > 180 or diastolic > 120:
+        return 'Crisis'
+    if systolic >= 140 or diastolic >= 90:
+        return 'Stage 2'
+    if systolic >= 130 or diastolic >= 80:
+        return 'Stage 1'
+    if systolic >= 120 and diastolic < 80:
+        return 'Elevated'
+    return 'Normal'
+
+
+def parse_bp_categories(value):
+    """Map a comma-separated, case-insensitive filter to stored category labels."""
+    by_key = {c.lower(): c for c in BP_CATEGORIES}
+    return [by_key[c.strip().lower()] for c in value.split(',') if c.strip().lower() in by_key]
+
+
+IDEMPOTENCY_KEY_MAX = 64
+
+
+def reading_dedupe_key(reading_date, systolic, diastolic, idempotency_key=None):
+    """Idempotency key for a user's reading, unique per user.
+
+    A client-supplied key is used as-is; otherwise the key is derived from the
+    reading's values and its UTC minute, so a resubmitted reading maps to the
+    row it already created. Must stay in step with the backfill in migration
+    d9e3a7b5c1f8."""
+    if idempotency_key:
+        return f'c:{idempotency_key}'
+    if reading_date.tzinfo is not None:
+        reading_date = reading_date.astimezone(timezone.utc)
+    minute = int(reading_date.replace(tzinfo=timezone.utc).timestamp()) // 60
+    return f'v:{minute}:{systolic}:{diastolic}'
+
+
+def _default_dedupe_key(context):
+    params = context.get_current_parameters()
+    return reading_dedupe_key(params['reading_date'], params['systolic'], params['diastolic'])
 
 
 class BloodPressureReading(db.Model):
@@ -21,16 +77,54 @@ class BloodPressureReading(db.Model):
     diastolic = db.Column(db.Integer, nullable=False)
     heart_rate = db.Column(db.Integer, nullable=True)
 
+    # AHA category, computed by the database from systolic/diastolic
+    bp_category = db.Column(db.String(10), db.Computed(BP_CATEGORY_SQL, persisted=True))
+
     # Timestamps
     reading_date = db.Column(db.DateTime, nullable=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
+    # Idempotency key (see reading_dedupe_key); unique per user
+    dedupe_key = db.Column(db.String(80), nullable=False, default=_default_dedupe_key)
+
     # Device info (non-PHI)
     device_id = db.Column(db.String(255), nullable=True)
 
     # Optional patient note (e.g. "forgot meds", "just exercised")
     notes = db.Column(db.Text, nullable=True)
 
+    __table_args__ = (
+        db.Index('ix_bp_readings_user_id_reading_date', 'user_id', 'reading_date'),
+        db.Index('ix_bp_readings_reading_date_id', 'reading_date', 'id'),
+        db.Index('ix_bp_readings_user_id_id', 'user_id', 'id'),
+        db.Index('ix_bp_readings_user_id_created_at_id', 'user_id', 'created_at', 'id'),
+        db.Index('ix_bp_readings_bp_category_reading_date', 'bp_category', 'reading_date'),
+        db.Index('uq_bp_readings_user_id_dedupe_key', 'user_id', 'dedupe_key', unique=True),
+    )
+
+    @classmethod
+    def insert_new(cls, rows):
+        """Insert rows (column dicts including user_id and dedupe_key) in one
+        INSERT ... ON CONFLICT DO NOTHING RETURNING statement.
+
+        Rows whose (user_id, dedupe_key) already exists, including ones a
+        concurrent request has just inserted, are skipped instead of raising.
+
+        Returns:
+            The readings that were created
+        """
+        if not rows:
+            return []
+        dialect = db.session.get_bind().dialect.name
+        insert = postgresql.insert if dialect == 'postgresql' else sqlite.insert
+        stmt = (insert(cls).values(rows)
+                .on_conflict_do_nothing(index_elements=['user_id', 'dedupe_key'])
+                .returning(cls))
+        created = list(db.session.scalars(stmt))
+        if created:
+            invalidate_on_commit(db.session, cls)
+        return created
+
     def to_dict(self):
         return {
             'id': self.id,
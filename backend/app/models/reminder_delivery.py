@@ -0,0 +1,41 @@
+"""
+Reminder Delivery model — one row per reminder sent (or attempted) to a user.
+"""
+from datetime import datetime
+from app import db
+
+REMINDER_STATUSES = ['sent', 'failed']
+
+
+class ReminderDelivery(db.Model):
+    """
+    Outcome of one campaign reminder. The scheduler's weekly cap counts a
+    user's recent 'sent' rows and its minimum interval runs from the latest
+    row of either status, so (user_id, sent_at) is indexed.
+    """
+    __tablename__ = 'reminder_deliveries'
+    __table_args__ = (
+        db.Index('ix_reminder_deliveries_user_id_sent_at', 'user_id', 'sent_at'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    campaign = db.Column(db.String(30), nullable=False, default='reading_reminder')
+    channel = db.Column(db.String(10), nullable=False)  # push | email
+    status = db.Column(db.String(10), nullable=False)  # sent | failed
+    detail = db.Column(db.String(255), nullable=True)  # devices reached, or the error
+    sent_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'user_id': self.user_id,
+            'campaign': self.campaign,
+            'channel': self.channel,
+            'status': self.status,
+            'detail': self.detail,
+            'sent_at': self.sent_at.isoformat() if self.sent_at else None,
+        }
+
+    def __repr__(self):
+        return f'<ReminderDelivery {self.id} user={self.user_id} {self.channel}:{self.status}>'
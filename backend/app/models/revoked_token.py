@@ -1,8 +1,30 @@
 """
 Revoked token model for JWT token revocation / logout support.
 """
+import os
+import time
 from datetime import datetime, timezone
+from sqlalchemy import event
+from sqlalchemy.orm import Session, object_session
 from app import db
+from app.utils.cache import TTLCache
+
+# Seconds a "not revoked" answer is trusted before asking the database again.
+# Revocations made by another worker become visible after at most this long.
+AUTH_CACHE_TTL = int(os.getenv('AUTH_CACHE_TTL', 30))
+
+# jti -> revoked? Revoked entries live until the token's exp.
+_revocation_cache = TTLCache(AUTH_CACHE_TTL, max_entries=50000)
+
+
+def _seconds_until(exp):
+    if exp is None:
+        return None
+    if isinstance(exp, datetime):
+        if exp.tzinfo is None:
+            exp = exp.replace(tzinfo=timezone.utc)
+        exp = exp.timestamp()
+    return exp - time.time()
 
 
 class RevokedToken(db.Model):
@@ -16,11 +38,23 @@ class RevokedToken(db.Model):
     expires_at = db.Column(db.DateTime, nullable=False)
 
     @staticmethod
-    def is_token_revoked(jti):
-        """Check if a token has been revoked."""
-        return db.session.query(
+    def is_token_revoked(jti, exp=None):
+        """Check if a token has been revoked.
+
+        exp (the token's exp claim) bounds how long the answer is cached."""
+        cached = _revocation_cache.get(jti)
+        if cached is not None:
+            return cached
+        revoked = db.session.query(
             db.exists().where(RevokedToken.jti == jti)
         ).scalar()
+        remaining = _seconds_until(exp)
+        if revoked:
+            ttl = remaining if remaining is not None else AUTH_CACHE_TTL
+        else:
+            ttl = AUTH_CACHE_TTL if remaining is None else min(AUTH_CACHE_TTL, remaining)
+        _revocation_cache.set(jti, revoked, ttl_seconds=ttl)
+        return revoked
 
     @staticmethod
     def cleanup_expired():
@@ -33,3 +67,23 @@ class RevokedToken(db.Model):
 
     def __repr__(self):
         return f'<RevokedToken {self.jti}>'
+
+
+@event.listens_for(RevokedToken, 'after_insert')
+def _collect_revocation(mapper, connection, target):
+    session = object_session(target)
+    if session is not None:
+        session.info.setdefault('revoked_jtis', []).append((target.jti, target.expires_at))
+
+
+@event.listens_for(Session, 'after_commit')
+def _cache_revocations(session):
+    """Make a logout effective in this worker as soon as it commits."""
+    for jti, expires_at in session.info.pop('revoked_jtis', ()):
+        ttl = _seconds_until(expires_at)
+        _revocation_cache.set(jti, True, ttl_seconds=ttl if ttl is not None else AUTH_CACHE_TTL)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_revocations(session):
+    session.info.pop('revoked_jtis', None)
@@ -3,9 +3,13 @@ User model with encrypted PHI fields.
 """
 import json
 import logging
+import os
+from collections import namedtuple
 from datetime import datetime
 from app import db
-from app.utils.encryption import encrypt_phi, decrypt_phi, hash_email
+from app.utils.cache import TTLCache, clear_on_commit
+from app.utils.encryption import decrypt_phi_many, hash_email, blind_index_tokens
+from app.utils.phi_cache import cached_decrypt, cached_encrypt, remember
 
 logger = logging.getLogger(__name__)
 
@@ -20,6 +24,20 @@ USER_STATUS_CHOICES = [
 ]
 
 
+# Encrypted PHI properties and the columns that back them
+PHI_FIELDS = {
+    'name': '_name_encrypted',
+    'email': '_email_encrypted',
+    'dob': '_dob_encrypted',
+    'phone': '_phone_encrypted',
+    'address': '_address_encrypted',
+    'medications': '_medications_encrypted',
+}
+
+# Account flags checked on every authenticated request
+AuthStatus = namedtuple('AuthStatus', ['is_active', 'is_email_verified', 'is_admin'])
+
+
 class User(db.Model):
     """
     User model storing consumer information.
@@ -65,6 +83,13 @@ class User(db.Model):
     phq2_interest = db.Column(db.String(50), nullable=True)
     phq2_depressed = db.Column(db.String(50), nullable=True)
 
+    # Reading reminder preferences (hours are local to timezone; NULL uses the
+    # REMINDER_* defaults)
+    reading_reminders_enabled = db.Column(db.Boolean, nullable=False, default=True)
+    timezone = db.Column(db.String(64), nullable=True)  # IANA name, e.g. America/Chicago
+    quiet_hours_start = db.Column(db.SmallInteger, nullable=True)  # 0-23
+    quiet_hours_end = db.Column(db.SmallInteger, nullable=True)  # 0-23
+
     # Non-PHI fields
     union_id = db.Column(db.Integer, db.ForeignKey('unions.id'), nullable=True)
     user_status = db.Column(db.String(30), nullable=False, default='pending_approval', index=True)
@@ -76,74 +101,118 @@ class User(db.Model):
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
+    __table_args__ = (
+        db.Index('ix_users_created_at_id', 'created_at', 'id'),
+    )
+
     # Relationships
     readings = db.relationship('BloodPressureReading', backref='user', lazy='dynamic',
                                 order_by='BloodPressureReading.reading_date.desc()')
     union = db.relationship('Union', backref='users')
+    search_tokens = db.relationship('UserSearchToken', backref='user',
+                                    cascade='all, delete-orphan', passive_deletes=True)
+
+    def _reindex_search_field(self, field: str, value: str):
+        """Replace the blind search index tokens for one PHI field."""
+        from app.models.user_search_token import UserSearchToken
+        kept = [t for t in self.search_tokens if t.field != field]
+        self.search_tokens = kept + [
+            UserSearchToken(field=field, token=token)
+            for token in blind_index_tokens(value, field)
+        ]
 
     # PHI property: name
     @property
     def name(self) -> str:
-        return decrypt_phi(self._name_encrypted) if self._name_encrypted else None
+        return cached_decrypt(self._name_encrypted)
 
     @name.setter
     def name(self, value: str):
-        self._name_encrypted = encrypt_phi(value) if value else None
+        self._name_encrypted = cached_encrypt(value, self._name_encrypted)
+        self._reindex_search_field('name', value)
 
     # PHI property: email
     @property
     def email(self) -> str:
-        return decrypt_phi(self._email_encrypted) if self._email_encrypted else None
+        return cached_decrypt(self._email_encrypted)
 
     @email.setter
     def email(self, value: str):
-        self._email_encrypted = encrypt_phi(value) if value else None
+        self._email_encrypted = cached_encrypt(value, self._email_encrypted)
         self._email_hash = hash_email(value) if value else None
+        self._reindex_search_field('email', value)
 
     # PHI property: date of birth
     @property
     def dob(self) -> str:
-        return decrypt_phi(self._dob_encrypted) if self._dob_encrypted else None
+        return cached_decrypt(self._dob_encrypted)
 
     @dob.setter
     def dob(self, value: str):
-        self._dob_encrypted = encrypt_phi(value) if value else None
+        self._dob_encrypted = cached_encrypt(value, self._dob_encrypted)
 
     # PHI property: phone
     @property
     def phone(self) -> str:
-        return decrypt_phi(self._phone_encrypted) if self._phone_encrypted else None
+        return cached_decrypt(self._phone_encrypted)
 
     @phone.setter
     def phone(self, value: str):
-        self._phone_encrypted = encrypt_phi(value) if value else None
+        self._phone_encrypted = cached_encrypt(value, self._phone_encrypted)
 
     # PHI property: address
     @property
     def address(self) -> str:
-        return decrypt_phi(self._address_encrypted) if self._address_encrypted else None
+        return cached_decrypt(self._address_encrypted)
 
     @address.setter
     def address(self, value: str):
-        self._address_encrypted = encrypt_phi(value) if value else None
+        self._address_encrypted = cached_encrypt(value, self._address_encrypted)
 
     # PHI property: medications
     @property
     def medications(self) -> str:
-        return decrypt_phi(self._medications_encrypted) if self._medications_encrypted else None
+        return cached_decrypt(self._medications_encrypted)
 
     @medications.setter
     def medications(self, value: str):
-        self._medications_encrypted = encrypt_phi(value) if value else None
+        self._medications_encrypted = cached_encrypt(value, self._medications_encrypted)
 
     @property
     def is_approved(self):
         """Backward compatibility for Flutter app — True if past the approval stage."""
         return self.user_status not in ('pending_approval', None)
 
-    def to_dict(self, include_phi=False):
+    @staticmethod
+    def bulk_decrypt(users, fields=tuple(PHI_FIELDS)):
+        """Decrypt PHI for a page of users column by column.
+
+        Returns {user_id: {field: plaintext}}. A value that fails to decrypt
+        is logged and returned as None so one bad record doesn't sink the page."""
+        users = list(users)
+        result = {u.id: {} for u in users}
+        for field in fields:
+            column = PHI_FIELDS[field]
+            ciphertexts = [getattr(u, column) for u in users]
+            values = decrypt_phi_many(ciphertexts, strict=False)
+            remember(ciphertexts, values)
+            for user, value in zip(users, values):
+                result[user.id][field] = value
+        return result
+
+    @staticmethod
+    def to_dict_list(users, include_phi=False):
+        """Serialize a list of users, batch-decrypting PHI when requested."""
+        users = list(users)
+        if not include_phi:
+            return [u.to_dict() for u in users]
+        phi = User.bulk_decrypt(users)
+        return [u.to_dict(include_phi=True, phi=phi[u.id]) for u in users]
+
+    def to_dict(self, include_phi=False, phi=None):
         """Convert to dictionary. Only include PHI if explicitly requested.
-        Wraps PHI decryption in try/except so one bad record doesn't crash the list."""
+        Wraps PHI decryption in try/except so one bad record doesn't crash the list.
+        Pass phi (from bulk_decrypt) to reuse already-decrypted values."""
         data = {
             'id': self.id,
             'union_id': self.union_id,
@@ -177,21 +246,21 @@ class User(db.Model):
             # Screening fields
             'phq2_interest': self.phq2_interest,
             'phq2_depressed': self.phq2_depressed,
+            # Reading reminders
+            'reading_reminders_enabled': self.reading_reminders_enabled,
+            'timezone': self.timezone,
+            'quiet_hours_start': self.quiet_hours_start,
+            'quiet_hours_end': self.quiet_hours_end,
         }
-        if include_phi:
+        if include_phi and phi is not None:
+            for key in PHI_FIELDS:
+                data[key] = phi.get(key)
+        elif include_phi:
             # Wrap each PHI field individually so one decryption failure
             # doesn't prevent the rest of the record from loading.
-            phi_fields = {
-                'name': 'name',
-                'email': 'email',
-                'dob': 'dob',
-                'phone': 'phone',
-                'address': 'address',
-                'medications': 'medications',
-            }
-            for key, prop in phi_fields.items():
+            for key in PHI_FIELDS:
                 try:
-                    data[key] = getattr(self, prop)
+                    data[key] = getattr(self, key)
                 except Exception:
                     logger.error(
                         'Decryption error for user_id=%s field=%s', self.id, key,
@@ -214,5 +283,29 @@ class User(db.Model):
         email_hash = hash_email(email)
         return User.query.filter_by(_email_hash=email_hash).first()
 
+    @staticmethod
+    def auth_status(user_id):
+        """Return the user's AuthStatus, or None if the user doesn't exist.
+
+        Reads only the flag columns and caches them briefly per worker; any
+        commit that changes a flag clears the cache."""
+        status = _auth_status_cache.get(user_id)
+        if status is None:
+            row = (
+                db.session.query(User.is_active, User.is_email_verified, User.is_admin)
+                .filter(User.id == user_id)
+                .first()
+            )
+            if row is None:
+                return None
+            status = AuthStatus(bool(row.is_active), bool(row.is_email_verified), bool(row.is_admin))
+            _auth_status_cache.set(user_id, status)
+        return status
+
     def __repr__(self):
         return f'<User {self.id}>'
+
+
+_auth_status_cache = TTLCache(int(os.getenv('AUTH_CACHE_TTL', 30)), max_entries=10000)
+clear_on_commit(_auth_status_cache, User,
+                attrs=('is_active', 'is_email_verified', 'is_admin', 'user_status'))
@@ -0,0 +1,271 @@
+"""
+Per-user blood pressure reading rollup.
+"""
+from datetime import datetime, timedelta, timezone
+from sqlalchemy import case, func
+from sqlalchemy.dialects import postgresql, sqlite
+from app import db
+from app.models.reading import BloodPressureReading
+
+WINDOW_7_DAYS = timedelta(days=7)
+WINDOW_30_DAYS = timedelta(days=30)
+
+def _utcnow():
+    """Naive UTC now, matching how reading_date is stored."""
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def _naive_utc(value):
+    if value is not None and value.tzinfo is not None:
+        return value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+
+class UserReadingStats(db.Model):
+    """
+    Covering rollup of each user's readings so list, tab and call-list queries
+    don't have to aggregate the full blood_pressure_readings table.
+
+    reading_count and last_reading_date are exact. The 7/30-day sums are exact
+    until windows_valid_until, the moment the oldest reading in either window
+    ages out; after that the row is recomputed from the (user_id, reading_date)
+    index by writers (the next reading, call list evaluation, or
+    `flask refresh-reading-stats`). Reads through for_users() compute current
+    windows for such rows without writing. A NULL windows_valid_until means
+    neither window holds a reading, so the sums stay correct until the next
+    insert.
+
+    call_list_due_at is when the user's call list assignment must next be
+    re-scored (see app.utils.call_list); NULL means only a new event can
+    change it.
+    """
+    __tablename__ = 'user_reading_stats'
+
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), primary_key=True)
+    reading_count = db.Column(db.Integer, nullable=False, default=0)
+    last_reading_date = db.Column(db.DateTime, nullable=True, index=True)
+
+    count_7d = db.Column(db.Integer, nullable=False, default=0)
+    sum_systolic_7d = db.Column(db.Integer, nullable=False, default=0)
+    sum_diastolic_7d = db.Column(db.Integer, nullable=False, default=0)
+    count_30d = db.Column(db.Integer, nullable=False, default=0)
+    sum_systolic_30d = db.Column(db.Integer, nullable=False, default=0)
+    sum_diastolic_30d = db.Column(db.Integer, nullable=False, default=0)
+    windows_valid_until = db.Column(db.DateTime, nullable=True, index=True)
+    call_list_due_at = db.Column(db.DateTime, nullable=True, index=True)
+
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    user = db.relationship('User', backref=db.backref('reading_stats', uselist=False))
+
+    @property
+    def avg_7_day(self):
+        if not self.count_7d:
+            return None
+        return {
+            'systolic': round(self.sum_systolic_7d / self.count_7d),
+            'diastolic': round(self.sum_diastolic_7d / self.count_7d),
+        }
+
+    @property
+    def avg_30_day(self):
+        if not self.count_30d:
+            return None
+        return {
+            'systolic': round(self.sum_systolic_30d / self.count_30d),
+            'diastolic': round(self.sum_diastolic_30d / self.count_30d),
+        }
+
+    def windows_stale(self, now=None):
+        now = now or _utcnow()
+        return self.windows_valid_until is not None and self.windows_valid_until <= now
+
+    @classmethod
+    def record_reading(cls, reading):
+        """Fold a newly added reading into its user's rollup.
+
+        Call before committing the reading so both land in one transaction.
+        Counters are updated with SQL increments so concurrent inserts for
+        the same user don't lose updates. A user's first row is created with
+        INSERT ... ON CONFLICT DO NOTHING, so concurrent first readings don't
+        collide on the primary key: the transaction that creates the row
+        rebuilds it, the others increment it. Rebuilding a row whose windows
+        expired writes absolute values, so the row is locked first (SELECT
+        ... FOR UPDATE) and re-checked: a concurrent rebuild then commits
+        before this one reads the readings table, and includes its reading."""
+        now = _utcnow()
+        reading_date = _naive_utc(reading.reading_date)
+        stats = db.session.get(cls, reading.user_id)
+
+        if stats is None:
+            db.session.flush()
+            if cls._insert_empty(reading.user_id):
+                cls.rebuild([reading.user_id], now=now)
+                return
+            stats = db.session.get(cls, reading.user_id)
+
+        if stats.windows_stale(now):
+            db.session.flush()
+            stats = (cls.query.filter_by(user_id=reading.user_id)
+                     .with_for_update().populate_existing().one())
+            if stats.windows_stale(now):
+                cls.rebuild([reading.user_id], now=now)
+                return
+
+        stats.reading_count = cls.reading_count + 1
+        stats.last_reading_date = case(
+            (cls.last_reading_date.is_(None), reading_date),
+            (cls.last_reading_date < reading_date, reading_date),
+            else_=cls.last_reading_date,
+        )
+
+        if reading_date >= now - WINDOW_30_DAYS:
+            stats.count_30d = cls.count_30d + 1
+            stats.sum_systolic_30d = cls.sum_systolic_30d + reading.systolic
+            stats.sum_diastolic_30d = cls.sum_diastolic_30d + reading.diastolic
+            expires = reading_date + WINDOW_30_DAYS
+            if reading_date >= now - WINDOW_7_DAYS:
+                stats.count_7d = cls.count_7d + 1
+                stats.sum_systolic_7d = cls.sum_systolic_7d + reading.systolic
+                stats.sum_diastolic_7d = cls.sum_diastolic_7d + reading.diastolic
+                expires = reading_date + WINDOW_7_DAYS
+            stats.windows_valid_until = case(
+                (cls.windows_valid_until.is_(None), expires),
+                (cls.windows_valid_until > expires, expires),
+                else_=cls.windows_valid_until,
+            )
+
+    @classmethod
+    def _insert_empty(cls, user_id):
+        """Create a zeroed row for user_id unless one exists; True if created."""
+        dialect = db.session.get_bind().dialect.name
+        insert = postgresql.insert if dialect == 'postgresql' else sqlite.insert
+        stmt = (insert(cls).values(user_id=user_id)
+                .on_conflict_do_nothing(index_elements=['user_id']))
+        return db.session.execute(stmt).rowcount == 1
+
+    @classmethod
+    def rebuild(cls, user_ids=None, now=None):
+        """Recompute rollup rows from the readings table.
+
+        Args:
+            user_ids: Users to recompute (default: every user with readings)
+            now: Reference time for the 7/30-day windows
+
+        Returns:
+            Number of rows written
+        """
+        now = now or _utcnow()
+        query = cls._aggregate(now)
+        existing_query = cls.query
+        if user_ids is not None:
+            user_ids = list(user_ids)
+            if not user_ids:
+                return 0
+            query = query.filter(BloodPressureReading.user_id.in_(user_ids))
+            existing_query = existing_query.filter(cls.user_id.in_(user_ids))
+
+        existing = {s.user_id: s for s in existing_query.all()}
+        written = 0
+        for row in query.all():
+            stats = existing.pop(row.user_id, None)
+            if stats is None:
+                stats = cls(user_id=row.user_id)
+                db.session.add(stats)
+            stats._apply(row)
+            written += 1
+
+        # Users whose readings are all gone keep a zeroed row
+        for stats in existing.values():
+            stats._apply(None)
+            written += 1
+
+        db.session.flush()
+        return written
+
+    @classmethod
+    def _aggregate(cls, now):
+        """Per-user aggregate query over readings, one row per user_id."""
+        cutoff_7 = now - WINDOW_7_DAYS
+        cutoff_30 = now - WINDOW_30_DAYS
+        R = BloodPressureReading
+        in_7 = R.reading_date >= cutoff_7
+        in_30 = R.reading_date >= cutoff_30
+
+        return db.session.query(
+            R.user_id,
+            func.count(R.id).label('reading_count'),
+            func.max(R.reading_date).label('last_reading_date'),
+            func.sum(case((in_7, 1), else_=0)).label('count_7d'),
+            func.sum(case((in_7, R.systolic), else_=0)).label('sum_systolic_7d'),
+            func.sum(case((in_7, R.diastolic), else_=0)).label('sum_diastolic_7d'),
+            func.min(case((in_7, R.reading_date))).label('oldest_7d'),
+            func.sum(case((in_30, 1), else_=0)).label('count_30d'),
+            func.sum(case((in_30, R.systolic), else_=0)).label('sum_systolic_30d'),
+            func.sum(case((in_30, R.diastolic), else_=0)).label('sum_diastolic_30d'),
+            func.min(case((in_30, R.reading_date))).label('oldest_30d'),
+        ).group_by(R.user_id)
+
+    def _apply(self, row):
+        """Set every aggregate from a _aggregate() row (None: no readings)."""
+        if row is None:
+            self.reading_count = 0
+            self.last_reading_date = None
+            self.count_7d = self.sum_systolic_7d = self.sum_diastolic_7d = 0
+            self.count_30d = self.sum_systolic_30d = self.sum_diastolic_30d = 0
+            self.windows_valid_until = None
+            return
+        self.reading_count = row.reading_count
+        self.last_reading_date = row.last_reading_date
+        self.count_7d = row.count_7d or 0
+        self.sum_systolic_7d = row.sum_systolic_7d or 0
+        self.sum_diastolic_7d = row.sum_diastolic_7d or 0
+        self.count_30d = row.count_30d or 0
+        self.sum_systolic_30d = row.sum_systolic_30d or 0
+        self.sum_diastolic_30d = row.sum_diastolic_30d or 0
+        expiries = [
+            d + w for d, w in ((row.oldest_7d, WINDOW_7_DAYS), (row.oldest_30d, WINDOW_30_DAYS))
+            if d is not None
+        ]
+        self.windows_valid_until = min(expiries) if expiries else None
+
+    @classmethod
+    def refresh_stale(cls, user_ids=None):
+        """Recompute the windows of rows whose oldest windowed reading has aged out."""
+        now = _utcnow()
+        query = db.session.query(cls.user_id).filter(cls.windows_valid_until <= now)
+        if user_ids is not None:
+            query = query.filter(cls.user_id.in_(list(user_ids)))
+        stale_ids = [row.user_id for row in query.all()]
+        if stale_ids:
+            cls.rebuild(stale_ids, now=now)
+        return len(stale_ids)
+
+    @classmethod
+    def for_users(cls, user_ids, refresh=False):
+        """Return {user_id: UserReadingStats} with current 7/30-day windows.
+
+        Rows whose windows have expired are recomputed. Writers pass
+        refresh=True to store the result in their transaction; otherwise
+        (read-only requests) the current values are returned on transient
+        copies and nothing is written, leaving the refresh to the writers."""
+        user_ids = list(user_ids)
+        if not user_ids:
+            return {}
+        if refresh:
+            cls.refresh_stale(user_ids)
+        stats_map = {s.user_id: s for s in cls.query.filter(cls.user_id.in_(user_ids)).all()}
+        now = _utcnow()
+        stale = [uid for uid, stats in stats_map.items() if stats.windows_stale(now)]
+        if stale:
+            fresh = {row.user_id: row for row in
+                     cls._aggregate(now).filter(BloodPressureReading.user_id.in_(stale))}
+            for uid in stale:
+                current = cls(user_id=uid, call_list_due_at=stats_map[uid].call_list_due_at,
+                              updated_at=stats_map[uid].updated_at)
+                current._apply(fresh.get(uid))
+                stats_map[uid] = current
+        return stats_map
+
+    def __repr__(self):
+        return f'<UserReadingStats user={self.user_id} count={self.reading_count}>'
@@ -0,0 +1,54 @@
+"""
+Blind search index for encrypted User name/email fields.
+"""
+from app import db
+from app.utils.encryption import BLIND_INDEX_GRAM, blind_index_query_tokens
+
+SEARCHABLE_FIELDS = ('name', 'email')
+
+
+class UserSearchToken(db.Model):
+    """
+    Keyed HMAC trigram tokens for a user's encrypted name and email, under a
+    separate key per field.
+    Tokens are not reversible without PHI_ENCRYPTION_KEY, so admin search can
+    run as an indexed SQL query instead of decrypting every user.
+    Rows are maintained by the User.name / User.email setters.
+    """
+    __tablename__ = 'user_search_tokens'
+
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id', ondelete='CASCADE'),
+                        nullable=False, index=True)
+    field = db.Column(db.String(10), nullable=False)  # name | email
+    token = db.Column(db.String(64), nullable=False)
+
+    __table_args__ = (
+        db.Index('ix_user_search_tokens_token_field', 'token', 'field'),
+    )
+
+    @staticmethod
+    def matching_user_ids(term):
+        """Query of user ids whose name or email contains the search term.
+
+        The term matches a field when every trigram of it is present in that
+        field, so terms longer than a trigram can match false positives
+        (callers re-check the decrypted values) but never miss a real match.
+        Returns None for terms shorter than BLIND_INDEX_GRAM, which can't be
+        searched."""
+        if len((term or '').strip()) < BLIND_INDEX_GRAM:
+            return None
+        per_field = {field: blind_index_query_tokens(term, field) for field in SEARCHABLE_FIELDS}
+        needed = len(per_field[SEARCHABLE_FIELDS[0]])
+        return (
+            db.session.query(UserSearchToken.user_id)
+            .filter(db.or_(*[
+                db.and_(UserSearchToken.field == field, UserSearchToken.token.in_(tokens))
+                for field, tokens in per_field.items()
+            ]))
+            .group_by(UserSearchToken.user_id, UserSearchToken.field)
+            .having(db.func.count(db.distinct(UserSearchToken.token)) == needed)
+        )
+
+    def __repr__(self):
+        return f'<UserSearchToken user={self.user_id} field={self.field}>'
@@ -15,8 +15,9 @@ def admin_required(f):
     """Decorator that requires the authenticated user to be an admin."""
     @wraps(f)
     def wrapper(*args, **kwargs):
-        user = User.query.get(g.user_id)
-        if not user or not user.is_admin:
+        # token_required already loaded the account flags
+        status = g.get('auth_status') or User.auth_status(g.user_id)
+        if not status or not status.is_admin:
             return jsonify({'error': 'Admin access required'}), 403
         return f(*args, **kwargs)
     return wrapper
@@ -31,4 +32,5 @@ from . import call_list  # noqa: E402, F401
 from . import email_templates  # noqa: E402, F401
 from . import unions     # noqa: E402, F401
 from . import exports    # noqa: E402, F401
+from . import export_jobs  # noqa: E402, F401
 from . import cuff_requests  # noqa: E402, F401
@@ -3,10 +3,15 @@ import logging
 from datetime import datetime, timedelta, timezone
 from flask import request, jsonify, g
 from sqlalchemy import func, or_
+from sqlalchemy.orm import contains_eager, joinedload
 from app import db
-from app.models import User, BloodPressureReading, CallListItem, CallAttempt
+from app.models import User, BloodPressureReading, CallListItem, CallAttempt, UserReadingStats
 from app.utils.auth import token_required
 from app.utils.audit_logger import audit_log
+from app.utils.call_list import mark_due, rebuild_call_list, refresh_call_list as refresh_due_call_list
+from app.utils.display_names import resolve_user_display_names
+from app.utils.email_sender import email_delivery_configured, send_email
+from app.utils.pagination import keyset_page
 from . import admin_bp, admin_required
 
 logger = logging.getLogger(__name__)
@@ -20,154 +25,84 @@ AUTO_CLOSE_THRESHOLD = 3
 COOLDOWN_DAYS = 14
 
 
-def _evaluate_call_list():
-    """
-    Batch-evaluate all active+approved users and create/update CallListItem records.
-    Nurse: systolic >= 150 OR diastolic >= 86 (7-day avg)
-    Coach: systolic 135-149 OR diastolic 80-87 (but NOT nurse-level)
-    No-Reading: no readings in 30+ days (or never)
-    """
-    now = datetime.now(timezone.utc)
-    seven_days_ago = now - timedelta(days=7)
-    thirty_days_ago = now - timedelta(days=30)
-
-    # Get all active, non-admin users
-    users = User.query.filter(User.user_status == 'active', User.is_admin == False).all()
-
-    # Batch-load all readings from last 7 days in 1 query
-    recent_readings = (
-        BloodPressureReading.query
-        .filter(BloodPressureReading.reading_date >= seven_days_ago)
-        .all()
-    )
+@admin_bp.route('/call-list/refresh', methods=['POST'])
+@token_required
+@admin_required
+def refresh_call_list():
+    """Re-evaluate users whose assignment may have changed and update call list items.
+
+    ?full=true re-scores every active user instead (consistency check)."""
+    full = request.args.get('full', '').lower() in ('1', 'true', 'yes')
+    evaluated, count = rebuild_call_list() if full else refresh_due_call_list()
+    audit_log('CREATE', 'call_list_refresh',
+              details={'items_created': count, 'users_evaluated': evaluated, 'full': full})
+    return jsonify({
+        'message': f'Refreshed call list, {count} new items created',
+        'count': count,
+        'evaluated': evaluated,
+    }), 200
 
-    # Also get the latest reading date per user (for no-reading check)
-    latest_per_user_q = (
+
+def _admin_name(names, admin_id):
+    """Display name for an attempt's admin from resolve_user_display_names output."""
+    return names.get(admin_id) or 'Admin'
+
+
+def _latest_readings(user_ids):
+    """{user_id: most recent BloodPressureReading} in one windowed query."""
+    R = BloodPressureReading
+    rn = func.row_number().over(partition_by=R.user_id, order_by=(R.reading_date.desc(), R.id.desc())).label('rn')
+    ranked = db.session.query(R.id, rn).filter(R.user_id.in_(user_ids)).subquery()
+    readings = R.query.join(ranked, R.id == ranked.c.id).filter(ranked.c.rn == 1).all()
+    return {r.user_id: r for r in readings}
+
+
+def _attempt_summaries(item_ids):
+    """{item_id: (attempt_count, last CallAttempt)} in one windowed query."""
+    A = CallAttempt
+    partition = A.call_list_item_id
+    ranked = (
         db.session.query(
-            BloodPressureReading.user_id,
-            func.max(BloodPressureReading.reading_date).label('latest_date')
+            A.id,
+            func.row_number().over(partition_by=partition, order_by=(A.created_at.desc(), A.id.desc())).label('rn'),
+            func.count(A.id).over(partition_by=partition).label('attempt_count'),
         )
-        .group_by(BloodPressureReading.user_id)
-        .all()
+        .filter(A.call_list_item_id.in_(item_ids))
+        .subquery()
     )
-    latest_date_map = {row.user_id: row.latest_date for row in latest_per_user_q}
-
-    # Group 7-day readings by user
-    readings_by_user = {}
-    for r in recent_readings:
-        readings_by_user.setdefault(r.user_id, []).append(r)
-
-    # Get existing open items and cooldowns
-    open_items = CallListItem.query.filter_by(status='open').all()
-    open_item_map = {}
-    for item in open_items:
-        open_item_map.setdefault(item.user_id, {})[item.list_type] = item
-
-    cooldown_items = (
-        CallListItem.query
-        .filter(CallListItem.cooldown_until > now)
+    rows = (
+        db.session.query(A, ranked.c.attempt_count)
+        .join(ranked, A.id == ranked.c.id)
+        .filter(ranked.c.rn == 1)
         .all()
     )
-    cooldown_map = {}
-    for item in cooldown_items:
-        cooldown_map.setdefault(item.user_id, set()).add(item.list_type)
-
-    count = 0
-
-    for user in users:
-        user_readings = readings_by_user.get(user.id, [])
-        latest_date = latest_date_map.get(user.id)
-
-        # Calculate 7-day averages
-        avg_sys = None
-        avg_dia = None
-        if user_readings:
-            avg_sys = round(sum(r.systolic for r in user_readings) / len(user_readings))
-            avg_dia = round(sum(r.diastolic for r in user_readings) / len(user_readings))
-
-        assigned_list = None
-        priority = 'medium'
-        priority_title = ''
-        priority_detail = ''
-
-        # Nurse criteria: systolic >= 150 OR diastolic >= 86
-        if avg_sys is not None and (avg_sys >= 150 or avg_dia >= 86):
-            assigned_list = 'nurse'
-            priority = 'high'
-            priority_title = 'Elevated BP — Nurse Review'
-            if avg_sys >= 150:
-                priority_detail = f'7-day avg: {avg_sys}/{avg_dia} (systolic >= 150)'
-            else:
-                priority_detail = f'7-day avg: {avg_sys}/{avg_dia} (diastolic >= 86)'
-
-        # Coach criteria: systolic 135-149 OR diastolic 80-87 (not nurse)
-        elif avg_sys is not None and (135 <= avg_sys <= 149 or 80 <= avg_dia <= 87):
-            assigned_list = 'coach'
-            priority = 'medium'
-            priority_title = 'Elevated BP — HTN Coach'
-            priority_detail = f'7-day avg: {avg_sys}/{avg_dia}'
-
-        # No-reading criteria: last reading > 30 days ago or never
-        if assigned_list is None:
-            if latest_date is None or latest_date < thirty_days_ago:
-                assigned_list = 'no_reading'
-                priority = 'low'
-                priority_title = 'No Recent Readings'
-                if latest_date:
-                    days_since = (now - latest_date).days
-                    priority_detail = f'Last reading: {days_since} days ago ({latest_date.strftime("%b %d, %Y")})'
-                else:
-                    priority_detail = 'No readings ever submitted'
-
-        if assigned_list is None:
-            continue
-
-        # Skip if in cooldown for this list type
-        if user.id in cooldown_map and assigned_list in cooldown_map[user.id]:
-            continue
+    return {attempt.call_list_item_id: (count, attempt) for attempt, count in rows}
 
-        # Skip if already has open item on this list
-        if user.id in open_item_map and assigned_list in open_item_map[user.id]:
-            # Update priority info on existing item
-            existing = open_item_map[user.id][assigned_list]
-            existing.priority = priority
-            existing.priority_title = priority_title
-            existing.priority_detail = priority_detail
-            continue
 
-        # Create new item
-        item = CallListItem(
-            user_id=user.id,
-            list_type=assigned_list,
-            status='open',
-            priority=priority,
-            priority_title=priority_title,
-            priority_detail=priority_detail,
-        )
-        db.session.add(item)
-        count += 1
-
-    db.session.commit()
-    return count
-
-
-@admin_bp.route('/call-list/refresh', methods=['POST'])
-@token_required
-@admin_required
-def refresh_call_list():
-    """Re-evaluate all users and update call list items."""
-    count = _evaluate_call_list()
-    audit_log('CREATE', 'call_list_refresh', details={'items_created': count})
-    return jsonify({'message': f'Refreshed call list, {count} new items created', 'count': count}), 200
+def _call_list_summary():
+    """Open item counts per list type in one GROUP BY."""
+    counts = dict(
+        db.session.query(CallListItem.list_type, func.count(CallListItem.id))
+        .filter(CallListItem.status == 'open')
+        .group_by(CallListItem.list_type)
+        .all()
+    )
+    return {list_type: counts.get(list_type, 0) for list_type in ('nurse', 'coach', 'no_reading')}
 
 
 @admin_bp.route('/call-list', methods=['GET'])
 @token_required
 @admin_required
 def get_call_list():
-    """Get call list items with filters. Returns enriched data for each item."""
+    """Get call list items with filters. Returns enriched data for each item.
+
+    Pass page (and optionally per_page, max 200) to paginate; without them
+    every matching item is returned. Runs a fixed number of queries however
+    long the list is."""
     list_type = request.args.get('list_type', 'nurse')
     status = request.args.get('status', 'open')
+    page = request.args.get('page', type=int)
+    per_page = min(max(request.args.get('per_page', 50, type=int), 1), 200)
 
     query = CallListItem.query
 
@@ -183,127 +118,85 @@ def get_call_list():
             (CallListItem.priority == 'low', 2),
         ),
         CallListItem.created_at.desc(),
+        CallListItem.id.desc(),
     )
 
-    items = query.all()
-
-    # Batch-load user data and readings
-    user_ids = list(set(i.user_id for i in items))
-    users_map = {}
-    for u in User.query.filter(User.id.in_(user_ids)).all():
-        users_map[u.id] = u
+    if page:
+        page = max(page, 1)
+        total = query.order_by(None).count()
+        query = query.offset((page - 1) * per_page).limit(per_page)
 
-    # Get readings for all these users
-    now = datetime.now(timezone.utc)
-    seven_days_ago = now - timedelta(days=7)
-    thirty_days_ago = now - timedelta(days=30)
+    items = query.options(joinedload(CallListItem.patient).joinedload(User.union)).all()
+    if not page:
+        total = len(items)
 
-    all_readings = (
-        BloodPressureReading.query
-        .filter(BloodPressureReading.user_id.in_(user_ids))
-        .order_by(BloodPressureReading.reading_date.desc())
-        .all()
-    )
-    readings_by_user = {}
-    for r in all_readings:
-        readings_by_user.setdefault(r.user_id, []).append(r)
-
-    # Get attempt counts per item
-    attempt_counts = {}
-    last_attempts = {}
-    for item in items:
-        attempts = CallAttempt.query.filter_by(call_list_item_id=item.id).order_by(CallAttempt.created_at.desc()).all()
-        attempt_counts[item.id] = len(attempts)
-        if attempts:
-            last_attempts[item.id] = attempts[0]
+    user_ids = list({i.user_id for i in items})
+    users = [i.patient for i in items if i.patient]
+    phi = User.bulk_decrypt({u.id: u for u in users}.values(), fields=('name', 'email', 'phone'))
+    stats_map = UserReadingStats.for_users(user_ids)
+    latest_map = _latest_readings(user_ids) if user_ids else {}
+    attempts_map = _attempt_summaries([i.id for i in items]) if items else {}
+    admin_names = resolve_user_display_names(a.admin_id for _, a in attempts_map.values())
 
     # Build response
     result = []
     for item in items:
-        user = users_map.get(item.user_id)
+        user = item.patient
         if not user:
             continue
 
-        user_readings = readings_by_user.get(item.user_id, [])
-        latest = user_readings[0].to_dict() if user_readings else None
-
-        recent_7 = [r for r in user_readings if r.reading_date and r.reading_date >= seven_days_ago]
-        recent_30 = [r for r in user_readings if r.reading_date and r.reading_date >= thirty_days_ago]
-
-        avg_7 = None
-        if recent_7:
-            avg_7 = {
-                'systolic': round(sum(r.systolic for r in recent_7) / len(recent_7)),
-                'diastolic': round(sum(r.diastolic for r in recent_7) / len(recent_7)),
-            }
+        stats = stats_map.get(item.user_id)
+        latest = latest_map.get(item.user_id)
+        attempt_count, last_attempt = attempts_map.get(item.id, (0, None))
 
-        avg_30 = None
-        if recent_30:
-            avg_30 = {
-                'systolic': round(sum(r.systolic for r in recent_30) / len(recent_30)),
-                'diastolic': round(sum(r.diastolic for r in recent_30) / len(recent_30)),
-            }
-
-        last_attempt = last_attempts.get(item.id)
         last_note = None
         if last_attempt and last_attempt.notes:
             note_text = last_attempt.notes
             last_note = {
                 'text': note_text[:150] + ('...' if len(note_text) > 150 else ''),
-                'admin_name': last_attempt.admin.name if last_attempt.admin else 'Admin',
+                'admin_name': _admin_name(admin_names, last_attempt.admin_id),
                 'date': last_attempt.created_at.isoformat() if last_attempt.created_at else None,
             }
 
-        try:
-            user_data = {
-                'id': user.id,
-                'name': user.name,
-                'email': user.email,
-                'phone': user.phone,
-                'union_name': user.union.name if user.union else None,
-                'gender': user.gender,
-                'rank': user.rank,
-                'created_at': user.created_at.isoformat() if user.created_at else None,
-            }
-        except Exception:
-            user_data = {
-                'id': user.id,
-                'name': f'User #{user.id}',
-                'email': None,
-                'phone': None,
-                'union_name': None,
-                'gender': user.gender,
-                'rank': user.rank,
-                'created_at': user.created_at.isoformat() if user.created_at else None,
-            }
+        user_phi = phi.get(user.id, {})
+        user_data = {
+            'id': user.id,
+            'name': user_phi.get('name') or f'User #{user.id}',
+            'email': user_phi.get('email'),
+            'phone': user_phi.get('phone'),
+            'union_name': user.union.name if user.union else None,
+            'gender': user.gender,
+            'rank': user.rank,
+            'created_at': user.created_at.isoformat() if user.created_at else None,
+        }
 
         item_data = item.to_dict()
         item_data['user'] = user_data
-        item_data['latest_reading'] = latest
-        item_data['avg_7_day'] = avg_7
-        item_data['avg_30_day'] = avg_30
-        item_data['reading_count'] = len(user_readings)
-        item_data['attempt_count'] = attempt_counts.get(item.id, 0)
-        item_data['last_attempt'] = last_attempt.to_dict() if last_attempt else None
+        item_data['latest_reading'] = latest.to_dict() if latest else None
+        item_data['avg_7_day'] = stats.avg_7_day if stats else None
+        item_data['avg_30_day'] = stats.avg_30_day if stats else None
+        item_data['reading_count'] = stats.reading_count if stats else 0
+        item_data['attempt_count'] = attempt_count
+        item_data['last_attempt'] = (last_attempt.to_dict(admin_name=_admin_name(admin_names, last_attempt.admin_id))
+                                     if last_attempt else None)
         item_data['last_note'] = last_note
 
         result.append(item_data)
 
-    # Summary counts
-    all_open = CallListItem.query.filter_by(status='open').all()
-    summary = {
-        'nurse': sum(1 for i in all_open if i.list_type == 'nurse'),
-        'coach': sum(1 for i in all_open if i.list_type == 'coach'),
-        'no_reading': sum(1 for i in all_open if i.list_type == 'no_reading'),
-    }
-
     audit_log('READ', 'call_list', details={'list_type': list_type, 'count': len(result)})
 
-    return jsonify({
+    response = {
         'items': result,
-        'summary': summary,
-        'total_count': len(result),
-    }), 200
+        'summary': _call_list_summary(),
+        'total_count': total,
+    }
+    if page:
+        response.update({
+            'page': page,
+            'per_page': per_page,
+            'pages': (total + per_page - 1) // per_page,
+        })
+    return jsonify(response), 200
 
 
 @admin_bp.route('/call-list/<int:item_id>/attempt', methods=['POST'])
@@ -381,6 +274,7 @@ def log_call_attempt(item_id):
             item.closed_by = g.user_id
             item.cooldown_until = datetime.now(timezone.utc) + timedelta(days=COOLDOWN_DAYS)
             auto_closed = True
+            mark_due([item.user_id])
 
     db.session.commit()
 
@@ -420,6 +314,7 @@ def close_call_item(item_id):
     item.close_note = data.get('note', '').strip() or None
     item.closed_at = datetime.now(timezone.utc)
     item.closed_by = g.user_id
+    mark_due([item.user_id])
     db.session.commit()
 
     audit_log('UPDATE', 'call_list_item', resource_id=str(item_id),
@@ -484,19 +379,52 @@ def get_call_history(user_id):
     audit_log('READ', 'call_history', resource_id=str(user_id),
               details={'count': len(attempts)})
 
-    return jsonify({'attempts': [a.to_dict() for a in attempts]}), 200
+    names = resolve_user_display_names(a.admin_id for a in attempts)
+    return jsonify({'attempts': [a.to_dict(admin_name=_admin_name(names, a.admin_id))
+                                 for a in attempts]}), 200
+
+
+def _call_report_summary():
+    """All-time and last-7-day attempt counts per outcome in one grouped query."""
+    week_ago = datetime.now(timezone.utc).replace(tzinfo=None) - timedelta(days=7)
+    rows = (
+        db.session.query(
+            CallAttempt.outcome,
+            func.count(CallAttempt.id),
+            func.count(CallAttempt.id).filter(CallAttempt.created_at >= week_ago),
+        )
+        .group_by(CallAttempt.outcome)
+        .all()
+    )
+    by_outcome = {o: 0 for o in VALID_OUTCOMES}
+    by_outcome_week = {o: 0 for o in VALID_OUTCOMES}
+    for outcome, total, week in rows:
+        by_outcome[outcome] = total
+        by_outcome_week[outcome] = week
+    return {
+        'total_all': sum(by_outcome.values()),
+        'total_week': sum(by_outcome_week.values()),
+        'by_outcome': by_outcome,
+        'by_outcome_week': by_outcome_week,
+    }
 
 
 @admin_bp.route('/call-reports', methods=['GET'])
 @token_required
 @admin_required
 def get_call_reports():
-    """Get all call attempts with filters for reporting."""
+    """Get call attempts with filters for reporting, newest first.
+
+    Keyset-paginated: pass the previous response's next_cursor as cursor.
+    list_type and outcome accept comma-separated values. total_count is only
+    computed for the first page."""
     date_from = request.args.get('date_from')
     date_to = request.args.get('date_to')
     list_type = request.args.get('list_type')
     outcome = request.args.get('outcome')
     admin_id = request.args.get('admin_id', type=int)
+    cursor = request.args.get('cursor')
+    limit = min(max(request.args.get('limit', 50, type=int), 1), 200)
 
     query = CallAttempt.query.join(CallListItem, CallAttempt.call_list_item_id == CallListItem.id)
 
@@ -515,54 +443,41 @@ def get_call_reports():
             return jsonify({'error': 'Invalid date_to format. Use YYYY-MM-DD'}), 400
 
     if list_type:
-        query = query.filter(CallListItem.list_type == list_type)
+        query = query.filter(CallListItem.list_type.in_(list_type.split(',')))
 
     if outcome:
-        query = query.filter(CallAttempt.outcome == outcome)
+        query = query.filter(CallAttempt.outcome.in_(outcome.split(',')))
 
     if admin_id:
         query = query.filter(CallAttempt.admin_id == admin_id)
 
-    query = query.order_by(CallAttempt.created_at.desc())
-    attempts = query.all()
+    total_count = None if cursor else query.count()
+
+    try:
+        attempts, next_cursor = keyset_page(
+            query.options(contains_eager(CallAttempt.call_list_item)),
+            (CallAttempt.created_at, CallAttempt.id), cursor, limit,
+        )
+    except ValueError:
+        return jsonify({'error': 'Invalid cursor'}), 400
 
     # Build enriched results
-    user_cache = {}
+    names = resolve_user_display_names(
+        [a.user_id for a in attempts] + [a.admin_id for a in attempts])
     results = []
     for a in attempts:
-        # Get patient name
-        if a.user_id not in user_cache:
-            u = User.query.get(a.user_id)
-            try:
-                user_cache[a.user_id] = u.name if u else f'User #{a.user_id}'
-            except Exception:
-                user_cache[a.user_id] = f'User #{a.user_id}'
-
-        attempt_data = a.to_dict()
-        attempt_data['patient_name'] = user_cache.get(a.user_id, f'User #{a.user_id}')
-        attempt_data['list_type'] = a.call_list_item.list_type if a.call_list_item else None
+        attempt_data = a.to_dict(admin_name=_admin_name(names, a.admin_id))
+        attempt_data['patient_name'] = names[a.user_id]
+        attempt_data['list_type'] = a.call_list_item.list_type
         results.append(attempt_data)
 
-    # Summary stats
-    now = datetime.now(timezone.utc)
-    week_ago = now - timedelta(days=7)
-    total_all = CallAttempt.query.count()
-    total_week = CallAttempt.query.filter(CallAttempt.created_at >= week_ago).count()
-
-    outcome_counts = {}
-    for o in VALID_OUTCOMES:
-        outcome_counts[o] = CallAttempt.query.filter_by(outcome=o).count()
-
     audit_log('READ', 'call_reports', details={'count': len(results)})
 
     return jsonify({
         'attempts': results,
-        'total_count': len(results),
-        'summary': {
-            'total_all': total_all,
-            'total_week': total_week,
-            'by_outcome': outcome_counts,
-        },
+        'total_count': total_count,
+        'next_cursor': next_cursor,
+        'summary': _call_report_summary(),
     }), 200
 
 
@@ -586,46 +501,19 @@ def send_email_to_patient(item_id):
     if not to_email or not subject or not body:
         return jsonify({'error': 'to, subject, and body are required'}), 400
 
-    # Attempt to send email via Flask-Mail or smtplib
+    # Send through the configured email backend (pooled SMTP or SendGrid);
+    # the console backend would only print the patient's email to stdout
     email_sent = False
     email_error = None
-    try:
-        from flask_mail import Message
-        from flask import current_app
-        mail = current_app.extensions.get('mail')
-        if mail:
-            msg = Message(subject=subject, recipients=[to_email], body=body)
-            mail.send(msg)
-            email_sent = True
-    except ImportError:
-        # Flask-Mail not installed — try smtplib
+    if not email_delivery_configured():
+        email_error = 'Email delivery not configured'
+    else:
         try:
-            import smtplib
-            from email.mime.text import MIMEText
-            import os
-            smtp_host = os.getenv('SMTP_HOST')
-            smtp_port = int(os.getenv('SMTP_PORT', '587'))
-            smtp_user = os.getenv('SMTP_USER')
-            smtp_pass = os.getenv('SMTP_PASS')
-            smtp_from = os.getenv('SMTP_FROM', smtp_user)
-            if smtp_host and smtp_user:
-                msg = MIMEText(body)
-                msg['Subject'] = subject
-                msg['From'] = smtp_from
-                msg['To'] = to_email
-                with smtplib.SMTP(smtp_host, smtp_port) as server:
-                    server.starttls()
-                    server.login(smtp_user, smtp_pass)
-                    server.send_message(msg)
-                email_sent = True
-            else:
-                email_error = 'SMTP not configured'
+            send_email(to_email, subject, body)
+            email_sent = True
         except Exception as e:
-            logger.error(f"SMTP error sending email: {e}")
+            logger.error(f"Error sending email for call list item {item_id}: {e}")
             email_error = 'Failed to send email'
-    except Exception as e:
-        logger.error(f"Email preparation error: {e}")
-        email_error = 'Failed to send email'
 
     # Log the attempt regardless of send success
     attempt = CallAttempt(
@@ -647,6 +535,6 @@ def send_email_to_patient(item_id):
     }
     if email_error:
         response['email_error'] = email_error
-        response['message'] = 'Email attempt logged but delivery failed. Check SMTP configuration.'
+        response['message'] = 'Email attempt logged but delivery failed. Check the email backend configuration.'
 
     return jsonify(response), 201
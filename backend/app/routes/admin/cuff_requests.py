@@ -2,62 +2,76 @@
 import logging
 from datetime import datetime, timezone
 from flask import request, jsonify, g
+from sqlalchemy import func
 from app import db
-from app.models import User, CuffRequest
+from app.models import CuffRequest
 from app.utils.auth import token_required
 from app.utils.audit_logger import audit_log
+from app.utils.cache import clear_on_commit
+from app.utils.display_names import resolve_user_display_names, resolve_user_field
+from app.utils.outbox import enqueue
+from app.utils.pagination import paginate, total_cache, wants_total
 from . import admin_bp, admin_required
 
 logger = logging.getLogger(__name__)
 
+clear_on_commit(total_cache, CuffRequest, attrs=('status',))
+
 
 @admin_bp.route('/cuff-requests', methods=['GET'])
 @token_required
 @admin_required
 def list_cuff_requests():
-    """List all cuff requests with filters."""
+    """List all cuff requests with filters, newest first.
+
+    Pass cursor (empty for the first page, then the previous next_cursor)
+    for keyset paging; limit/offset still work. total_count is only computed
+    for the first page in cursor mode, or never with include_total=false."""
     status_filter = request.args.get('status')
     limit = request.args.get('limit', 50, type=int)
     offset = request.args.get('offset', 0, type=int)
+    cursor = request.args.get('cursor')
 
-    limit = min(limit, 200)
+    limit = min(max(limit, 1), 200)
 
     query = CuffRequest.query
 
     if status_filter:
         query = query.filter_by(status=status_filter)
 
-    query = query.order_by(CuffRequest.created_at.desc())
-
-    total_count = query.count()
-    requests = query.offset(offset).limit(limit).all()
+    try:
+        requests, next_cursor, total_count = paginate(
+            query, (CuffRequest.created_at, CuffRequest.id), cursor=cursor, offset=offset,
+            limit=limit, with_total=wants_total(request.args))
+    except ValueError:
+        return jsonify({'error': 'Invalid cursor'}), 400
 
     # Build response with user info
+    user_ids = [req.user_id for req in requests]
+    names = resolve_user_display_names(user_ids)
+    emails = resolve_user_field(user_ids, 'email')
     result = []
     for req in requests:
         req_data = req.to_dict(include_address=True)
-        if req.user:
-            try:
-                req_data['user_name'] = req.user.name
-                req_data['user_email'] = req.user.email
-            except Exception:
-                req_data['user_name'] = f'User #{req.user_id}'
-                req_data['user_email'] = None
+        req_data['user_name'] = names[req.user_id]
+        req_data['user_email'] = emails[req.user_id]
         result.append(req_data)
 
-    # Summary counts
-    summary = {
-        'pending': CuffRequest.query.filter_by(status='pending').count(),
-        'approved': CuffRequest.query.filter_by(status='approved').count(),
-        'shipped': CuffRequest.query.filter_by(status='shipped').count(),
-        'delivered': CuffRequest.query.filter_by(status='delivered').count(),
-    }
+    # Summary counts, one GROUP BY
+    by_status = dict(
+        db.session.query(CuffRequest.status, func.count(CuffRequest.id))
+        .group_by(CuffRequest.status)
+        .all()
+    )
+    summary = {status: by_status.get(status, 0)
+               for status in ('pending', 'approved', 'shipped', 'delivered')}
 
     audit_log('READ', 'cuff_requests', details={'count': len(result)})
 
     return jsonify({
         'requests': result,
         'total_count': total_count,
+        'next_cursor': next_cursor,
         'summary': summary,
     }), 200
 
@@ -83,15 +97,9 @@ def approve_cuff_request(request_id):
     if data.get('admin_notes'):
         cuff_request.admin_notes = data['admin_notes']
 
+    enqueue('cuff_approved_push', user_id=cuff_request.user_id)
     db.session.commit()
 
-    # Send notification
-    try:
-        from app.utils.push_notifications import notify_cuff_approved
-        notify_cuff_approved(cuff_request.user_id)
-    except Exception as e:
-        logger.warning(f"Failed to send cuff approval notification: {e}")
-
     audit_log('UPDATE', 'cuff_request', resource_id=str(request_id),
               details={'action': 'approve', 'admin_id': g.user_id})
 
@@ -127,23 +135,10 @@ def ship_cuff_request(request_id):
     if data.get('admin_notes'):
         cuff_request.admin_notes = data['admin_notes']
 
+    enqueue('cuff_shipped_push', cuff_request_id=cuff_request.id)
+    enqueue('cuff_shipped_email', cuff_request_id=cuff_request.id)
     db.session.commit()
 
-    # Send notification and email
-    try:
-        from app.utils.push_notifications import notify_cuff_shipped
-        notify_cuff_shipped(cuff_request.user_id, tracking_number)
-    except Exception as e:
-        logger.warning(f"Failed to send cuff shipped notification: {e}")
-
-    try:
-        from app.utils.email_sender import send_cuff_shipped_email
-        user = User.query.get(cuff_request.user_id)
-        if user:
-            send_cuff_shipped_email(user.email, user.name, tracking_number)
-    except Exception as e:
-        logger.warning(f"Failed to send cuff shipped email: {e}")
-
     audit_log('UPDATE', 'cuff_request', resource_id=str(request_id),
               details={'action': 'ship', 'tracking_number': tracking_number})
 
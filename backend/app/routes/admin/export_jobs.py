@@ -0,0 +1,165 @@
+"""Admin background export jobs: submit, poll progress, download."""
+import os
+from datetime import datetime, timezone
+from flask import request, jsonify, g, Response
+from werkzeug.datastructures import MultiDict
+from app.models import User, ExportJob
+from app.utils.auth import token_required
+from app.utils.audit_logger import audit_log
+from app.utils.encryption import iter_phi_file
+from app.utils.export import (
+    iter_batches, iter_users_csv, iter_readings_csv, iter_call_reports_csv, iter_patient_pdfs_zip,
+)
+from app.utils.export_jobs import (
+    exporter, export_kinds, submit_export, artifact_path, is_expired, sweep_export_jobs,
+)
+from . import admin_bp, admin_required
+from .exports import (
+    _users_export_query, _users_export_batches, _readings_export_query,
+    _call_reports_export_query, _name_resolver, _patient_pdf, _bulk_pdf_user_ids, has_pdf_selection,
+)
+
+
+def _timestamped(prefix, ext):
+    return f'{prefix}_{datetime.now(timezone.utc).strftime("%Y%m%d_%H%M%S")}.{ext}'
+
+
+def _write_csv(out, chunks):
+    for chunk in chunks:
+        out.write(chunk.encode('utf-8'))
+
+
+@exporter('users_csv')
+def _users_csv_job(params, out, progress):
+    args = MultiDict(params)
+    progress.total(_users_export_query(args).order_by(None).count())
+    _write_csv(out, iter_users_csv(progress.track(_users_export_batches(args)), include_phi=True))
+    return _timestamped('users_export', 'csv'), 'text/csv'
+
+
+@exporter('readings_csv')
+def _readings_csv_job(params, out, progress):
+    query = _readings_export_query(MultiDict(params))
+    progress.total(query.order_by(None).count())
+    _write_csv(out, iter_readings_csv(progress.track(iter_batches(query)), _name_resolver()))
+    return _timestamped('readings_export', 'csv'), 'text/csv'
+
+
+@exporter('call_reports_csv')
+def _call_reports_csv_job(params, out, progress):
+    query = _call_reports_export_query(MultiDict(params))
+    progress.total(query.order_by(None).count())
+    _write_csv(out, iter_call_reports_csv(progress.track(iter_batches(query)), _name_resolver()))
+    return _timestamped('call_reports_export', 'csv'), 'text/csv'
+
+
+@exporter('patient_pdf')
+def _patient_pdf_job(params, out, progress):
+    user = User.query.get(int(params['user_id']))
+    if not user:
+        raise LookupError('User not found')
+    progress.total(1)
+    pdf_output, filename = _patient_pdf(user)
+    out.write(pdf_output.getvalue())
+    progress.advance(1)
+    return filename, 'application/pdf'
+
+
+@exporter('patient_pdf_bulk')
+def _patient_pdf_bulk_job(params, out, progress):
+    user_ids = _bulk_pdf_user_ids(params)
+    progress.total(len(user_ids))
+    for chunk in iter_patient_pdfs_zip(user_ids, progress=progress.advance):
+        out.write(chunk)
+    return _timestamped('patient_reports', 'zip'), 'application/zip'
+
+
+def _own_job(job_id):
+    """The job if the current admin requested it; exports hold PHI, so other
+    admins' jobs are reported as not found."""
+    job = ExportJob.query.get(job_id)
+    return job if job and job.requested_by == g.user_id else None
+
+
+@admin_bp.route('/export/jobs', methods=['POST'])
+@token_required
+@admin_required
+def submit_export_job():
+    """Queue an export. Body: {"kind": ..., "params": {...same filters as the sync export...}}."""
+    data = request.get_json() or {}
+    kind = data.get('kind')
+    params = data.get('params') or {}
+    if kind not in export_kinds():
+        return jsonify({'error': f'kind must be one of: {", ".join(export_kinds())}'}), 400
+    if not isinstance(params, dict):
+        return jsonify({'error': 'params must be an object'}), 400
+    if kind == 'patient_pdf':
+        try:
+            int(params.get('user_id'))
+        except (TypeError, ValueError):
+            return jsonify({'error': 'params.user_id is required'}), 400
+    if kind == 'patient_pdf_bulk' and not has_pdf_selection(params):
+        return jsonify({'error': 'Select patients with user_ids, call_list or users export filters'}), 400
+
+    sweep_export_jobs()
+    job = submit_export(kind, params, g.user_id)
+
+    audit_log('CREATE', 'export_job', resource_id=str(job.id), details={'kind': kind, 'params': params})
+
+    return jsonify(job.to_dict()), 202
+
+
+@admin_bp.route('/export/jobs', methods=['GET'])
+@token_required
+@admin_required
+def list_export_jobs():
+    """Return the current admin's recent export jobs, newest first."""
+    limit = min(request.args.get('limit', 20, type=int), 100)
+    sweep_export_jobs()
+    jobs = (ExportJob.query
+            .filter_by(requested_by=g.user_id)
+            .order_by(ExportJob.created_at.desc())
+            .limit(limit)
+            .all())
+    return jsonify({'jobs': [j.to_dict() for j in jobs]}), 200
+
+
+@admin_bp.route('/export/jobs/<int:job_id>', methods=['GET'])
+@token_required
+@admin_required
+def get_export_job(job_id):
+    """Poll an export job's status and progress."""
+    sweep_export_jobs()
+    job = _own_job(job_id)
+    if not job:
+        return jsonify({'error': 'Export job not found'}), 404
+    return jsonify(job.to_dict()), 200
+
+
+@admin_bp.route('/export/jobs/<int:job_id>/download', methods=['GET'])
+@token_required
+@admin_required
+def download_export_job(job_id):
+    """Download a finished export's artifact."""
+    job = _own_job(job_id)
+    if not job:
+        return jsonify({'error': 'Export job not found'}), 404
+    if job.status != 'succeeded':
+        return jsonify({'error': f'Export job is {job.status}'}), 409
+    path = artifact_path(job)
+    if not path or not os.path.exists(path) or is_expired(job):
+        return jsonify({'error': 'Export artifact has expired'}), 410
+    try:
+        chunks = iter_phi_file(path)
+    except ValueError:
+        # Written before artifacts were encrypted; regenerate the export
+        return jsonify({'error': 'Export artifact has expired'}), 410
+
+    audit_log('EXPORT_DOWNLOAD', job.kind, resource_id=str(job.id))
+
+    return Response(
+        chunks,
+        mimetype=job.mimetype,
+        headers={'Content-Disposition': f'attachment; filename={job.download_name}',
+                 'Content-Length': str(job.size_bytes)},
+    )
@@ -1,35 +1,93 @@
 """Admin data export routes."""
-import re
+import io
+import os
 from datetime import datetime, timedelta, timezone
-from flask import request, jsonify, Response
+from flask import request, jsonify, g, Response, stream_with_context
+from sqlalchemy.orm import contains_eager, joinedload
+from werkzeug.datastructures import MultiDict
 from app import db
 from app.models import User, BloodPressureReading, CallListItem, CallAttempt
+from app.models.reading import parse_bp_categories
 from app.utils.auth import token_required
 from app.utils.audit_logger import audit_log
-from app.utils.export import generate_users_csv, generate_readings_csv, generate_call_reports_csv, generate_patient_pdf
+from app.utils.display_names import resolve_user_display_names
+from app.utils.export_jobs import submit_export
+from app.utils.export import (
+    iter_batches, iter_users_csv, iter_readings_csv, iter_call_reports_csv,
+    prefetch_patient_reports, render_patient_pdf, patient_pdf_filename, iter_patient_pdfs_zip,
+)
 from . import admin_bp, admin_required
 
 
-@admin_bp.route('/export/users', methods=['GET'])
-@token_required
-@admin_required
-def export_users():
-    """Export users to CSV with optional filters."""
-    # Apply same filters as list_users
-    status_filter = request.args.get('status')
-    gender_filter = request.args.get('gender', '').strip()
-    race_filter = request.args.get('race', '').strip()
-    rank_filter = request.args.get('rank', '').strip()
-    work_status_filter = request.args.get('work_status', '').strip()
-    union_id_filter = request.args.get('union_id', '').strip()
-
-    # Age filters
-    age_min = request.args.get('age_min', type=int)
-    age_max = request.args.get('age_max', type=int)
+def _name_resolver():
+    """Return resolve(user_ids) -> {user_id: name} for a streaming export.
+
+    The export keeps its own cache, so names are fetched once per export in
+    one query per batch that selects just the encrypted name column."""
+    names = {}
+
+    def resolve(user_ids):
+        return resolve_user_display_names(user_ids, cache=names)
+
+    return resolve
+
+
+def _filter_by_age(batches, age_min, age_max):
+    """Drop users outside the age range from each batch (requires DOB decryption)."""
+    now = datetime.now(timezone.utc).replace(tzinfo=None)  # DOBs parse as naive dates
+    for users in batches:
+        dobs = User.bulk_decrypt(users, fields=('dob',))
+        kept = []
+        for user in users:
+            try:
+                user_dob = dobs[user.id]['dob']
+                if user_dob:
+                    dob = datetime.strptime(user_dob, '%Y-%m-%d')
+                    age = (now - dob).days // 365
+                    if age_min is not None and age < age_min:
+                        continue
+                    if age_max is not None and age > age_max:
+                        continue
+                kept.append(user)
+            except Exception:
+                kept.append(user)  # Include if DOB can't be parsed
+        yield kept
+
+
+def _csv_response(chunks, resource_type, filename_prefix, progress):
+    """Stream CSV chunks, audit-logging the exported row count when done."""
+    def generate():
+        complete = False
+        try:
+            yield from chunks
+            complete = True
+        finally:
+            details = {'count': progress.get('rows', 0)}
+            if not complete:
+                details['complete'] = False
+            audit_log('EXPORT', resource_type, details=details)
+
+    filename = f'{filename_prefix}_{datetime.now(timezone.utc).strftime("%Y%m%d_%H%M%S")}.csv'
+    return Response(
+        stream_with_context(generate()),
+        mimetype='text/csv',
+        headers={'Content-Disposition': f'attachment; filename={filename}'}
+    )
+
+
+def _users_export_query(args):
+    """Users matching the export filters, newest first."""
+    # Same filters as list_users
+    status_filter = args.get('status')
+    gender_filter = args.get('gender', '').strip()
+    race_filter = args.get('race', '').strip()
+    rank_filter = args.get('rank', '').strip()
+    work_status_filter = args.get('work_status', '').strip()
+    union_id_filter = args.get('union_id', '').strip()
 
     # Date registered filters
-    registered_from = request.args.get('registered_from')
-    registered_to = request.args.get('registered_to')
+    registered_from = args.get('registered_from')
+    registered_to = args.get('registered_to')
 
     query = User.query
 
@@ -70,52 +128,45 @@ def export_users():
         except ValueError:
             pass
 
-    users = query.order_by(User.created_at.desc()).all()
-
-    # Filter by age if specified (requires DOB decryption)
-    if age_min is not None or age_max is not None:
-        now = datetime.now(timezone.utc)
-        filtered_users = []
-        for user in users:
-            try:
-                if user.dob:
-                    dob = datetime.strptime(user.dob, '%Y-%m-%d')
-                    age = (now - dob).days // 365
-                    if age_min is not None and age < age_min:
-                        continue
-                    if age_max is not None and age > age_max:
-                        continue
-                filtered_users.append(user)
-            except Exception:
-                filtered_users.append(user)  # Include if DOB can't be parsed
-        users = filtered_users
-
-    csv_output = generate_users_csv(users, include_phi=True)
+    return query.options(joinedload(User.union)).order_by(User.created_at.desc())
 
-    audit_log('EXPORT', 'users_csv', details={'count': len(users)})
 
-    return Response(
-        csv_output.getvalue(),
-        mimetype='text/csv',
-        headers={'Content-Disposition': f'attachment; filename=users_export_{datetime.now(timezone.utc).strftime("%Y%m%d_%H%M%S")}.csv'}
-    )
+def _users_export_batches(args):
+    """Batches of users to export, after the age filter (requires DOB decryption)."""
+    batches = iter_batches(_users_export_query(args))
+    age_min = args.get('age_min', type=int)
+    age_max = args.get('age_max', type=int)
+    if age_min is not None or age_max is not None:
+        batches = _filter_by_age(batches, age_min, age_max)
+    return batches
 
 
-@admin_bp.route('/export/readings', methods=['GET'])
+@admin_bp.route('/export/users', methods=['GET'])
 @token_required
 @admin_required
-def export_readings():
-    """Export readings to CSV with filters."""
-    user_id_filter = request.args.get('user_id', type=int)
-    from_date = request.args.get('from_date')
-    to_date = request.args.get('to_date')
-    union_id_filter = request.args.get('union_id', '').strip()
+def export_users():
+    """Export users to CSV with optional filters."""
+    progress = {}
+    chunks = iter_users_csv(_users_export_batches(request.args), include_phi=True, progress=progress)
+    return _csv_response(chunks, 'users_csv', 'users_export', progress)
+
+
+def _readings_export_query(args):
+    """Readings matching the export filters, newest first."""
+    user_id_filter = args.get('user_id', type=int)
+    from_date = args.get('from_date')
+    to_date = args.get('to_date')
+    union_id_filter = args.get('union_id', '').strip()
+    bp_category_filter = args.get('bp_category', '').strip()
 
     query = BloodPressureReading.query
 
     if user_id_filter:
         query = query.filter_by(user_id=user_id_filter)
 
+    if bp_category_filter:
+        query = query.filter(BloodPressureReading.bp_category.in_(parse_bp_categories(bp_category_filter)))
+
     if from_date:
         try:
             from_dt = datetime.strptime(from_date, '%Y-%m-%d')
@@ -137,37 +188,26 @@ def export_readings():
         except ValueError:
             pass
 
-    readings = query.order_by(BloodPressureReading.reading_date.desc()).all()
-
-    # Build user name cache
-    user_ids = list(set(r.user_id for r in readings))
-    user_names = {}
-    for user in User.query.filter(User.id.in_(user_ids)).all():
-        try:
-            user_names[user.id] = user.name or f'User #{user.id}'
-        except Exception:
-            user_names[user.id] = f'User #{user.id}'
-
-    csv_output = generate_readings_csv(readings, user_names)
-
-    audit_log('EXPORT', 'readings_csv', details={'count': len(readings)})
+    return query.order_by(BloodPressureReading.reading_date.desc())
 
-    return Response(
-        csv_output.getvalue(),
-        mimetype='text/csv',
-        headers={'Content-Disposition': f'attachment; filename=readings_export_{datetime.now(timezone.utc).strftime("%Y%m%d_%H%M%S")}.csv'}
-    )
 
-
-@admin_bp.route('/export/call-reports', methods=['GET'])
+@admin_bp.route('/export/readings', methods=['GET'])
 @token_required
 @admin_required
-def export_call_reports():
-    """Export call reports to CSV with filters."""
-    date_from = request.args.get('date_from')
-    date_to = request.args.get('date_to')
-    outcome_filter = request.args.get('outcome')
-    list_type_filter = request.args.get('list_type')
+def export_readings():
+    """Export readings to CSV with filters."""
+    progress = {}
+    chunks = iter_readings_csv(iter_batches(_readings_export_query(request.args)), _name_resolver(),
+                               progress=progress)
+    return _csv_response(chunks, 'readings_csv', 'readings_export', progress)
+
+
+def _call_reports_export_query(args):
+    """Call attempts matching the export filters, newest first."""
+    date_from = args.get('date_from')
+    date_to = args.get('date_to')
+    outcome_filter = args.get('outcome')
+    list_type_filter = args.get('list_type')
 
     query = CallAttempt.query.join(CallListItem)
 
@@ -191,26 +231,68 @@ def export_call_reports():
     if list_type_filter:
         query = query.filter(CallListItem.list_type == list_type_filter)
 
-    attempts = query.order_by(CallAttempt.created_at.desc()).all()
-
-    # Build user name cache
-    user_ids = list(set(a.user_id for a in attempts))
-    user_names = {}
-    for user in User.query.filter(User.id.in_(user_ids)).all():
-        try:
-            user_names[user.id] = user.name or f'User #{user.id}'
-        except Exception:
-            user_names[user.id] = f'User #{user.id}'
-
-    csv_output = generate_call_reports_csv(attempts, user_names)
+    return (
+        query.options(contains_eager(CallAttempt.call_list_item))
+        .order_by(CallAttempt.created_at.desc())
+    )
 
-    audit_log('EXPORT', 'call_reports_csv', details={'count': len(attempts)})
 
-    return Response(
-        csv_output.getvalue(),
-        mimetype='text/csv',
-        headers={'Content-Disposition': f'attachment; filename=call_reports_export_{datetime.now(timezone.utc).strftime("%Y%m%d_%H%M%S")}.csv'}
-    )
+@admin_bp.route('/export/call-reports', methods=['GET'])
+@token_required
+@admin_required
+def export_call_reports():
+    """Export call reports to CSV with filters."""
+    progress = {}
+    chunks = iter_call_reports_csv(iter_batches(_call_reports_export_query(request.args)), _name_resolver(),
+                                   progress=progress)
+    return _csv_response(chunks, 'call_reports_csv', 'call_reports_export', progress)
+
+
+def _patient_pdf(user):
+    """Build a patient's PDF report. Returns (BytesIO, download file name)."""
+    report = prefetch_patient_reports([user.id])[0]
+    return io.BytesIO(render_patient_pdf(report)), patient_pdf_filename(report['name'], user.id)
+
+
+# Most patients a synchronous bulk PDF export renders; larger selections are
+# queued as a patient_pdf_bulk export job
+PDF_EXPORT_SYNC_MAX = int(os.getenv('PDF_EXPORT_SYNC_MAX', 200))
+USERS_EXPORT_FILTERS = ('status', 'gender', 'race', 'rank', 'work_status', 'union_id',
+                        'registered_from', 'registered_to')
+
+
+def has_pdf_selection(params):
+    """Whether a bulk PDF request names its patients: user_ids, call_list or
+    at least one users export filter. An empty selection would mean every
+    patient."""
+    return any(params.get(key) not in (None, '', [])
+               for key in ('user_ids', 'call_list') + USERS_EXPORT_FILTERS)
+
+
+def _bulk_pdf_user_ids(params):
+    """Resolve a bulk PDF selection to user ids.
+
+    params holds either user_ids, call_list (a list type; every patient with
+    an open item on it), or the same filters as the users export.
+
+    Raises:
+        TypeError, ValueError: if user_ids isn't a list of integers
+    """
+    if params.get('user_ids') is not None:
+        if not isinstance(params['user_ids'], list):
+            raise TypeError('user_ids must be a list')
+        ids = [int(uid) for uid in params['user_ids']]
+        found = db.session.query(User.id).filter(User.id.in_(ids)).all()
+        return sorted(row.id for row in found)
+    if params.get('call_list'):
+        rows = (db.session.query(CallListItem.user_id)
+                .filter(CallListItem.status == 'open',
+                        CallListItem.list_type == params['call_list'])
+                .distinct()
+                .all())
+        return sorted(row.user_id for row in rows)
+    args = MultiDict(params)
+    return sorted(u.id for batch in _users_export_batches(args) for u in batch)
 
 
 @admin_bp.route('/export/users/<int:user_id>/pdf', methods=['GET'])
@@ -222,47 +304,65 @@ def export_user_pdf(user_id):
     if not user:
         return jsonify({'error': 'User not found'}), 404
 
-    # Get readings
-    readings = (BloodPressureReading.query
-                .filter_by(user_id=user_id)
-                .order_by(BloodPressureReading.reading_date.desc())
-                .all())
-
-    # Calculate averages
-    now = datetime.now(timezone.utc)
-    seven_days_ago = now - timedelta(days=7)
-    thirty_days_ago = now - timedelta(days=30)
-
-    recent_7 = [r for r in readings if r.reading_date and r.reading_date >= seven_days_ago]
-    recent_30 = [r for r in readings if r.reading_date and r.reading_date >= thirty_days_ago]
-
-    avg_7 = None
-    if recent_7:
-        avg_7 = {
-            'systolic': round(sum(r.systolic for r in recent_7) / len(recent_7)),
-            'diastolic': round(sum(r.diastolic for r in recent_7) / len(recent_7)),
-        }
-
-    avg_30 = None
-    if recent_30:
-        avg_30 = {
-            'systolic': round(sum(r.systolic for r in recent_30) / len(recent_30)),
-            'diastolic': round(sum(r.diastolic for r in recent_30) / len(recent_30)),
-        }
-
-    pdf_output = generate_patient_pdf(user, readings, avg_7, avg_30)
+    pdf_output, filename = _patient_pdf(user)
 
     audit_log('EXPORT', 'patient_pdf', resource_id=str(user_id))
 
-    try:
-        raw_name = user.name.replace(' ', '_') if user.name else f'patient_{user_id}'
-        # Sanitize: allow only alphanumeric, underscore, hyphen
-        patient_name = re.sub(r'[^a-zA-Z0-9_\-]', '', raw_name) or f'patient_{user_id}'
-    except Exception:
-        patient_name = f'patient_{user_id}'
-
     return Response(
         pdf_output.getvalue(),
         mimetype='application/pdf',
-        headers={'Content-Disposition': f'attachment; filename={patient_name}_report_{datetime.now(timezone.utc).strftime("%Y%m%d")}.pdf'}
+        headers={'Content-Disposition': f'attachment; filename={filename}'}
+    )
+
+
+@admin_bp.route('/export/patient-pdfs', methods=['POST'])
+@token_required
+@admin_required
+def export_patient_pdfs():
+    """Stream a ZIP of patient PDF reports.
+
+    Body: {"user_ids": [...]}, {"call_list": "nurse"}, or users export filters.
+    More than PDF_EXPORT_SYNC_MAX patients are queued as an export job
+    instead (202 with the job)."""
+    params = request.get_json(silent=True)
+    if not isinstance(params, dict):
+        return jsonify({'error': 'Request body must be a JSON object'}), 400
+    if not has_pdf_selection(params):
+        return jsonify({'error': 'Select patients with user_ids, call_list or users export filters'}), 400
+    try:
+        user_ids = _bulk_pdf_user_ids(params)
+    except (TypeError, ValueError):
+        return jsonify({'error': 'user_ids must be a list of integers'}), 400
+    if not user_ids:
+        return jsonify({'error': 'No patients match the selection'}), 404
+    if len(user_ids) > PDF_EXPORT_SYNC_MAX:
+        job = submit_export('patient_pdf_bulk', params, g.user_id)
+        audit_log('CREATE', 'export_job', resource_id=str(job.id),
+                  details={'kind': 'patient_pdf_bulk', 'params': params})
+        return jsonify({
+            'message': f'{len(user_ids)} patients selected; the export was queued as a job',
+            'job': job.to_dict(),
+        }), 202
+
+    progress = {'rows': 0}
+
+    def count(rendered):
+        progress['rows'] += rendered
+
+    def generate():
+        complete = False
+        try:
+            yield from iter_patient_pdfs_zip(user_ids, progress=count)
+            complete = True
+        finally:
+            details = {'count': progress['rows'], 'user_ids': user_ids}
+            if not complete:
+                details['complete'] = False
+            audit_log('EXPORT', 'patient_pdf_bulk', details=details)
+
+    filename = f'patient_reports_{datetime.now(timezone.utc).strftime("%Y%m%d_%H%M%S")}.zip'
+    return Response(
+        stream_with_context(generate()),
+        mimetype='application/zip',
+        headers={'Content-Disposition': f'attachment; filename={filename}'}
     )
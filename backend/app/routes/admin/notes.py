@@ -4,6 +4,7 @@ from app import db
 from app.models import User, AdminNote
 from app.utils.auth import token_required
 from app.utils.audit_logger import audit_log
+from app.utils.display_names import resolve_user_display_names
 from . import admin_bp, admin_required
 
 
@@ -24,7 +25,9 @@ def list_notes(id):
     audit_log('READ', 'admin_notes', resource_id=str(id),
               details={'count': len(notes)})
 
-    return jsonify({'notes': [n.to_dict() for n in notes]}), 200
+    names = resolve_user_display_names(n.admin_user_id for n in notes)
+    return jsonify({'notes': [n.to_dict(admin_name=names.get(n.admin_user_id) or 'Admin')
+                              for n in notes]}), 200
 
 
 @admin_bp.route('/users/<int:id>/notes', methods=['POST'])
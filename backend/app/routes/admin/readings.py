@@ -3,31 +3,29 @@ from datetime import datetime, timedelta
 from flask import request, jsonify
 from app import db
 from app.models import User, BloodPressureReading
+from app.models.reading import parse_bp_categories
 from app.utils.auth import token_required
 from app.utils.audit_logger import audit_log
+from app.utils.cache import clear_on_commit
+from app.utils.display_names import resolve_user_display_names
+from app.utils.pagination import paginate, sort_columns, total_cache, wants_total
 from . import admin_bp, admin_required
 
-
-def _classify_bp(systolic, diastolic):
-    """Classify blood pressure reading into a category."""
-    if systolic > 180 or diastolic > 120:
-        return 'Crisis'
-    if systolic >= 140 or diastolic >= 90:
-        return 'Stage 2'
-    if systolic >= 130 or diastolic >= 80:
-        return 'Stage 1'
-    if systolic >= 120 and diastolic < 80:
-        return 'Elevated'
-    return 'Normal'
+clear_on_commit(total_cache, BloodPressureReading)
 
 
 @admin_bp.route('/readings', methods=['GET'])
 @token_required
 @admin_required
 def list_readings():
-    """View readings with filters, sorting, user name join, and pagination."""
+    """View readings with filters, sorting, user name join, and pagination.
+
+    Pass cursor (empty for the first page, then the previous next_cursor)
+    for keyset paging; limit/offset still work. total_count is only computed
+    for the first page in cursor mode, or never with include_total=false."""
     limit = request.args.get('limit', 50, type=int)
     offset = request.args.get('offset', 0, type=int)
+    cursor = request.args.get('cursor')
     user_id_filter = request.args.get('user_id', type=int)
     from_date = request.args.get('from_date')
     to_date = request.args.get('to_date')
@@ -47,7 +45,7 @@ def list_readings():
     sort_by = request.args.get('sort_by', 'reading_date')
     sort_order = request.args.get('sort_order', 'desc')
 
-    limit = min(limit, 200)
+    limit = min(max(limit, 1), 200)
 
     query = BloodPressureReading.query
 
@@ -79,6 +77,9 @@ def list_readings():
     if diastolic_max is not None:
         query = query.filter(BloodPressureReading.diastolic <= diastolic_max)
 
+    if bp_category_filter:
+        query = query.filter(BloodPressureReading.bp_category.in_(parse_bp_categories(bp_category_filter)))
+
     # Join User for union/gender filters and user_name
     needs_join = union_id_filter or gender_filter
     if needs_join:
@@ -94,49 +95,29 @@ def list_readings():
 
     # Sorting
     sort_whitelist = {
-        'reading_date': BloodPressureReading.reading_date,
-        'systolic': BloodPressureReading.systolic,
-        'diastolic': BloodPressureReading.diastolic,
-        'heart_rate': BloodPressureReading.heart_rate,
-        'user_id': BloodPressureReading.user_id,
+        'reading_date': (BloodPressureReading.reading_date, None),
+        'systolic': (BloodPressureReading.systolic, None),
+        'diastolic': (BloodPressureReading.diastolic, None),
+        'heart_rate': (BloodPressureReading.heart_rate, 0),
+        'user_id': (BloodPressureReading.user_id, None),
     }
-    sort_col = sort_whitelist.get(sort_by, BloodPressureReading.reading_date)
-    if sort_order == 'asc':
-        query = query.order_by(sort_col.asc())
-    else:
-        query = query.order_by(sort_col.desc())
+    sort_col, null_value = sort_whitelist.get(sort_by, sort_whitelist['reading_date'])
+    columns, row_key = sort_columns(sort_col, BloodPressureReading.id, null_value)
 
-    # BP category filter requires post-query filtering since it's a derived value
-    if bp_category_filter:
-        categories = [c.strip().lower() for c in bp_category_filter.split(',')]
-        all_readings = query.all()
-        filtered = []
-        for r in all_readings:
-            cat = _classify_bp(r.systolic, r.diastolic).lower()
-            if cat in categories:
-                filtered.append(r)
-        total_count = len(filtered)
-        page = filtered[offset:offset + limit]
-    else:
-        total_count = query.count()
-        page = query.offset(offset).limit(limit).all()
+    try:
+        page, next_cursor, total_count = paginate(
+            query, columns, cursor=cursor, offset=offset, limit=limit,
+            descending=sort_order != 'asc', row_key=row_key,
+            with_total=wants_total(request.args))
+    except ValueError:
+        return jsonify({'error': 'Invalid cursor'}), 400
 
     # Build response with user names
+    user_names = resolve_user_display_names(r.user_id for r in page)
     readings_out = []
-    # Cache user lookups
-    user_cache = {}
     for r in page:
         rd = r.to_dict()
-        if r.user_id not in user_cache:
-            u = User.query.get(r.user_id)
-            if u:
-                try:
-                    user_cache[r.user_id] = u.name or f'User #{r.user_id}'
-                except Exception:
-                    user_cache[r.user_id] = f'User #{r.user_id}'
-            else:
-                user_cache[r.user_id] = f'User #{r.user_id}'
-        rd['user_name'] = user_cache[r.user_id]
+        rd['user_name'] = user_names[r.user_id]
         readings_out.append(rd)
 
     audit_log('READ', 'readings_list',
@@ -150,4 +131,5 @@ def list_readings():
     return jsonify({
         'readings': readings_out,
         'total_count': total_count,
+        'next_cursor': next_cursor,
     }), 200
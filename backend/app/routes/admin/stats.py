@@ -4,7 +4,7 @@ from flask import jsonify
 from app import db
 from app.models import User, BloodPressureReading
 from app.utils.auth import token_required
-from app.utils.audit_logger import audit_log
+from app.utils.audit_logger import audit_log, audit_metrics
 from . import admin_bp, admin_required
 
 
@@ -36,3 +36,11 @@ def get_stats():
         'total_readings': total_readings,
         'readings_today': readings_today,
     }), 200
+
+
+@admin_bp.route('/audit-log/metrics', methods=['GET'])
+@token_required
+@admin_required
+def get_audit_log_metrics():
+    """Audit writer queue depth and counters for this worker process."""
+    return jsonify(audit_metrics() or {}), 200
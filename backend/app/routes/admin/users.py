@@ -1,27 +1,51 @@
 """Admin user management routes."""
+import hashlib
 import logging
+import os
 from datetime import datetime, timedelta, timezone
 from flask import request, jsonify, g
 from sqlalchemy import func, or_, and_
 from app import db
-from app.models import User, BloodPressureReading
+from app.models import User, BloodPressureReading, UserSearchToken, UserReadingStats
 from app.utils.auth import token_required
 from app.utils.audit_logger import audit_log
+from app.utils.cache import TTLCache, clear_on_commit
+from app.utils.encryption import BLIND_INDEX_GRAM
+from app.utils.call_list import mark_due
+from app.utils.outbox import enqueue
+from app.utils.pagination import paginate, paginate_filtered, sort_columns, total_cache, wants_total
 from . import admin_bp, admin_required
 
 logger = logging.getLogger(__name__)
 
 MAX_BULK_USERS = 100
 
+# Tab counts are polled constantly by the dashboard. Each worker caches them
+# briefly and drops the cache when a commit adds a reading or changes a status.
+_tab_counts_cache = TTLCache(ttl_seconds=int(os.getenv('TAB_COUNTS_CACHE_TTL', 30)), max_entries=1)
+clear_on_commit(_tab_counts_cache, User, attrs=('user_status',))
+clear_on_commit(_tab_counts_cache, BloodPressureReading)
+clear_on_commit(total_cache, User, attrs=('user_status', 'is_active', 'union_id'))
+clear_on_commit(total_cache, BloodPressureReading)
+
+# Users without a reading in this long count as deactivated
+ACTIVITY_WINDOW = timedelta(days=240)  # 8 months
+
+
+def _activity_cutoff():
+    """Start of the activity window, truncated to the minute so the tab
+    queries' parameters (and so their cached_count keys) stay stable."""
+    return datetime.utcnow().replace(second=0, microsecond=0) - ACTIVITY_WINDOW
+
 
 def _last_reading_subquery():
-    """Returns subquery: (user_id, last_reading_date)"""
+    """Returns subquery: (user_id, last_reading_date), read from the per-user
+    rollup instead of aggregating the readings table."""
     return (
         db.session.query(
-            BloodPressureReading.user_id,
-            func.max(BloodPressureReading.reading_date).label('last_reading_date')
+            UserReadingStats.user_id,
+            UserReadingStats.last_reading_date.label('last_reading_date')
         )
-        .group_by(BloodPressureReading.user_id)
         .subquery()
     )
 
@@ -43,43 +67,116 @@ def _apply_tab_filters(query, args):
         query = query.filter(User.has_high_blood_pressure == False)
 
     sort_by = args.get('sort', 'created_at')
-    sort_dir = args.get('dir', 'desc')
     sortable = {
-        'created_at': User.created_at,
-        'updated_at': User.updated_at,
-        'union_id': User.union_id,
+        'created_at': (User.created_at, None),
+        'updated_at': (User.updated_at, None),
+        'union_id': (User.union_id, 0),
     }
-    sort_col = sortable.get(sort_by, User.created_at)
-    query = query.order_by(sort_col.desc() if sort_dir == 'desc' else sort_col.asc())
+    sort_col, null_value = sortable.get(sort_by, sortable['created_at'])
+    sort = sort_columns(sort_col, User.id, null_value)
 
     page = args.get('page', 1, type=int)
-    per_page = min(args.get('per_page', 50, type=int), 200)
+    per_page = min(max(args.get('per_page', 50, type=int), 1), 200)
     search = args.get('search', '').strip()
 
-    return query, search, page, per_page
+    return query, search, sort, page, per_page
+
+
+def _compute_tab_counts():
+    """Count users per tab in one pass: a row per user_status, each carrying
+    how many of those users have read within the 240-day activity window."""
+    cutoff = _activity_cutoff()
+    recent = UserReadingStats.last_reading_date >= cutoff
+
+    rows = (
+        db.session.query(
+            User.user_status,
+            func.count(User.id).label('total'),
+            func.count(User.id).filter(recent).label('recent'),
+        )
+        .outerjoin(UserReadingStats, UserReadingStats.user_id == User.id)
+        .group_by(User.user_status)
+        .all()
+    )
+    by_status = {row.user_status: row for row in rows}
+
+    def total(status):
+        row = by_status.get(status)
+        return row.total if row else 0
+
+    active = by_status.get('active')
+    active_count = active.recent if active else 0
+    auto_deactivated = total('active') - active_count
+
+    return {
+        'all': sum(row.total for row in rows),
+        'active': active_count,
+        'pending_approval': total('pending_approval'),
+        'pending_registration': total('pending_registration'),
+        'pending_cuff': total('pending_cuff'),
+        'pending_first_reading': total('pending_first_reading'),
+        'enrollment_only': total('enrollment_only'),
+        'deactivated': auto_deactivated + total('deactivated'),
+    }
+
+
+def _apply_search(query, search):
+    """Restrict a User query to name/email substring matches via the blind index."""
+    matches = UserSearchToken.matching_user_ids(search)
+    if matches is None:
+        return query
+    return query.filter(User.id.in_(matches))
+
+
+def _verifier(search):
+    """keep(users) for paginate_filtered(), or None when the index match is
+    already exact.
+
+    Terms longer than BLIND_INDEX_GRAM match on their trigrams only (so
+    "annabel" matches any name holding all its trigrams); candidates'
+    names/emails are decrypted and checked for the actual substring."""
+    term = search.strip().lower()
+    if len(term) <= BLIND_INDEX_GRAM:
+        return None
+
+    def keep(users):
+        phi = User.bulk_decrypt(users, fields=('name', 'email'))
+        return [u for u in users
+                if any(term in (value or '').lower() for value in phi[u.id].values())]
+    return keep
 
 
-def _paginate_and_search(query, search, page, per_page):
-    """Execute query, apply text search in Python (post-decryption), paginate."""
+def _search_page(query, search, columns, row_key, cursor, offset, limit, descending, with_total):
+    """Apply blind-index text search in SQL, then paginate (keyset when a
+    cursor is passed, else by offset). Only candidate pages are decrypted.
+
+    Long terms are verified after decrypting and pages refilled until full
+    (see paginate_filtered), so their total counts index candidates and is
+    flagged as an estimate.
+
+    Returns:
+        (users, next_cursor, total, total_is_estimate)
+
+    Raises:
+        ValueError: if the cursor is malformed
+    """
+    keep = None
     if search:
-        all_users = query.all()
-        filtered = []
-        search_lower = search.lower()
-        for u in all_users:
-            try:
-                name = (u.name or '').lower()
-                email = (u.email or '').lower()
-                if search_lower in name or search_lower in email:
-                    filtered.append(u)
-            except Exception:
-                continue
-        total = len(filtered)
-        start = (page - 1) * per_page
-        users = filtered[start:start + per_page]
+        query = _apply_search(query, search)
+        keep = _verifier(search)
+    if keep is None:
+        users, next_cursor, total = paginate(
+            query, columns, cursor=cursor, offset=offset, limit=limit,
+            descending=descending, row_key=row_key, with_total=with_total)
     else:
-        total = query.count()
-        users = query.offset((page - 1) * per_page).limit(per_page).all()
-    return users, total
+        users, next_cursor, total = paginate_filtered(
+            query, columns, keep, cursor=cursor, offset=offset, limit=limit,
+            descending=descending, row_key=row_key, with_total=with_total)
+    return users, next_cursor, total, keep is not None and total is not None
+
+
+def _search_too_short(search):
+    return bool(search) and len(search.strip()) < BLIND_INDEX_GRAM
 
 
 @admin_bp.route('/users/tab-counts', methods=['GET'])
@@ -87,54 +184,26 @@ def _paginate_and_search(query, search, page, per_page):
 @admin_required
 def tab_counts():
     """Return user counts for each dashboard tab."""
-    cutoff = datetime.utcnow() - timedelta(days=240)  # 8 months
-    last_reading = _last_reading_subquery()
+    counts = _tab_counts_cache.get('counts')
+    if counts is None:
+        counts = _compute_tab_counts()
+        _tab_counts_cache.set('counts', counts)
 
-    active_count = (
-        db.session.query(func.count(User.id))
-        .outerjoin(last_reading, User.id == last_reading.c.user_id)
-        .filter(User.user_status == 'active')
-        .filter(last_reading.c.last_reading_date >= cutoff)
-        .scalar()
-    )
-
-    auto_deactivated = (
-        db.session.query(func.count(User.id))
-        .outerjoin(last_reading, User.id == last_reading.c.user_id)
-        .filter(User.user_status == 'active')
-        .filter(or_(
-            last_reading.c.last_reading_date < cutoff,
-            last_reading.c.last_reading_date == None
-        ))
-        .scalar()
-    )
-
-    manual_deactivated = (
-        db.session.query(func.count(User.id))
-        .filter(User.user_status == 'deactivated')
-        .scalar()
-    )
-
-    counts = {
-        'all': db.session.query(func.count(User.id)).scalar(),
-        'active': active_count,
-        'pending_approval': User.query.filter_by(user_status='pending_approval').count(),
-        'pending_registration': User.query.filter_by(user_status='pending_registration').count(),
-        'pending_cuff': User.query.filter_by(user_status='pending_cuff').count(),
-        'pending_first_reading': User.query.filter_by(user_status='pending_first_reading').count(),
-        'enrollment_only': User.query.filter_by(user_status='enrollment_only').count(),
-        'deactivated': auto_deactivated + manual_deactivated,
-    }
-
-    return jsonify(counts)
+    response = jsonify(counts)
+    response.set_etag(hashlib.sha1(response.get_data()).hexdigest())
+    return response.make_conditional(request)
 
 
 @admin_bp.route('/users/tab/<tab_name>', methods=['GET'])
 @token_required
 @admin_required
 def tab_users(tab_name):
-    """Return paginated users for a specific dashboard tab."""
-    cutoff = datetime.utcnow() - timedelta(days=240)
+    """Return paginated users for a specific dashboard tab.
+
+    Pass cursor (empty for the first page, then the previous next_cursor)
+    for keyset paging; page/per_page still work. total is only computed for
+    the first page in cursor mode, or never with include_total=false."""
+    cutoff = _activity_cutoff()
     last_reading = _last_reading_subquery()
     args = request.args
 
@@ -175,32 +244,34 @@ def tab_users(tab_name):
     else:
         return jsonify({'error': f'Unknown tab: {tab_name}'}), 400
 
-    query, search, page, per_page = _apply_tab_filters(query, args)
-    users, total = _paginate_and_search(query, search, page, per_page)
+    query, search, sort, page, per_page = _apply_tab_filters(query, args)
+    if _search_too_short(search):
+        return jsonify({'error': f'Search needs at least {BLIND_INDEX_GRAM} characters'}), 400
+    columns, row_key = sort
+    try:
+        users, next_cursor, total, estimated = _search_page(
+            query, search, columns, row_key, args.get('cursor'), (page - 1) * per_page, per_page,
+            args.get('dir', 'desc') == 'desc', wants_total(args))
+    except ValueError:
+        return jsonify({'error': 'Invalid cursor'}), 400
 
     # Build response with last_reading_date and reading_count
     user_ids = [u.id for u in users]
     reading_dates = {}
     if user_ids:
         results = (
-            db.session.query(
-                BloodPressureReading.user_id,
-                func.max(BloodPressureReading.reading_date).label('last_date'),
-                func.count(BloodPressureReading.id).label('reading_count')
-            )
-            .filter(BloodPressureReading.user_id.in_(user_ids))
-            .group_by(BloodPressureReading.user_id)
+            UserReadingStats.query
+            .filter(UserReadingStats.user_id.in_(user_ids))
             .all()
         )
         for r in results:
             reading_dates[r.user_id] = {
-                'last_reading_date': r.last_date.isoformat() if r.last_date else None,
+                'last_reading_date': r.last_reading_date.isoformat() if r.last_reading_date else None,
                 'reading_count': r.reading_count,
             }
 
     users_data = []
-    for u in users:
-        d = u.to_dict(include_phi=True)
+    for u, d in zip(users, User.to_dict_list(users, include_phi=True)):
         rd = reading_dates.get(u.id, {})
         d['last_reading_date'] = rd.get('last_reading_date')
         d['reading_count'] = rd.get('reading_count', 0)
@@ -209,9 +280,11 @@ def tab_users(tab_name):
     return jsonify({
         'users': users_data,
         'total': total,
+        'total_is_estimate': estimated,
         'page': page,
         'per_page': per_page,
-        'pages': (total + per_page - 1) // per_page,
+        'pages': (total + per_page - 1) // per_page if total is not None else None,
+        'next_cursor': next_cursor,
     })
 
 
@@ -237,6 +310,7 @@ def change_user_status(user_id):
     old_status = user.user_status
     user.user_status = new_status
     user.is_active = new_status not in ('deactivated',)
+    mark_due([user.id])
 
     db.session.commit()
 
@@ -254,9 +328,14 @@ def change_user_status(user_id):
 @admin_required
 def list_users():
     """List users with pagination, status filter, multi-select filters,
-    server-side search, and sorting."""
+    server-side search, and sorting.
+
+    Pass cursor (empty for the first page, then the previous next_cursor)
+    for keyset paging; limit/offset still work. total_count is only computed
+    for the first page in cursor mode, or never with include_total=false."""
     limit = request.args.get('limit', 50, type=int)
     offset = request.args.get('offset', 0, type=int)
+    cursor = request.args.get('cursor')
     status_filter = request.args.get('status')
     approved_filter = request.args.get('approved')
     search_query = request.args.get('search', '').strip()
@@ -272,7 +351,7 @@ def list_users():
     sort_by = request.args.get('sort_by', 'created_at')
     sort_order = request.args.get('sort_order', 'desc')
 
-    limit = min(limit, 200)
+    limit = min(max(limit, 1), 200)
 
     query = User.query
 
@@ -307,45 +386,28 @@ def list_users():
         except ValueError:
             pass
 
-    # Server-side search on encrypted fields — we have to search after decryption.
-    # For scalability this should use the email_hash for exact email matches,
-    # but for ILIKE-style partial search we must filter in Python post-query.
-    # We'll fetch a larger batch and filter, or if no search, just paginate normally.
+    if _search_too_short(search_query):
+        return jsonify({'error': f'Search needs at least {BLIND_INDEX_GRAM} characters'}), 400
 
     # Sorting
     sort_whitelist = {
-        'id': User.id,
-        'created_at': User.created_at,
-        'union_id': User.union_id,
-        'gender': User.gender,
-        'rank': User.rank,
+        'id': (User.id, None),
+        'created_at': (User.created_at, None),
+        'union_id': (User.union_id, 0),
+        'gender': (User.gender, ''),
+        'rank': (User.rank, ''),
     }
-    sort_col = sort_whitelist.get(sort_by, User.created_at)
-    if sort_order == 'asc':
-        query = query.order_by(sort_col.asc())
-    else:
-        query = query.order_by(sort_col.desc())
-
-    if search_query:
-        # For encrypted PHI search, we must fetch all matching non-search filters
-        # then filter in Python. This is necessary because name/email are encrypted.
-        all_users = query.all()
-        q = search_query.lower()
-        filtered = []
-        for u in all_users:
-            try:
-                name = (u.name or '').lower()
-                email = (u.email or '').lower()
-            except Exception:
-                name = ''
-                email = ''
-            if q in name or q in email:
-                filtered.append(u)
-        total_count = len(filtered)
-        page = filtered[offset:offset + limit]
-    else:
-        total_count = query.count()
-        page = query.offset(offset).limit(limit).all()
+    sort_col, null_value = sort_whitelist.get(sort_by, sort_whitelist['created_at'])
+    columns, row_key = sort_columns(sort_col, User.id, null_value)
+
+    # Server-side search on encrypted fields uses the keyed trigram blind
+    # index, so only candidate pages are decrypted.
+    try:
+        page, next_cursor, total_count, estimated = _search_page(
+            query, search_query, columns, row_key, cursor, offset, limit,
+            sort_order != 'asc', wants_total(request.args))
+    except ValueError:
+        return jsonify({'error': 'Invalid cursor'}), 400
 
     audit_log('READ', 'user_list', details={
         'count': len(page),
@@ -354,8 +416,10 @@ def list_users():
     })
 
     return jsonify({
-        'users': [u.to_dict(include_phi=True) for u in page],
+        'users': User.to_dict_list(page, include_phi=True),
         'total_count': total_count,
+        'total_is_estimate': estimated,
+        'next_cursor': next_cursor,
     }), 200
 
 
@@ -370,40 +434,17 @@ def get_user(id):
 
     user_data = user.to_dict(include_phi=True)
 
-    # Reading stats
-    readings = (BloodPressureReading.query
-                .filter_by(user_id=id)
-                .order_by(BloodPressureReading.reading_date.desc())
-                .all())
-
-    total_readings = len(readings)
-    latest = readings[0].to_dict() if readings else None
-
-    now = datetime.utcnow()
-    seven_days_ago = now - timedelta(days=7)
-    thirty_days_ago = now - timedelta(days=30)
-
-    recent_7 = [r for r in readings if r.reading_date and r.reading_date >= seven_days_ago]
-    recent_30 = [r for r in readings if r.reading_date and r.reading_date >= thirty_days_ago]
-
-    avg_7 = None
-    if recent_7:
-        avg_7 = {
-            'systolic': round(sum(r.systolic for r in recent_7) / len(recent_7)),
-            'diastolic': round(sum(r.diastolic for r in recent_7) / len(recent_7)),
-        }
-
-    avg_30 = None
-    if recent_30:
-        avg_30 = {
-            'systolic': round(sum(r.systolic for r in recent_30) / len(recent_30)),
-            'diastolic': round(sum(r.diastolic for r in recent_30) / len(recent_30)),
-        }
-
-    user_data['total_readings'] = total_readings
-    user_data['latest_reading'] = latest
-    user_data['avg_7_day'] = avg_7
-    user_data['avg_30_day'] = avg_30
+    # Reading stats come from the rollup; only the latest reading is loaded
+    stats = UserReadingStats.for_users([id]).get(id)
+    latest = (BloodPressureReading.query
+              .filter_by(user_id=id)
+              .order_by(BloodPressureReading.reading_date.desc())
+              .first())
+
+    user_data['total_readings'] = stats.reading_count if stats else 0
+    user_data['latest_reading'] = latest.to_dict() if latest else None
+    user_data['avg_7_day'] = stats.avg_7_day if stats else None
+    user_data['avg_30_day'] = stats.avg_30_day if stats else None
 
     audit_log('READ', 'user', resource_id=str(id), details={'action': 'view_detail'})
 
@@ -512,19 +553,9 @@ def bulk_approve_users():
 
             results['success'].append({'id': user_id})
 
-            # Send notification if configured
-            try:
-                from app.utils.push_notifications import notify_account_approved
-                notify_account_approved(user_id)
-            except Exception as e:
-                logger.warning(f"Failed to send approval notification to user {user_id}: {e}")
-
-            # Send email notification
-            try:
-                from app.utils.email_sender import send_account_approved_email
-                send_account_approved_email(user.email, user.name)
-            except Exception as e:
-                logger.warning(f"Failed to send approval email to user {user_id}: {e}")
+            # Delivered by the outbox dispatcher once the approvals commit
+            enqueue('account_approved_push', user_id=user.id)
+            enqueue('account_approved_email', user_id=user.id)
 
         except Exception as e:
             logger.error(f"Error approving user {user_id}: {e}")
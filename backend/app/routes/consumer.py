@@ -1,21 +1,25 @@
 """
 Consumer API routes.
 """
+import hashlib
 import json
 from datetime import datetime, timedelta, timezone
-from flask import Blueprint, request, jsonify, g
+from flask import Blueprint, Response, request, jsonify, g
 import pyotp
 from app import db
-from app.models import User, BloodPressureReading, Union, CuffRequest, DeviceToken, MfaSecret, MfaSession
+from app.models import User, BloodPressureReading, Union, CuffRequest, DeviceToken, MfaSecret, MfaSession, UserReadingStats
+from app.models.reading import IDEMPOTENCY_KEY_MAX, reading_dedupe_key
 from app.models.revoked_token import RevokedToken
 from app.models.email_verification import EmailVerification
 from app.utils.auth import generate_single_use_token, token_required, decode_token
 from app.utils.audit_logger import audit_log, audit_phi_access
+from app.utils.call_list import evaluate_users as evaluate_call_list
 from app.utils.encryption import hash_email
-from sqlalchemy import func
+from app.utils.outbox import enqueue
+from app.utils.pagination import decode_cursor, encode_cursor, paginate
+from sqlalchemy import func, literal, tuple_
 from app.utils.validators import validate_registration, validate_reading, validate_profile_update
 from app.utils.rate_limiter import rate_limit_login, rate_limit, registration_limiter, mfa_verify_limiter
-from app.utils.email_sender import send_verification_email, send_login_otp_email
 
 consumer_bp = Blueprint('consumer', __name__)
 
@@ -99,7 +103,7 @@ def register():
     try:
         # Send email verification code
         verification = EmailVerification.create_for_user(user.id)
-        send_verification_email(email, verification.code)
+        enqueue('verification_email', verification_id=verification.id)
 
         token = generate_single_use_token(user.id, email)
 
@@ -174,7 +178,8 @@ def login():
 
         # For email MFA, send the OTP code
         if mfa_type == 'email':
-            send_login_otp_email(email, mfa_session.otp_code)
+            enqueue('login_otp_email', mfa_session_id=mfa_session.id)
+        db.session.commit()
 
         audit_log('LOGIN', 'user', resource_id=str(user.id),
                   details={'action': 'login_mfa_required', 'mfa_type': mfa_type},
@@ -189,7 +194,8 @@ def login():
     # Email OTP for consumer logins (non-admin users)
     if not user.is_admin:
         mfa_session = MfaSession.create_for_user(user.id, mfa_type='email')
-        send_login_otp_email(email, mfa_session.otp_code)
+        enqueue('login_otp_email', mfa_session_id=mfa_session.id)
+        db.session.commit()
 
         audit_log('LOGIN', 'user', resource_id=str(user.id),
                   details={'action': 'login_mfa_required', 'mfa_type': 'email'},
@@ -378,11 +384,9 @@ def resend_mfa_code():
     import secrets as sec_module
     mfa_session.otp_code = str(sec_module.randbelow(1000000)).zfill(6)
     mfa_session.attempts = 0
+    enqueue('login_otp_email', mfa_session_id=mfa_session.id)
     db.session.commit()
 
-    user = User.query.get(mfa_session.user_id)
-    send_login_otp_email(user.email, mfa_session.otp_code)
-
     audit_log('MFA_RESEND', 'user', resource_id=str(mfa_session.user_id),
               details={'action': 'mfa_code_resent'}, user_id=str(mfa_session.user_id))
 
@@ -454,8 +458,8 @@ def resend_verification():
         return jsonify({'error': 'Email is already verified'}), 409
 
     verification = EmailVerification.create_for_user(user.id)
+    enqueue('verification_email', verification_id=verification.id)
     db.session.commit()
-    send_verification_email(user.email, verification.code)
 
     audit_log('UPDATE', 'user', resource_id=str(g.user_id),
               details={'action': 'resend_verification'})
@@ -463,95 +467,290 @@ def resend_verification():
     return jsonify({'message': 'Verification code sent'}), 200
 
 
-@consumer_bp.route('/readings', methods=['POST'])
-@token_required
-@audit_phi_access('CREATE', 'reading')
-def create_reading():
-    """Submit a blood pressure reading. Maps camelCase from Flutter to snake_case."""
-    data = request.get_json()
-    if not data:
-        return jsonify({'error': 'Request body is required'}), 400
+READING_BATCH_MAX = 500
+READING_CHANGES_MAX = 500
+# created_at is stamped at insert, not commit, so the changes feed re-sends
+# this much history behind its watermark to catch slow transactions
+READING_CHANGES_OVERLAP = timedelta(minutes=5)
+
 
+def _parse_reading(data, idempotency_key=None):
+    """Validate one reading payload (camelCase from Flutter).
+
+    Returns (fields, error); fields holds BloodPressureReading column values
+    including its dedupe_key, error is validate_reading's list of messages or
+    a single message."""
+    if not isinstance(data, dict):
+        return None, 'Reading must be an object'
     errors = validate_reading(data)
     if errors:
-        return jsonify({'error': errors}), 400
-
+        return None, errors
     try:
         reading_date = datetime.fromisoformat(data['readingDate'].replace('Z', '+00:00'))
     except (ValueError, AttributeError):
-        return jsonify({'error': 'Invalid readingDate format'}), 400
-
-    systolic = int(data['systolic'])
-    diastolic = int(data['diastolic'])
-    heart_rate = int(data['heartRate']) if data.get('heartRate') is not None else None
-    notes = (data.get('notes', '') or '').strip()[:500] or None
-
-    # Deduplicate: reject if identical reading exists within 60 seconds
-    window = timedelta(seconds=60)
-    duplicate = BloodPressureReading.query.filter(
-        BloodPressureReading.user_id == g.user_id,
-        BloodPressureReading.systolic == systolic,
-        BloodPressureReading.diastolic == diastolic,
-        BloodPressureReading.reading_date.between(reading_date - window, reading_date + window)
-    ).first()
-
-    if duplicate:
-        return jsonify(duplicate.to_dict()), 200  # Return existing, don't create duplicate
-
-    reading = BloodPressureReading(
-        user_id=g.user_id,
-        systolic=systolic,
-        diastolic=diastolic,
-        heart_rate=heart_rate,
-        reading_date=reading_date,
-        notes=notes,
-    )
-
-    db.session.add(reading)
-
-    # Auto-transition: pending_first_reading → active on first reading
-    user = User.query.get(g.user_id)
+        return None, 'Invalid readingDate format'
+    idempotency_key = data.get('idempotencyKey', idempotency_key)
+    if idempotency_key is not None and (
+            not isinstance(idempotency_key, str)
+            or not 0 < len(idempotency_key) <= IDEMPOTENCY_KEY_MAX):
+        return None, f'idempotencyKey must be a string of at most {IDEMPOTENCY_KEY_MAX} characters'
+    fields = {
+        'systolic': int(data['systolic']),
+        'diastolic': int(data['diastolic']),
+        'heart_rate': int(data['heartRate']) if data.get('heartRate') is not None else None,
+        'reading_date': _naive_utc(reading_date),
+        'notes': (data.get('notes', '') or '').strip()[:500] or None,
+    }
+    fields['dedupe_key'] = reading_dedupe_key(fields['reading_date'], fields['systolic'],
+                                              fields['diastolic'], idempotency_key)
+    return fields, None
+
+
+def _naive_utc(value):
+    """Reading dates are stored as naive UTC."""
+    if value is not None and value.tzinfo is not None:
+        return value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+
+def _existing_readings(user_id, dedupe_keys):
+    """{dedupe_key: reading} for user_id's stored readings with these keys."""
+    if not dedupe_keys:
+        return {}
+    readings = BloodPressureReading.query.filter(
+        BloodPressureReading.user_id == user_id,
+        BloodPressureReading.dedupe_key.in_(dedupe_keys),
+    ).all()
+    return {r.dedupe_key: r for r in readings}
+
+
+def _activate_on_first_reading(user_id):
+    """Auto-transition: pending_first_reading → active on first reading."""
+    user = User.query.get(user_id)
     if user and user.user_status == 'pending_first_reading':
         user.user_status = 'active'
         audit_log('UPDATE', 'user', resource_id=str(user.id),
                   details={'action': 'auto_status_transition', 'from': 'pending_first_reading', 'to': 'active'},
                   user_id=str(user.id))
 
+
+@consumer_bp.route('/readings', methods=['POST'])
+@token_required
+@audit_phi_access('CREATE', 'reading')
+def create_reading():
+    """Submit a blood pressure reading. Maps camelCase from Flutter to snake_case.
+
+    Idempotent: a resubmitted reading (same Idempotency-Key header or
+    idempotencyKey field, or else same values in the same minute) returns
+    the stored reading instead of creating another."""
+    data = request.get_json()
+    if not data:
+        return jsonify({'error': 'Request body is required'}), 400
+
+    fields, error = _parse_reading(data, request.headers.get('Idempotency-Key'))
+    if error:
+        return jsonify({'error': error}), 400
+
+    created = BloodPressureReading.insert_new([{'user_id': g.user_id, **fields}])
+    if not created:
+        # Already stored, by an earlier attempt or a concurrent retry
+        duplicate = _existing_readings(g.user_id, [fields['dedupe_key']])[fields['dedupe_key']]
+        return jsonify(duplicate.to_dict()), 200  # Return existing, don't create duplicate
+
+    reading = created[0]
+    UserReadingStats.record_reading(reading)
+    _activate_on_first_reading(g.user_id)
+
+    evaluate_call_list([g.user_id])
     db.session.commit()
 
     return jsonify(reading.to_dict()), 200
 
 
+@consumer_bp.route('/readings/batch', methods=['POST'])
+@token_required
+@audit_phi_access('CREATE', 'reading_batch')
+def create_readings_batch():
+    """Submit up to READING_BATCH_MAX queued readings in one request.
+
+    Body: {"readings": [{...same fields as POST /readings...}, ...]}.
+    Each item is validated and deduplicated (by idempotency key, against
+    stored readings and earlier items) independently; valid new readings are
+    inserted with one statement. Returns a result per item, in order:
+    {"index", "status": created | duplicate | invalid, "reading" | "errors"}."""
+    data = request.get_json()
+    items = data.get('readings') if isinstance(data, dict) else None
+    if not isinstance(items, list) or not items:
+        return jsonify({'error': 'readings must be a non-empty list'}), 400
+    if len(items) > READING_BATCH_MAX:
+        return jsonify({'error': f'At most {READING_BATCH_MAX} readings per batch'}), 400
+
+    results = [None] * len(items)
+    rows = {}  # dedupe_key -> column values; first item with a key wins
+    item_keys = []
+    for index, item in enumerate(items):
+        fields, error = _parse_reading(item)
+        if error:
+            results[index] = {'index': index, 'status': 'invalid',
+                              'errors': error if isinstance(error, list) else [error]}
+            continue
+        rows.setdefault(fields['dedupe_key'], {'user_id': g.user_id, **fields})
+        item_keys.append((index, fields['dedupe_key']))
+
+    created = {r.dedupe_key: r for r in BloodPressureReading.insert_new(list(rows.values()))}
+    existing = _existing_readings(g.user_id, [key for key in rows if key not in created])
+
+    first_index = {}
+    for index, key in item_keys:
+        if key in created and first_index.setdefault(key, index) == index:
+            results[index] = {'index': index, 'status': 'created', 'reading': created[key]}
+        else:
+            results[index] = {'index': index, 'status': 'duplicate',
+                              'reading': created.get(key) or existing[key]}
+
+    # Serialize before the commit expires the new rows
+    for result in results:
+        if 'reading' in result:
+            result['reading'] = result['reading'].to_dict()
+
+    if created:
+        UserReadingStats.rebuild([g.user_id])
+        _activate_on_first_reading(g.user_id)
+        evaluate_call_list([g.user_id])
+        db.session.commit()
+
+    counts = {status: sum(1 for r in results if r['status'] == status)
+              for status in ('created', 'duplicate', 'invalid')}
+    audit_log('CREATE', 'reading', details={'batch': True, **counts})
+
+    return jsonify({'results': results, **counts}), 200
+
+
 @consumer_bp.route('/readings', methods=['GET'])
 @token_required
 @audit_phi_access('READ', 'reading')
 def get_readings():
-    """Return user's readings with pagination."""
+    """Return user's readings with pagination, newest first.
+
+    Pass cursor (empty for the first page) for keyset paging; the next page's
+    cursor comes back in the X-Next-Cursor header, which is absent on the last
+    page. limit/offset still work.
+
+    Responses carry a strong ETag; If-None-Match gets a 304 after one
+    index-only query, without loading any readings."""
     limit = request.args.get('limit', 50, type=int)
     offset = request.args.get('offset', 0, type=int)
+    cursor = request.args.get('cursor')
+
+    limit = min(max(limit, 1), 200)
+
+    # Readings are insert-only, so (count, max id) changes whenever the
+    # user's set of readings does; the query string picks the page.
+    count, max_id = (db.session.query(func.count(BloodPressureReading.id),
+                                      func.max(BloodPressureReading.id))
+                     .filter(BloodPressureReading.user_id == g.user_id)
+                     .one())
+    etag = hashlib.sha1(
+        f'{g.user_id}:{count}:{max_id}:{request.query_string.decode()}'.encode()
+    ).hexdigest()
+    if request.if_none_match.contains(etag):
+        response = Response(status=304)
+        response.set_etag(etag)
+        return response
+
+    try:
+        readings, next_cursor, _ = paginate(
+            BloodPressureReading.query.filter_by(user_id=g.user_id),
+            (BloodPressureReading.reading_date, BloodPressureReading.id),
+            cursor=cursor, offset=offset, limit=limit, with_total=False)
+    except ValueError:
+        return jsonify({'error': 'Invalid cursor'}), 400
 
-    limit = min(limit, 200)
+    response = jsonify([r.to_dict() for r in readings])
+    if next_cursor:
+        response.headers['X-Next-Cursor'] = next_cursor
+    response.set_etag(etag)
+    return response, 200
 
-    readings = (BloodPressureReading.query
-                .filter_by(user_id=g.user_id)
-                .order_by(BloodPressureReading.reading_date.desc())
-                .offset(offset)
-                .limit(limit)
+
+@consumer_bp.route('/readings/changes', methods=['GET'])
+@token_required
+@audit_phi_access('READ', 'reading')
+def get_reading_changes():
+    """Readings added since a server-issued watermark, for incremental sync.
+
+    Pass the previous response's next_since as since (omit it for a full
+    sync). Returns up to READING_CHANGES_MAX readings ordered by
+    (created_at, id); call again with next_since while has_more is true.
+
+    Ids and created_at are assigned at insert, so a concurrent transaction
+    can commit a reading that sorts before one already returned. Once a
+    client is caught up, next_since therefore points READING_CHANGES_OVERLAP
+    behind the newest created_at seen, and the next call re-sends that
+    window; clients drop readings they already have. The cursor is
+    [newest created_at seen, created_at, id] of where to resume."""
+    since = request.args.get('since')
+    frontier = after = None
+    if since:
+        try:
+            frontier, after_ts, after_id = decode_cursor(since, (datetime, datetime, int))
+            after = (after_ts, after_id)
+        except ValueError:
+            try:
+                # Watermark issued when the feed was ordered by id alone
+                legacy_id = decode_cursor(since, (int,))[0]
+            except ValueError:
+                return jsonify({'error': 'Invalid since'}), 400
+            frontier = (db.session.query(BloodPressureReading.created_at)
+                        .filter(BloodPressureReading.user_id == g.user_id,
+                                BloodPressureReading.id == legacy_id)
+                        .scalar())
+            if frontier is not None:
+                after = (frontier - READING_CHANGES_OVERLAP, 0)
+    limit = min(max(request.args.get('limit', READING_CHANGES_MAX, type=int), 1), READING_CHANGES_MAX)
+
+    query = BloodPressureReading.query.filter(BloodPressureReading.user_id == g.user_id)
+    if after is not None:
+        key = tuple_(BloodPressureReading.created_at, BloodPressureReading.id)
+        query = query.filter(key > tuple_(literal(after[0], BloodPressureReading.created_at.type),
+                                          literal(after[1], BloodPressureReading.id.type)))
+    readings = (query.order_by(BloodPressureReading.created_at, BloodPressureReading.id)
+                .limit(limit + 1)
                 .all())
+    has_more = len(readings) > limit
+    readings = readings[:limit]
+
+    if readings:
+        last = readings[-1]
+        frontier = max(frontier, last.created_at) if frontier else last.created_at
+    elif frontier is None:
+        frontier = datetime.utcnow()
+    if has_more:
+        next_since = [frontier, last.created_at, last.id]
+    else:
+        next_since = [frontier, frontier - READING_CHANGES_OVERLAP, 0]
 
-    return jsonify([r.to_dict() for r in readings]), 200
+    return jsonify({
+        'readings': [r.to_dict() for r in readings],
+        'next_since': encode_cursor(next_since),
+        'has_more': has_more,
+    }), 200
 
 
 @consumer_bp.route('/profile', methods=['GET'])
 @token_required
 @audit_phi_access('READ', 'user')
 def get_profile():
-    """Return the authenticated user's profile with PHI."""
+    """Return the authenticated user's profile with PHI.
+
+    Responses carry a strong ETag of the body; If-None-Match gets a 304."""
     user = User.query.get(g.user_id)
     if not user:
         return jsonify({'error': 'User not found'}), 404
 
-    return jsonify(user.to_dict(include_phi=True)), 200
+    response = jsonify(user.to_dict(include_phi=True))
+    response.set_etag(hashlib.sha1(response.get_data()).hexdigest())
+    return response.make_conditional(request)
 
 
 @consumer_bp.route('/profile', methods=['PUT'])
@@ -653,6 +852,21 @@ def update_profile():
         changes['missed_doses'] = {'old': user.missed_doses, 'new': data['missed_doses']}
         user.missed_doses = int(data['missed_doses']) if data['missed_doses'] is not None else None
 
+    # Reading reminder preferences
+    if 'reading_reminders_enabled' in data:
+        changes['reading_reminders_enabled'] = {'old': user.reading_reminders_enabled,
+                                                'new': data['reading_reminders_enabled']}
+        user.reading_reminders_enabled = data['reading_reminders_enabled']
+
+    if 'timezone' in data:
+        changes['timezone'] = {'old': user.timezone, 'new': data['timezone']}
+        user.timezone = data['timezone'] or None
+
+    for field in ('quiet_hours_start', 'quiet_hours_end'):
+        if field in data:
+            changes[field] = {'old': getattr(user, field), 'new': data[field]}
+            setattr(user, field, int(data[field]) if data[field] is not None else None)
+
     db.session.commit()
 
     audit_log('UPDATE', 'user', resource_id=str(g.user_id),
@@ -74,7 +74,7 @@ def dashboard_token_required(f):
             return jsonify({'error': 'Invalid or expired token'}), 401
 
         jti = payload.get('jti')
-        if RevokedToken.is_token_revoked(jti):
+        if RevokedToken.is_token_revoked(jti, payload.get('exp')):
             return jsonify({'error': 'Token has been revoked'}), 401
 
         user = DashboardUser.query.get(payload.get('dashboard_user_id'))
@@ -0,0 +1,329 @@
+"""
+Rotated, compressed and indexed audit log segments.
+
+The audit writer appends to one segment file per AUDIT_SEGMENT_SECONDS period
+(logs/audit.<period start>.log for AUDIT_LOG_FILE=logs/audit.log). Once a
+segment's period is over it is sealed:
+- its events are gzip-compressed in independent blocks of AUDIT_BLOCK_EVENTS
+  (the file is still a valid .gz, so zcat works)
+- a sidecar .idx.json maps every resource_id, user_id and action to the
+  blocks containing it, and records each block's offset and time range
+- a line is appended to the chain manifest (audit.chain) whose hash covers
+  the segment's content and the previous segment's chain hash, so removing,
+  reordering or editing a sealed segment breaks every later link
+
+query() reads only the blocks the index points at; verify_chain() recomputes
+the chain from the sealed segments.
+"""
+import glob
+import gzip
+import hashlib
+import json
+import logging
+import os
+import re
+import time
+from datetime import datetime, timezone
+
+try:
+    import fcntl
+except ImportError:  # Windows development machines
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+AUDIT_SEGMENT_SECONDS = int(os.getenv('AUDIT_SEGMENT_SECONDS', 86400))
+AUDIT_BLOCK_EVENTS = int(os.getenv('AUDIT_BLOCK_EVENTS', 1000))
+# How long a finished segment is left alone before sealing, so workers that
+# computed its name just before the period ended can finish their last batch
+SEAL_GRACE_SECONDS = 300
+
+INDEXED_FIELDS = ('resource_id', 'user_id', 'action')
+GENESIS_HASH = '0' * 64
+_STAMP_FORMAT = '%Y%m%dT%H%M%SZ'
+
+
+def _stem(base):
+    root, _ = os.path.splitext(base)
+    return root
+
+
+def segment_path(base, now=None):
+    """Raw segment file that events written at now (epoch seconds) go to."""
+    now = time.time() if now is None else now
+    start = int(now // AUDIT_SEGMENT_SECONDS * AUDIT_SEGMENT_SECONDS)
+    return f'{_stem(base)}.{time.strftime(_STAMP_FORMAT, time.gmtime(start))}.log'
+
+
+def chain_path(base):
+    return f'{_stem(base)}.chain'
+
+
+def raw_segments(base):
+    """Unsealed segment files, including a pre-rotation AUDIT_LOG_FILE."""
+    pattern = re.compile(re.escape(os.path.basename(_stem(base))) + r'\.\d{8}T\d{6}Z\.log$')
+    directory = os.path.dirname(base) or '.'
+    paths = sorted(os.path.join(directory, name) for name in os.listdir(directory)
+                   if pattern.match(name))
+    if os.path.exists(base) and os.path.getsize(base):
+        paths.insert(0, base)
+    return paths
+
+
+def _sealed_paths(base, raw_path, first_ts):
+    if raw_path == base:
+        # The single file written before rotation, named after its first event
+        stamp = parse_timestamp(first_ts).strftime(_STAMP_FORMAT) if first_ts else 'unknown'
+        root = f'{_stem(base)}.legacy-{stamp}'
+    else:
+        root = raw_path[:-len('.log')]
+    return root + '.log.gz', root + '.idx.json'
+
+
+def parse_timestamp(value):
+    """Parse an ISO 8601 timestamp; naive values are taken as UTC."""
+    ts = datetime.fromisoformat(value)
+    return ts if ts.tzinfo else ts.replace(tzinfo=timezone.utc)
+
+
+def read_chain(base):
+    """Chain manifest entries, oldest first."""
+    try:
+        with open(chain_path(base), encoding='utf-8') as f:
+            return [json.loads(line) for line in f if line.strip()]
+    except FileNotFoundError:
+        return []
+
+
+def _chain_hash(prev, content_sha256):
+    return hashlib.sha256(f'{prev}:{content_sha256}'.encode()).hexdigest()
+
+
+def _write_durably(path, data, mode='wb'):
+    tmp = path + '.tmp'
+    with open(tmp, mode) as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+    os.chmod(path, 0o440)
+
+
+def seal_segment(base, raw_path, chain):
+    """Compress, index and chain one raw segment, then remove it.
+
+    chain is the manifest read by the caller and is extended in place.
+    Returns the new manifest entry, or None for an empty segment."""
+    with open(raw_path, 'rb') as f:
+        content = f.read()
+    lines = [line for line in content.split(b'\n') if line.strip()]
+    if not lines:
+        os.remove(raw_path)
+        return None
+    blocks = []
+    keys = {field: {} for field in INDEXED_FIELDS}
+    compressed = bytearray()
+    first_ts = last_ts = None
+    for number, start in enumerate(range(0, len(lines), AUDIT_BLOCK_EVENTS)):
+        block_lines = lines[start:start + AUDIT_BLOCK_EVENTS]
+        block_first = block_last = None
+        for line in block_lines:
+            try:
+                event = json.loads(line)
+            except ValueError:
+                # A torn final line from a crashed writer is kept, unindexed
+                continue
+            ts = event.get('timestamp')
+            if ts:
+                block_first = ts if block_first is None or ts < block_first else block_first
+                block_last = ts if block_last is None or ts > block_last else block_last
+            for field in INDEXED_FIELDS:
+                value = event.get(field)
+                if value is not None:
+                    postings = keys[field].setdefault(str(value), [])
+                    if not postings or postings[-1] != number:
+                        postings.append(number)
+        data = gzip.compress(b'\n'.join(block_lines) + b'\n', mtime=0)
+        blocks.append({'offset': len(compressed), 'length': len(data), 'events': len(block_lines),
+                       'first_ts': block_first, 'last_ts': block_last})
+        compressed += data
+        if block_first and (first_ts is None or block_first < first_ts):
+            first_ts = block_first
+        if block_last and (last_ts is None or block_last > last_ts):
+            last_ts = block_last
+
+    gz_path, idx_path = _sealed_paths(base, raw_path, first_ts)
+    name = os.path.basename(gz_path)
+    content_sha256 = hashlib.sha256(b'\n'.join(lines) + b'\n').hexdigest()
+    existing = next((e for e in chain if e['segment'] == name), None)
+    if existing is not None and existing['content_sha256'] != content_sha256:
+        raise RuntimeError(f'{raw_path} does not match its chain entry; not resealing')
+
+    _write_durably(gz_path, bytes(compressed))
+    index = {
+        'segment': name,
+        'events': len(lines),
+        'first_ts': first_ts,
+        'last_ts': last_ts,
+        'gz_sha256': hashlib.sha256(compressed).hexdigest(),
+        'blocks': blocks,
+        'keys': keys,
+    }
+    _write_durably(idx_path, json.dumps(index, separators=(',', ':')), mode='w')
+
+    entry = existing
+    if entry is None:
+        # A crash after this append but before the raw file is removed is
+        # finished by the next run without adding a second entry
+        prev = chain[-1]['chain'] if chain else GENESIS_HASH
+        entry = {
+            'segment': name,
+            'events': len(lines),
+            'first_ts': first_ts,
+            'last_ts': last_ts,
+            'content_sha256': content_sha256,
+            'prev': prev,
+            'chain': _chain_hash(prev, content_sha256),
+            'sealed_at': datetime.now(timezone.utc).isoformat(),
+        }
+        with open(chain_path(base), 'a', encoding='utf-8') as f:
+            f.write(json.dumps(entry, separators=(',', ':')) + '\n')
+            f.flush()
+            os.fsync(f.fileno())
+        chain.append(entry)
+    os.remove(raw_path)
+    return entry
+
+
+def seal_pending(base, now=None):
+    """Seal every raw segment whose period is over.
+
+    Safe to call from several processes at once: one holds the lock and the
+    others return immediately. Returns the new chain entries."""
+    now = time.time() if now is None else now
+    directory = os.path.dirname(base) or '.'
+    with open(os.path.join(directory, '.audit-seal.lock'), 'a') as lock:
+        if fcntl is not None:
+            try:
+                fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                return []
+        current = segment_path(base, now)
+        due = [path for path in raw_segments(base)
+               if path != current and os.path.getmtime(path) < now - SEAL_GRACE_SECONDS]
+        if not due:
+            return []
+        chain = read_chain(base)
+        sealed = []
+        for path in due:
+            entry = seal_segment(base, path, chain)
+            if entry is not None:
+                logger.info('Sealed audit segment %s (%d events)', entry['segment'], entry['events'])
+                sealed.append(entry)
+        return sealed
+
+
+def _matching_blocks(index, filters, since, until):
+    candidates = None
+    for field, value in filters.items():
+        postings = set(index['keys'].get(field, {}).get(str(value), ()))
+        candidates = postings if candidates is None else candidates & postings
+    numbers = sorted(candidates) if candidates is not None else range(len(index['blocks']))
+    for number in numbers:
+        block = index['blocks'][number]
+        if since and block['last_ts'] and parse_timestamp(block['last_ts']) < since:
+            continue
+        if until and block['first_ts'] and parse_timestamp(block['first_ts']) >= until:
+            continue
+        yield block
+
+
+def _event_matches(event, filters, resource_type, since, until):
+    for field, value in filters.items():
+        if str(event.get(field)) != str(value):
+            return False
+    if resource_type and event.get('resource_type') != resource_type:
+        return False
+    if since or until:
+        ts = event.get('timestamp')
+        if not ts:
+            return False
+        ts = parse_timestamp(ts)
+        if (since and ts < since) or (until and ts >= until):
+            return False
+    return True
+
+
+def _parse_lines(lines):
+    for line in lines:
+        try:
+            yield json.loads(line)
+        except ValueError:
+            continue
+
+
+def query(base, resource_id=None, user_id=None, action=None, resource_type=None,
+          since=None, until=None):
+    """Yield audit events matching every given filter.
+
+    Sealed segments are skipped on their index's time range and only the
+    blocks listing the requested resource_id / user_id / action are
+    decompressed. Unsealed segments are scanned. since and until are
+    timezone-aware datetimes; until is exclusive."""
+    filters = {field: value for field, value in
+               (('resource_id', resource_id), ('user_id', user_id), ('action', action))
+               if value is not None}
+    directory = os.path.dirname(base) or '.'
+    for idx_path in sorted(glob.glob(os.path.join(directory, glob.escape(os.path.basename(_stem(base))) + '.*.idx.json'))):
+        with open(idx_path, encoding='utf-8') as f:
+            index = json.load(f)
+        if not index['events']:
+            continue
+        if since and index['last_ts'] and parse_timestamp(index['last_ts']) < since:
+            continue
+        if until and index['first_ts'] and parse_timestamp(index['first_ts']) >= until:
+            continue
+        gz_path = os.path.join(directory, index['segment'])
+        with open(gz_path, 'rb') as f:
+            for block in _matching_blocks(index, filters, since, until):
+                f.seek(block['offset'])
+                data = gzip.decompress(f.read(block['length']))
+                for event in _parse_lines(data.splitlines()):
+                    if _event_matches(event, filters, resource_type, since, until):
+                        yield event
+    for raw_path in raw_segments(base):
+        with open(raw_path, 'rb') as f:
+            for event in _parse_lines(f):
+                if _event_matches(event, filters, resource_type, since, until):
+                    yield event
+
+
+def verify_chain(base):
+    """Recompute every sealed segment's hash and the chain linking them.
+
+    Returns:
+        (segments verified, error message or None)
+    """
+    directory = os.path.dirname(base) or '.'
+    chain = read_chain(base)
+    prev = GENESIS_HASH
+    for number, entry in enumerate(chain):
+        name = entry['segment']
+        if entry['prev'] != prev or entry['chain'] != _chain_hash(prev, entry['content_sha256']):
+            return number, f'{name}: chain link broken'
+        try:
+            with open(os.path.join(directory, name), 'rb') as f:
+                compressed = f.read()
+        except FileNotFoundError:
+            return number, f'{name}: segment missing'
+        if hashlib.sha256(gzip.decompress(compressed)).hexdigest() != entry['content_sha256']:
+            return number, f'{name}: content does not match its chain entry'
+        try:
+            with open(os.path.join(directory, name[:-len('.log.gz')] + '.idx.json'), encoding='utf-8') as f:
+                index = json.load(f)
+        except FileNotFoundError:
+            return number, f'{name}: index missing'
+        if index['gz_sha256'] != hashlib.sha256(compressed).hexdigest():
+            return number, f'{name}: index does not match segment'
+        prev = entry['chain']
+    return len(chain), None
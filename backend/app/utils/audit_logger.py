@@ -2,55 +2,244 @@
 HIPAA-compliant audit logging.
 Logs all access to PHI with timestamp, user, action, and resource.
 """
+import atexit
 import os
 import logging
+import queue
+import threading
+import time
 import structlog
 from datetime import datetime, timezone
 from flask import request, g
 from functools import wraps
+from app.utils.audit_archive import seal_pending, raw_segments, segment_path
+
+logger = logging.getLogger(__name__)
+
+# Events are handed to a per-process writer thread through a bounded queue
+# and written in batches, each followed by one fsync, so at most
+# AUDIT_FLUSH_INTERVAL_MS of events are in memory only. A full queue falls
+# back to a synchronous write rather than dropping the event.
+# AUDIT_LOG_ASYNC=false writes and fsyncs every event on the calling thread.
+AUDIT_LOG_ASYNC = os.getenv('AUDIT_LOG_ASYNC', 'true').lower() == 'true'
+AUDIT_QUEUE_SIZE = int(os.getenv('AUDIT_QUEUE_SIZE', 10000))
+AUDIT_BATCH_SIZE = int(os.getenv('AUDIT_BATCH_SIZE', 500))
+AUDIT_FLUSH_INTERVAL_MS = int(os.getenv('AUDIT_FLUSH_INTERVAL_MS', 50))
+AUDIT_WRITE_RETRIES = 3
+# How often the writer looks for finished segments to seal
+SEAL_CHECK_SECONDS = 60
+
+_render = structlog.processors.JSONRenderer()
+_SHUTDOWN = object()
+
+
+class AuditWriter:
+    """Appends rendered audit events to the log file off the request thread.
+
+    submit() only enqueues. The writer thread drains up to AUDIT_BATCH_SIZE
+    events, or whatever arrived within AUDIT_FLUSH_INTERVAL_MS of the first,
+    writes them, and fsyncs once per batch. close() drains the queue and is
+    registered with atexit, so a clean worker shutdown loses nothing.
+
+    Events go to the current period's segment (see audit_archive); finished
+    segments are sealed on a side thread so sealing never holds up writes.
+    """
+
+    def __init__(self, path, asynchronous=AUDIT_LOG_ASYNC, queue_size=AUDIT_QUEUE_SIZE,
+                 batch_size=AUDIT_BATCH_SIZE, flush_interval_ms=AUDIT_FLUSH_INTERVAL_MS):
+        self.path = path
+        self.asynchronous = asynchronous
+        self.queue_size = queue_size
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval_ms / 1000
+        self._stats = dict.fromkeys(
+            ('enqueued', 'written', 'sync_writes', 'dropped', 'batches', 'max_queue_depth'), 0)
+        self._last_flush_at = None
+        self._start()
+
+    def _start(self):
+        # Also runs again in a forked child, which inherits neither the
+        # thread nor a usable lock.
+        self._pid = os.getpid()
+        self._write_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._file = None
+        self._file_path = None
+        self._sealer = None
+        self._next_seal_check = 0
+        self._queue = queue.Queue(maxsize=self.queue_size)
+        self._thread = None
+        if self.asynchronous:
+            self._thread = threading.Thread(target=self._run, name='audit-writer', daemon=True)
+            self._thread.start()
+
+    def _count(self, **increments):
+        with self._stats_lock:
+            for key, value in increments.items():
+                self._stats[key] += value
+
+    def submit(self, event):
+        """Queue one event dict; falls back to a synchronous write if the
+        queue is full or the writer isn't running.
+
+        Returns False if a synchronous write failed after retries (the event
+        is counted as dropped), else True."""
+        if self._pid != os.getpid():
+            self._start()
+        if self._thread is not None:
+            try:
+                self._queue.put_nowait(event)
+            except queue.Full:
+                self._count(sync_writes=1)
+            else:
+                depth = self._queue.qsize()
+                with self._stats_lock:
+                    self._stats['enqueued'] += 1
+                    self._stats['max_queue_depth'] = max(self._stats['max_queue_depth'], depth)
+                return True
+        return self._write([event])
+
+    def _run(self):
+        while True:
+            try:
+                event = self._queue.get(timeout=SEAL_CHECK_SECONDS)
+            except queue.Empty:
+                self._maybe_seal()
+                continue
+            if event is _SHUTDOWN:
+                return
+            batch = [event]
+            deadline = time.monotonic() + self.flush_interval
+            stop = False
+            while len(batch) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                try:
+                    event = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if event is _SHUTDOWN:
+                    stop = True
+                    break
+                batch.append(event)
+            try:
+                self._write(batch)
+            except Exception:
+                logger.exception('Audit writer failed')
+                self._count(dropped=len(batch))
+            if stop:
+                return
+
+    def _write(self, events):
+        """Append and fsync events; returns False if they had to be dropped."""
+        data = ''.join(_render(None, 'info', e) + '\n' for e in events)
+        for attempt in range(AUDIT_WRITE_RETRIES):
+            try:
+                with self._write_lock:
+                    path = segment_path(self.path)
+                    if path != self._file_path:
+                        if self._file is not None:
+                            self._file.close()
+                        self._file = open(path, 'a', encoding='utf-8')
+                        self._file_path = path
+                    self._file.write(data)
+                    self._file.flush()
+                    os.fsync(self._file.fileno())
+                self._count(written=len(events), batches=1)
+                self._last_flush_at = datetime.now(timezone.utc).isoformat()
+                self._maybe_seal()
+                return True
+            except (OSError, ValueError):
+                logger.exception('Audit log write failed (attempt %d)', attempt + 1)
+                time.sleep(0.05 * (attempt + 1))
+        self._count(dropped=len(events))
+        logger.critical('Dropped %d audit event(s) after %d failed writes',
+                        len(events), AUDIT_WRITE_RETRIES)
+        return False
+
+    def _maybe_seal(self):
+        now = time.monotonic()
+        if now < self._next_seal_check or (self._sealer is not None and self._sealer.is_alive()):
+            return
+        self._next_seal_check = now + SEAL_CHECK_SECONDS
+        if any(path != self._file_path for path in raw_segments(self.path)):
+            self._sealer = threading.Thread(target=self._seal, name='audit-sealer', daemon=True)
+            self._sealer.start()
+
+    def _seal(self):
+        try:
+            seal_segments(self.path)
+        except Exception:
+            logger.exception('Sealing audit segments failed')
+
+    def close(self):
+        """Write everything queued so far and stop the writer thread. Events
+        submitted afterwards are written synchronously."""
+        if self._pid != os.getpid():
+            return
+        thread, self._thread = self._thread, None
+        if thread is not None and thread.is_alive():
+            self._queue.put(_SHUTDOWN)
+            thread.join()
+
+    def metrics(self):
+        with self._stats_lock:
+            stats = dict(self._stats)
+        return {
+            **stats,
+            'asynchronous': self._thread is not None,
+            'queue_depth': self._queue.qsize(),
+            'queue_size': self.queue_size,
+            'last_flush_at': self._last_flush_at,
+        }
+
+
+_writer = None
+_writer_lock = threading.Lock()
+
+
+def audit_log_file():
+    """AUDIT_LOG_FILE; segments and their indexes are written beside it."""
+    return os.getenv('AUDIT_LOG_FILE', 'logs/audit.log')
 
 
 def setup_audit_logging(app):
     """Configure structured audit logging for HIPAA compliance."""
+    global _writer
 
-    log_file = os.getenv('AUDIT_LOG_FILE', 'logs/audit.log')
+    log_file = audit_log_file()
     os.makedirs(os.path.dirname(log_file), exist_ok=True)
 
-    # Configure structlog for JSON output
-    structlog.configure(
-        processors=[
-            structlog.stdlib.filter_by_level,
-            structlog.stdlib.add_logger_name,
-            structlog.stdlib.add_log_level,
-            structlog.stdlib.PositionalArgumentsFormatter(),
-            structlog.processors.TimeStamper(fmt="iso"),
-            structlog.processors.StackInfoRenderer(),
-            structlog.processors.format_exc_info,
-            structlog.processors.UnicodeDecoder(),
-            structlog.processors.JSONRenderer()
-        ],
-        context_class=dict,
-        logger_factory=structlog.stdlib.LoggerFactory(),
-        wrapper_class=structlog.stdlib.BoundLogger,
-        cache_logger_on_first_use=True,
-    )
-
-    # File handler for audit logs
-    file_handler = logging.FileHandler(log_file)
-    file_handler.setLevel(logging.INFO)
-    file_handler.setFormatter(logging.Formatter('%(message)s'))
-
-    audit_logger = logging.getLogger('audit')
-    audit_logger.setLevel(logging.INFO)
-    audit_logger.addHandler(file_handler)
-
-    app.config['AUDIT_LOGGER'] = structlog.get_logger('audit')
-
-
-def get_audit_logger():
-    """Get the audit logger instance."""
-    from flask import current_app
-    return current_app.config.get('AUDIT_LOGGER', structlog.get_logger('audit'))
+    # One writer per process and file, however many apps are created
+    with _writer_lock:
+        if _writer is None or _writer.path != log_file:
+            if _writer is not None:
+                _writer.close()
+            _writer = AuditWriter(log_file)
+            atexit.register(_writer.close)
+
+    app.config['AUDIT_WRITER'] = _writer
+
+
+def seal_segments(log_file=None):
+    """Seal finished segments and log each one's chain hash.
+
+    The SEAL event lands in the live segment, so each chain hash is also
+    part of the next sealed segment's content.
+
+    Returns:
+        The new chain entries
+    """
+    sealed = seal_pending(log_file or audit_log_file())
+    for entry in sealed:
+        audit_log('SEAL', 'audit_segment', resource_id=entry['segment'], user_id='system',
+                  details={'events': entry['events'], 'chain': entry['chain']})
+    return sealed
+
+
+def audit_metrics():
+    """Writer queue depth and counters (enqueued, written, sync_writes,
+    dropped, batches), or None if audit logging isn't set up."""
+    return _writer.metrics() if _writer is not None else None
 
 
 def audit_log(action: str, resource_type: str, resource_id: str = None,
@@ -65,8 +254,6 @@ def audit_log(action: str, resource_type: str, resource_id: str = None,
         details: Additional details about the action (optional)
         user_id: ID of the user performing the action (optional, uses g.user_id if not provided)
     """
-    logger = get_audit_logger()
-
     # Get user ID from context if not provided
     if user_id is None:
         user_id = getattr(g, 'user_id', 'anonymous')
@@ -83,10 +270,16 @@ def audit_log(action: str, resource_type: str, resource_id: str = None,
         'user_id': user_id,
         'client_ip': client_ip,
         'user_agent': user_agent,
-        'details': details or {}
+        'details': details or {},
+        'event': 'audit_event',
+        'logger': 'audit',
+        'level': 'info',
     }
 
-    logger.info("audit_event", **log_entry)
+    if _writer is not None:
+        _writer.submit(log_entry)
+    else:
+        logging.getLogger('audit').info(_render(None, 'info', log_entry))
 
 
 def audit_phi_access(action: str, resource_type: str):
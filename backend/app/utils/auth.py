@@ -61,6 +61,9 @@ def token_required(f):
     - Token has not been revoked (logout)
     - User account is still active (admin deactivation)
     - User email is verified (blocks unverified users from most endpoints)
+
+    Revocations and the user's account flags are cached briefly per worker
+    (AUTH_CACHE_TTL); the flags are stored on g.auth_status for later checks.
     """
     @wraps(f)
     def wrapper(*args, **kwargs):
@@ -81,13 +84,13 @@ def token_required(f):
 
         # Check if token has been revoked
         from app.models.revoked_token import RevokedToken
-        if RevokedToken.is_token_revoked(jti):
+        if RevokedToken.is_token_revoked(jti, payload.get('exp')):
             return jsonify({'error': 'Token has been revoked'}), 401
 
-        # Check if user is still active
+        # Check if user is still active (cached flags, no PHI columns loaded)
         from app.models.user import User
-        user = User.query.get(payload.get('user_id'))
-        if not user or not user.is_active:
+        status = User.auth_status(payload.get('user_id'))
+        if not status or not status.is_active:
             return jsonify({'error': 'Account is deactivated'}), 401
 
         # Store user info in flask g object
@@ -95,10 +98,11 @@ def token_required(f):
         g.user_email = payload.get('email')
         g.token_jti = jti
         g.token_exp = payload.get('exp')
+        g.auth_status = status
 
         # Check email verification (skip for allowlisted endpoints)
         if request.endpoint not in _EMAIL_VERIFY_ALLOWLIST:
-            if not user.is_email_verified:
+            if not status.is_email_verified:
                 return jsonify({'error': 'Email not verified'}), 403
 
         return f(*args, **kwargs)
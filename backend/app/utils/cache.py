@@ -0,0 +1,105 @@
+"""
+Small per-process caches for hot, non-PHI read paths.
+Entries expire after a TTL and can be cleared when the rows they were built
+from are committed, so each gunicorn worker is at most one TTL stale.
+"""
+import threading
+import time
+from collections import OrderedDict
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session
+
+_MISSING = object()
+
+
+class TTLCache:
+    """Thread-safe, size-bounded cache whose entries expire after ttl_seconds."""
+
+    def __init__(self, ttl_seconds, max_entries=1024):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._data.get(key, _MISSING)
+            if entry is _MISSING:
+                return default
+            value, expires_at = entry
+            if expires_at <= now:
+                del self._data[key]
+                return default
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl_seconds=None):
+        ttl = self.ttl_seconds if ttl_seconds is None else ttl_seconds
+        if ttl <= 0:
+            return
+        with self._lock:
+            self._data[key] = (value, time.monotonic() + ttl)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+# (cache, model, attrs) registrations consulted after every flush
+_commit_invalidations = []
+
+
+def clear_on_commit(cache, model, attrs=()):
+    """Clear ``cache`` after any commit that inserted or deleted a ``model``
+    row, or changed one of ``attrs`` on an existing row."""
+    _commit_invalidations.append((cache, model, tuple(attrs)))
+
+
+def invalidate_on_commit(session, model):
+    """Clear the caches registered for ``model`` when session commits.
+
+    For rows written with Core statements (bulk inserts, upserts), which
+    never show up in session.new."""
+    pending = session.info.setdefault('cache_invalidations', set())
+    pending.update(cache for cache, m, _ in _commit_invalidations if m is model)
+
+
+def _touches(obj, attrs):
+    state = inspect(obj)
+    return any(state.attrs[name].history.has_changes() for name in attrs)
+
+
+@event.listens_for(Session, 'after_flush')
+def _collect_invalidations(session, flush_context):
+    if not _commit_invalidations:
+        return
+    pending = session.info.setdefault('cache_invalidations', set())
+    for cache, model, attrs in _commit_invalidations:
+        if cache in pending:
+            continue
+        if any(isinstance(o, model) for o in session.new) or \
+                any(isinstance(o, model) for o in session.deleted) or \
+                (attrs and any(isinstance(o, model) and _touches(o, attrs) for o in session.dirty)):
+            pending.add(cache)
+
+
+@event.listens_for(Session, 'after_commit')
+def _apply_invalidations(session):
+    for cache in session.info.pop('cache_invalidations', ()):
+        cache.clear()
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_invalidations(session):
+    session.info.pop('cache_invalidations', None)
@@ -0,0 +1,246 @@
+"""
+Call list evaluation.
+
+Users are re-scored when something that can change their list assignment
+happens instead of sweeping every active user on each refresh:
+- create_reading evaluates the patient in the reading's transaction
+- status changes and closed items mark the user due (mark_due)
+- time-based changes (a reading leaving the 7-day window, the 30-day
+  no-reading threshold, a cooldown expiring) are recorded on the user's
+  rollup row as call_list_due_at when the user is evaluated
+
+refresh_call_list() then only evaluates users whose due time has passed, plus
+active users that have never been evaluated. rebuild_call_list() re-scores
+everyone and is kept as a consistency check.
+"""
+from datetime import datetime, timedelta, timezone
+from sqlalchemy import or_
+from sqlalchemy.dialects import postgresql, sqlite
+from app import db
+from app.models import User, CallListItem, UserReadingStats
+
+NO_READING_AFTER = timedelta(days=30)
+EVALUATE_BATCH_SIZE = 500
+
+
+def _utcnow():
+    """Naive UTC now, matching how reading and cooldown dates are stored."""
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def classify(stats, now):
+    """
+    Pick the list for a user's rollup row.
+    Nurse: systolic >= 150 OR diastolic >= 86 (7-day avg)
+    Coach: systolic 135-149 OR diastolic 80-87 (but NOT nurse-level)
+    No-Reading: no readings in 30+ days (or never)
+
+    Returns (list_type, priority, priority_title, priority_detail) or None.
+    """
+    avg_7 = stats.avg_7_day if stats else None
+    if avg_7:
+        avg_sys, avg_dia = avg_7['systolic'], avg_7['diastolic']
+        if avg_sys >= 150 or avg_dia >= 86:
+            reason = 'systolic >= 150' if avg_sys >= 150 else 'diastolic >= 86'
+            return ('nurse', 'high', 'Elevated BP — Nurse Review',
+                    f'7-day avg: {avg_sys}/{avg_dia} ({reason})')
+        if 135 <= avg_sys <= 149 or 80 <= avg_dia <= 87:
+            return ('coach', 'medium', 'Elevated BP — HTN Coach',
+                    f'7-day avg: {avg_sys}/{avg_dia}')
+
+    latest_date = stats.last_reading_date if stats else None
+    if latest_date is None:
+        return ('no_reading', 'low', 'No Recent Readings', 'No readings ever submitted')
+    if latest_date < now - NO_READING_AFTER:
+        # The detail names the date rather than "N days ago" so it stays
+        # true without re-evaluating the user every day.
+        return ('no_reading', 'low', 'No Recent Readings',
+                f'Last reading: {latest_date.strftime("%b %d, %Y")}')
+    return None
+
+
+def _next_due(stats, cooldowns, now):
+    """Earliest time the user's assignment can change without a new event."""
+    candidates = list(cooldowns)
+    if stats.windows_valid_until is not None:
+        candidates.append(stats.windows_valid_until)
+    if stats.last_reading_date is not None:
+        candidates.append(stats.last_reading_date + NO_READING_AFTER)
+    upcoming = [c for c in candidates if c > now]
+    return min(upcoming) if upcoming else None
+
+
+def _load_stats(user_ids):
+    """Current rollup rows for user_ids, creating any that are missing."""
+    stats_map = UserReadingStats.for_users(user_ids, refresh=True)
+    missing = [uid for uid in user_ids if uid not in stats_map]
+    if missing:
+        # Users with readings but no row yet get a real rollup; the rest get
+        # a zeroed row so their due time has somewhere to live.
+        UserReadingStats.rebuild(missing)
+        stats_map.update(UserReadingStats.for_users(missing, refresh=True))
+        for uid in missing:
+            if uid not in stats_map:
+                stats = UserReadingStats(user_id=uid, reading_count=0)
+                db.session.add(stats)
+                stats_map[uid] = stats
+    return stats_map
+
+
+def evaluate_users(user_ids, now=None):
+    """Re-score user_ids and create or update their open call list items.
+
+    Only active, non-admin users are placed on a list; everyone else has
+    their due time cleared until an event marks them again. Flushes but does
+    not commit, so callers can fold the evaluation into their transaction.
+
+    New items are inserted with ON CONFLICT DO NOTHING against the open-item
+    unique index, so two concurrent evaluations of the same user (e.g. two
+    readings at once) can't both create an open item on one list.
+
+    Returns:
+        Number of call list items created
+    """
+    now = now or _utcnow()
+    user_ids = list(dict.fromkeys(user_ids))
+    created = 0
+    db.session.flush()
+    dialect = db.session.get_bind().dialect.name
+    insert = postgresql.insert if dialect == 'postgresql' else sqlite.insert
+
+    for start in range(0, len(user_ids), EVALUATE_BATCH_SIZE):
+        chunk = user_ids[start:start + EVALUATE_BATCH_SIZE]
+        eligible = {
+            row.id for row in
+            db.session.query(User.id)
+            .filter(User.id.in_(chunk), User.user_status == 'active', User.is_admin == False)
+            .all()
+        }
+
+        items = (
+            CallListItem.query
+            .filter(CallListItem.user_id.in_(chunk),
+                    or_(CallListItem.status == 'open', CallListItem.cooldown_until > now))
+            .all()
+        )
+        open_item_map = {}
+        cooldown_map = {}
+        for item in items:
+            if item.status == 'open':
+                open_item_map.setdefault(item.user_id, {})[item.list_type] = item
+            if item.cooldown_until and item.cooldown_until > now:
+                cooldown_map.setdefault(item.user_id, {})[item.list_type] = item.cooldown_until
+
+        new_items = []
+        stats_map = _load_stats([uid for uid in chunk if uid in eligible])
+        ineligible = [uid for uid in chunk if uid not in eligible]
+        if ineligible:
+            (UserReadingStats.query
+             .filter(UserReadingStats.user_id.in_(ineligible))
+             .update({UserReadingStats.call_list_due_at: None}, synchronize_session=False))
+
+        for user_id, stats in stats_map.items():
+            cooldowns = cooldown_map.get(user_id, {})
+            stats.call_list_due_at = _next_due(stats, cooldowns.values(), now)
+
+            assignment = classify(stats, now)
+            if assignment is None:
+                continue
+            list_type, priority, priority_title, priority_detail = assignment
+
+            # Skip if in cooldown for this list type
+            if list_type in cooldowns:
+                continue
+
+            # Update priority info on an existing open item on this list
+            existing = open_item_map.get(user_id, {}).get(list_type)
+            if existing:
+                existing.priority = priority
+                existing.priority_title = priority_title
+                existing.priority_detail = priority_detail
+                continue
+
+            new_items.append(dict(
+                user_id=user_id,
+                list_type=list_type,
+                status='open',
+                priority=priority,
+                priority_title=priority_title,
+                priority_detail=priority_detail,
+            ))
+
+        if new_items:
+            stmt = (insert(CallListItem).values(new_items)
+                    .on_conflict_do_nothing(index_elements=['user_id', 'list_type'],
+                                            index_where=CallListItem.status == 'open')
+                    .returning(CallListItem.id))
+            created += len(db.session.scalars(stmt).all())
+
+    db.session.flush()
+    return created
+
+
+def due_user_ids(now=None):
+    """Users whose assignment may have changed since they were last evaluated."""
+    now = now or _utcnow()
+    due = [
+        row.user_id for row in
+        db.session.query(UserReadingStats.user_id)
+        .filter(UserReadingStats.call_list_due_at <= now)
+        .all()
+    ]
+    # Active users that have never been evaluated have no rollup row yet
+    never_evaluated = [
+        row.id for row in
+        db.session.query(User.id)
+        .outerjoin(UserReadingStats, UserReadingStats.user_id == User.id)
+        .filter(UserReadingStats.user_id.is_(None),
+                User.user_status == 'active', User.is_admin == False)
+        .all()
+    ]
+    return due + never_evaluated
+
+
+def mark_due(user_ids, now=None):
+    """Have the next refresh re-score user_ids (e.g. after a status change)."""
+    user_ids = list(user_ids)
+    if not user_ids:
+        return
+    (UserReadingStats.query
+     .filter(UserReadingStats.user_id.in_(user_ids))
+     .update({UserReadingStats.call_list_due_at: now or _utcnow()}, synchronize_session=False))
+
+
+def refresh_call_list(now=None):
+    """Evaluate users that are due and commit.
+
+    Returns:
+        (users evaluated, call list items created)
+    """
+    now = now or _utcnow()
+    user_ids = due_user_ids(now)
+    created = evaluate_users(user_ids, now=now)
+    db.session.commit()
+    return len(user_ids), created
+
+
+def rebuild_call_list(now=None):
+    """Re-score every active, non-admin user and commit.
+
+    Incremental refreshes make this unnecessary in normal operation; it is
+    kept as a consistency check.
+
+    Returns:
+        (users evaluated, call list items created)
+    """
+    now = now or _utcnow()
+    user_ids = [
+        row.id for row in
+        db.session.query(User.id)
+        .filter(User.user_status == 'active', User.is_admin == False)
+        .order_by(User.id)
+        .all()
+    ]
+    created = evaluate_users(user_ids, now=now)
+    db.session.commit()
+    return len(user_ids), created
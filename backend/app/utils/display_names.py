@@ -0,0 +1,45 @@
+"""
+Batch resolution of user names (and other single PHI fields) for listings.
+
+Listing endpoints used to look each row's user up with User.query.get() and
+decrypt one name at a time. resolve_user_display_names() loads only the
+encrypted column for every id it hasn't seen in one IN query, batch-decrypts
+it, and keeps the plaintext for the rest of the request (dropped with the PHI
+memo at teardown), so a page costs one query however many rows it has.
+Outside a request (export workers, CLI) callers pass their own cache dict.
+"""
+from app import db
+from app.models.user import User, PHI_FIELDS
+from app.utils.encryption import decrypt_phi_many
+from app.utils.phi_cache import remember, request_cache
+
+IN_CHUNK_SIZE = 500
+
+
+def resolve_user_field(user_ids, field, cache=None):
+    """Return {user_id: plaintext} for one PHI field of user_ids.
+
+    Unknown users and values that fail to decrypt map to None."""
+    column = getattr(User, PHI_FIELDS[field])
+    if cache is None:
+        cache = request_cache(f'user_field:{field}')
+        if cache is None:
+            cache = {}
+    user_ids = list(dict.fromkeys(uid for uid in user_ids if uid is not None))
+    missing = [uid for uid in user_ids if uid not in cache]
+    for start in range(0, len(missing), IN_CHUNK_SIZE):
+        chunk = missing[start:start + IN_CHUNK_SIZE]
+        rows = db.session.query(User.id, column).filter(User.id.in_(chunk)).all()
+        ciphertexts = [row[1] for row in rows]
+        values = decrypt_phi_many(ciphertexts, strict=False)
+        remember(ciphertexts, values)
+        cache.update(dict.fromkeys(chunk))
+        for row, value in zip(rows, values):
+            cache[row[0]] = value
+    return {uid: cache[uid] for uid in user_ids}
+
+
+def resolve_user_display_names(user_ids, cache=None):
+    """Return {user_id: display name}, falling back to 'User #<id>'."""
+    names = resolve_user_field(user_ids, 'name', cache=cache)
+    return {uid: name or f'User #{uid}' for uid, name in names.items()}
@@ -1,29 +1,63 @@
 """
 Email sending utility with pluggable backends.
-Default 'console' backend prints verification codes to stdout for dev/testing.
+Default 'console' backend prints verification codes to stdout for dev/testing;
+with EMAIL_BACKEND unset, SMTP is used whenever SMTP_HOST is set.
+
+The backend is built once per process. The SMTP backend keeps a small pool of
+logged-in connections, so consecutive messages skip the TCP connect, STARTTLS
+and AUTH round trips, and send_many() sends a whole batch over one session.
 """
+import atexit
 import os
 import logging
 import smtplib
+import threading
+import time
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 from abc import ABC, abstractmethod
 
 logger = logging.getLogger(__name__)
 
+# Idle connections kept per process; 0 opens a connection per send
+SMTP_POOL_SIZE = int(os.getenv('SMTP_POOL_SIZE', 4))
+# An idle connection is checked with NOOP before reuse after this long...
+SMTP_NOOP_AFTER_SECONDS = int(os.getenv('SMTP_NOOP_AFTER_SECONDS', 30))
+# ...and dropped unused after this long (servers time idle sessions out)
+SMTP_MAX_IDLE_SECONDS = int(os.getenv('SMTP_MAX_IDLE_SECONDS', 240))
+
 
 class EmailBackend(ABC):
     """Abstract base class for email backends."""
 
+    # False for backends that don't actually deliver (console)
+    delivers = True
+
     @abstractmethod
     def send(self, to_email, subject, body_text, body_html=None):
         """Send an email."""
         pass
 
+    def send_many(self, messages):
+        """Send (to_email, subject, body_text, body_html) tuples.
+
+        Returns:
+            List of (to_email, exception) for the messages that failed
+        """
+        failures = []
+        for to_email, subject, body_text, body_html in messages:
+            try:
+                self.send(to_email, subject, body_text, body_html)
+            except Exception as e:
+                failures.append((to_email, e))
+        return failures
+
 
 class ConsoleBackend(EmailBackend):
     """Console backend that prints emails to stdout (for development/testing)."""
 
+    delivers = False
+
     def send(self, to_email, subject, body_text, body_html=None):
         message = (
             f"\n{'='*50}\n"
@@ -37,23 +71,106 @@ class ConsoleBackend(EmailBackend):
         logger.info("Email sent via console backend to %s", to_email)
 
 
+class SMTPConnectionPool:
+    """Process-wide pool of connected, logged-in smtplib.SMTP sessions.
+
+    A connection is used by one thread at a time: acquire() hands out an idle
+    one (checking it with NOOP if it has sat for a while) or opens a new one,
+    and release() keeps up to size of them for the next sender.
+    """
+
+    def __init__(self, connect, size=SMTP_POOL_SIZE, noop_after=SMTP_NOOP_AFTER_SECONDS,
+                 max_idle=SMTP_MAX_IDLE_SECONDS):
+        self._connect = connect
+        self.size = size
+        self.noop_after = noop_after
+        self.max_idle = max_idle
+        self._idle = []  # (connection, released_at), most recent last
+        self._lock = threading.Lock()
+        self._pid = os.getpid()
+
+    def acquire(self):
+        while True:
+            with self._lock:
+                if self._pid != os.getpid():
+                    # Sessions inherited across fork belong to the parent
+                    self._idle = []
+                    self._pid = os.getpid()
+                if not self._idle:
+                    break
+                conn, released_at = self._idle.pop()
+            idle_for = time.monotonic() - released_at
+            if idle_for > self.max_idle:
+                self._close(conn)
+                continue
+            if idle_for > self.noop_after:
+                try:
+                    if conn.noop()[0] != 250:
+                        raise smtplib.SMTPServerDisconnected('NOOP failed')
+                except (smtplib.SMTPException, OSError):
+                    self._close(conn, quit=False)
+                    continue
+            return conn
+        return self._connect()
+
+    def release(self, conn, broken=False):
+        if not broken:
+            with self._lock:
+                if self._pid == os.getpid() and len(self._idle) < self.size:
+                    self._idle.append((conn, time.monotonic()))
+                    return
+        self._close(conn, quit=not broken)
+
+    def close_all(self):
+        with self._lock:
+            idle, self._idle = self._idle, []
+            owned = self._pid == os.getpid()
+        if owned:
+            for conn, _ in idle:
+                self._close(conn)
+
+    @staticmethod
+    def _close(conn, quit=True):
+        try:
+            if quit:
+                conn.quit()
+            else:
+                conn.close()
+        except (smtplib.SMTPException, OSError):
+            conn.close()
+
+
 class SMTPBackend(EmailBackend):
-    """SMTP backend with TLS support."""
+    """SMTP backend with TLS support and pooled connections."""
 
     def __init__(self):
         self.host = os.getenv('SMTP_HOST')
         self.port = int(os.getenv('SMTP_PORT', '587'))
         self.user = os.getenv('SMTP_USER')
         self.password = os.getenv('SMTP_PASS')
-        self.from_email = os.getenv('SMTP_FROM_EMAIL', self.user)
+        # SMTP_FROM is the name the call list's email action used to read
+        self.from_email = os.getenv('SMTP_FROM_EMAIL') or os.getenv('SMTP_FROM') or self.user
         self.use_tls = os.getenv('SMTP_USE_TLS', 'true').lower() == 'true'
 
         if not all([self.host, self.user, self.password]):
             raise ValueError(
                 "SMTP backend requires SMTP_HOST, SMTP_USER, and SMTP_PASS environment variables"
             )
+        self.pool = SMTPConnectionPool(self._connect)
+        atexit.register(self.pool.close_all)
 
-    def send(self, to_email, subject, body_text, body_html=None):
+    def _connect(self):
+        server = smtplib.SMTP(self.host, self.port, timeout=30)
+        try:
+            if self.use_tls:
+                server.starttls()
+            server.login(self.user, self.password)
+        except BaseException:
+            server.close()
+            raise
+        return server
+
+    def _build(self, to_email, subject, body_text, body_html):
         msg = MIMEMultipart('alternative')
         msg['Subject'] = subject
         msg['From'] = self.from_email
@@ -62,17 +179,45 @@ class SMTPBackend(EmailBackend):
         msg.attach(MIMEText(body_text, 'plain'))
         if body_html:
             msg.attach(MIMEText(body_html, 'html'))
+        return msg.as_string()
+
+    def send(self, to_email, subject, body_text, body_html=None):
+        failures = self.send_many([(to_email, subject, body_text, body_html)])
+        if failures:
+            raise failures[0][1]
 
+    def send_many(self, messages):
+        """Send every message over one pooled session.
+
+        A dropped connection is replaced once per message; a message the
+        server rejects is reported and the rest are still sent."""
+        failures = []
+        conn = None
         try:
-            with smtplib.SMTP(self.host, self.port) as server:
-                if self.use_tls:
-                    server.starttls()
-                server.login(self.user, self.password)
-                server.sendmail(self.from_email, to_email, msg.as_string())
-            logger.info("Email sent via SMTP to %s", to_email)
-        except smtplib.SMTPException as e:
-            logger.error("SMTP error sending email to %s: %s", to_email, str(e))
-            raise
+            for to_email, subject, body_text, body_html in messages:
+                msg = self._build(to_email, subject, body_text, body_html)
+                for attempt in (1, 2):
+                    try:
+                        if conn is None:
+                            conn = self.pool.acquire()
+                        conn.sendmail(self.from_email, to_email, msg)
+                        logger.info("Email sent via SMTP to %s", to_email)
+                        break
+                    except (smtplib.SMTPServerDisconnected, OSError) as e:
+                        if conn is not None:
+                            self.pool.release(conn, broken=True)
+                            conn = None
+                        if attempt == 2:
+                            logger.error("SMTP error sending email to %s: %s", to_email, str(e))
+                            failures.append((to_email, e))
+                    except smtplib.SMTPException as e:
+                        logger.error("SMTP error sending email to %s: %s", to_email, str(e))
+                        failures.append((to_email, e))
+                        break
+        finally:
+            if conn is not None:
+                self.pool.release(conn)
+        return failures
 
 
 class SendGridBackend(EmailBackend):
@@ -120,18 +265,36 @@ class SendGridBackend(EmailBackend):
             raise
 
 
-def get_email_backend():
-    """Get the configured email backend instance."""
-    backend_name = os.getenv('EMAIL_BACKEND', 'console').lower()
+_backends = {}
+_backends_lock = threading.Lock()
+
+
+def _backend_name():
+    name = os.getenv('EMAIL_BACKEND')
+    if not name:
+        # SMTP settings alone have always been enough for the call list's emails
+        name = 'smtp' if os.getenv('SMTP_HOST') else 'console'
+    return name.lower()
 
-    if backend_name == 'console':
-        return ConsoleBackend()
-    elif backend_name == 'smtp':
-        return SMTPBackend()
-    elif backend_name == 'sendgrid':
-        return SendGridBackend()
-    else:
-        raise ValueError(f"Unknown EMAIL_BACKEND: {backend_name}")
+
+def get_email_backend():
+    """Get the configured email backend instance (one per process)."""
+    backend_name = _backend_name()
+
+    backend = _backends.get(backend_name)
+    if backend is not None:
+        return backend
+    with _backends_lock:
+        if backend_name not in _backends:
+            if backend_name == 'console':
+                _backends[backend_name] = ConsoleBackend()
+            elif backend_name == 'smtp':
+                _backends[backend_name] = SMTPBackend()
+            elif backend_name == 'sendgrid':
+                _backends[backend_name] = SendGridBackend()
+            else:
+                raise ValueError(f"Unknown EMAIL_BACKEND: {backend_name}")
+        return _backends[backend_name]
 
 
 def send_email(to_email, subject, body_text, body_html=None):
@@ -140,6 +303,26 @@ def send_email(to_email, subject, body_text, body_html=None):
     backend.send(to_email, subject, body_text, body_html)
 
 
+def email_delivery_configured():
+    """Whether email actually reaches recipients (not the console backend).
+
+    Patient-facing sends check this rather than printing PHI to stdout."""
+    try:
+        return get_email_backend().delivers
+    except ValueError as e:
+        logger.error("Email backend misconfigured: %s", e)
+        return False
+
+
+def send_emails(messages):
+    """Send (to_email, subject, body_text, body_html) tuples in one batch.
+
+    Returns:
+        List of (to_email, exception) for the messages that failed
+    """
+    return get_email_backend().send_many(messages)
+
+
 def send_verification_email(to_email, code):
     """Send a verification email with the given code."""
     subject = "Your Verification Code"
@@ -240,3 +423,26 @@ def send_cuff_shipped_email(to_email, name, tracking_number):
     """
     send_email(to_email, subject, body_text, body_html)
     logger.info("Cuff shipped email sent to %s", to_email)
+
+
+def reading_reminder_email(name):
+    """(subject, body_text, body_html) for the reading reminder campaign."""
+    subject = "Time to Check Your Blood Pressure"
+    body_text = (
+        f"Hello {name},\n\n"
+        f"We haven't received a blood pressure reading from you in a while.\n\n"
+        f"Please take a reading with your cuff and submit it in the app.\n\n"
+        f"Thank you!"
+    )
+    body_html = f"""
+    <html>
+    <body style="font-family: Arial, sans-serif; max-width: 600px; margin: 0 auto;">
+        <h2 style="color: #007bff;">Time to Check Your BP</h2>
+        <p>Hello {name},</p>
+        <p>We haven't received a blood pressure reading from you in a while.</p>
+        <p>Please take a reading with your cuff and submit it in the app.</p>
+        <p style="margin-top: 30px;">Thank you!</p>
+    </body>
+    </html>
+    """
+    return subject, body_text, body_html
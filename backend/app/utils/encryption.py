@@ -4,9 +4,38 @@ Uses AES-256-GCM for encryption at rest.
 """
 import os
 import base64
+import hashlib
+import hmac
+import logging
+import struct
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from cryptography.hazmat.primitives.ciphers.aead import AESGCM
 from cryptography.hazmat.backends import default_backend
 
+logger = logging.getLogger(__name__)
+
+# Batches at least this large are split across the crypto thread pool.
+# AES-GCM in `cryptography` releases the GIL, so the chunks run in parallel.
+PARALLEL_MIN_BATCH = int(os.getenv('PHI_PARALLEL_MIN_BATCH', 512))
+CRYPTO_WORKERS = int(os.getenv('PHI_CRYPTO_WORKERS', min(4, os.cpu_count() or 1)))
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def _get_pool():
+    """Lazily create the shared crypto thread pool (None when disabled)."""
+    global _pool
+    if CRYPTO_WORKERS <= 1:
+        return None
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ThreadPoolExecutor(max_workers=CRYPTO_WORKERS,
+                                           thread_name_prefix='phi-crypto')
+    return _pool
+
 
 class PHIEncryptor:
     """Handles encryption/decryption of PHI data at rest."""
@@ -48,6 +77,48 @@ class PHIEncryptor:
         plaintext = self._aesgcm.decrypt(nonce, ciphertext, None)
         return plaintext.decode('utf-8')
 
+    def encrypt_many(self, plaintexts, parallel=None) -> list:
+        """
+        Encrypt a list of plaintexts with one AESGCM context.
+        Empty values pass through unchanged, as with encrypt().
+        """
+        return self._map(self.encrypt, list(plaintexts), parallel)
+
+    def decrypt_many(self, encrypted_values, strict=True, parallel=None) -> list:
+        """
+        Decrypt a list of base64 ciphertexts with one AESGCM context.
+        Empty values pass through unchanged. With strict=False a value that
+        fails to decrypt becomes None instead of raising.
+
+        parallel: True/False forces the thread pool on/off; None uses it for
+        batches of at least PARALLEL_MIN_BATCH values.
+        """
+        if strict:
+            fn = self.decrypt
+        else:
+            def fn(value):
+                try:
+                    return self.decrypt(value)
+                except Exception:
+                    logger.error('PHI decryption failed in batch', exc_info=True)
+                    return None
+        return self._map(fn, list(encrypted_values), parallel)
+
+    @staticmethod
+    def _map(fn, values, parallel):
+        if parallel is None:
+            parallel = len(values) >= PARALLEL_MIN_BATCH
+        pool = _get_pool() if parallel else None
+        if pool is None or len(values) < 2:
+            return [fn(v) for v in values]
+
+        chunk = -(-len(values) // CRYPTO_WORKERS)
+        chunks = [values[i:i + chunk] for i in range(0, len(values), chunk)]
+        results = []
+        for part in pool.map(lambda part: [fn(v) for v in part], chunks):
+            results.extend(part)
+        return results
+
 
 # Singleton instance
 _encryptor = None
@@ -71,11 +142,136 @@ def decrypt_phi(value: str) -> str:
     return get_encryptor().decrypt(value)
 
 
+def encrypt_phi_many(values, parallel=None) -> list:
+    """Convenience function to encrypt a batch of PHI values."""
+    return get_encryptor().encrypt_many(values, parallel=parallel)
+
+
+def decrypt_phi_many(values, strict=True, parallel=None) -> list:
+    """Convenience function to decrypt a batch of PHI values."""
+    return get_encryptor().decrypt_many(values, strict=strict, parallel=parallel)
+
+
+# Encrypted files (export artifacts) are a header followed by records of up
+# to PHI_FILE_CHUNK plaintext bytes: ciphertext length and final flag, nonce,
+# then AES-GCM ciphertext with the record index and flag as associated data,
+# so records can't be reordered, dropped or truncated unnoticed.
+PHI_FILE_MAGIC = b'PHIENC1\n'
+PHI_FILE_CHUNK = 64 * 1024
+_RECORD_HEADER = struct.Struct('>I?')
+
+
+class PHIFileWriter:
+    """Write-only file object that encrypts everything written to raw with
+    the PHI key. close() writes the final record; raw stays open."""
+
+    def __init__(self, raw, chunk_size=PHI_FILE_CHUNK):
+        self._raw = raw
+        self._aesgcm = get_encryptor()._aesgcm
+        self._chunk_size = chunk_size
+        self._buffer = bytearray()
+        self._index = 0
+        self.size = 0  # plaintext bytes written
+        self.closed = False
+        raw.write(PHI_FILE_MAGIC)
+
+    def write(self, data):
+        self._buffer += data
+        self.size += len(data)
+        while len(self._buffer) >= self._chunk_size:
+            self._seal(bytes(self._buffer[:self._chunk_size]), final=False)
+            del self._buffer[:self._chunk_size]
+        return len(data)
+
+    def _seal(self, chunk, final):
+        nonce = os.urandom(12)
+        ciphertext = self._aesgcm.encrypt(nonce, chunk, struct.pack('>Q?', self._index, final))
+        self._raw.write(_RECORD_HEADER.pack(len(ciphertext), final) + nonce + ciphertext)
+        self._index += 1
+
+    def close(self):
+        if not self.closed:
+            self._seal(bytes(self._buffer), final=True)
+            self._buffer.clear()
+            self.closed = True
+
+
+def iter_phi_file(path, chunk_size=None):
+    """Open a file written by PHIFileWriter and return an iterator over its
+    decrypted chunks.
+
+    Raises:
+        ValueError: if the file isn't an encrypted PHI file (checked before
+            returning); while iterating, if it is truncated
+        cryptography.exceptions.InvalidTag: while iterating, if a record was
+            tampered with
+    """
+    f = open(path, 'rb')
+    if f.read(len(PHI_FILE_MAGIC)) != PHI_FILE_MAGIC:
+        f.close()
+        raise ValueError('Not an encrypted PHI file')
+    return _iter_phi_records(f, get_encryptor()._aesgcm)
+
+
+def _iter_phi_records(f, aesgcm):
+    with f:
+        index = 0
+        while True:
+            header = f.read(_RECORD_HEADER.size)
+            if len(header) < _RECORD_HEADER.size:
+                raise ValueError('Truncated encrypted PHI file')
+            length, final = _RECORD_HEADER.unpack(header)
+            nonce = f.read(12)
+            ciphertext = f.read(length)
+            if len(nonce) < 12 or len(ciphertext) < length:
+                raise ValueError('Truncated encrypted PHI file')
+            yield aesgcm.decrypt(nonce, ciphertext, struct.pack('>Q?', index, final))
+            if final:
+                return
+            index += 1
+
+
 def hash_email(email: str) -> str:
     """Return a deterministic SHA-256 hex digest for email lookup.
     The PHI_ENCRYPTION_KEY is used as HMAC key so the hash is not reversible
     without the key."""
-    import hashlib
-    import hmac
     key = base64.b64decode(os.getenv('PHI_ENCRYPTION_KEY', ''))
     return hmac.new(key, email.strip().lower().encode('utf-8'), hashlib.sha256).hexdigest()
+
+
+# n-gram size of the blind index, and so the shortest searchable term. Only
+# trigrams are stored: 1- and 2-gram tokens repeat across so many users that
+# their frequencies would give away letters and bigrams without the key.
+BLIND_INDEX_GRAM = 3
+
+
+def _blind_index_key(field: str) -> bytes:
+    """Derive a search-only HMAC key per field, so index tokens never collide
+    with email_hash values or with each other across name and email."""
+    key = base64.b64decode(os.getenv('PHI_ENCRYPTION_KEY', ''))
+    return hmac.new(key, b'user-search-blind-index:' + field.encode('utf-8'), hashlib.sha256).digest()
+
+
+def _blind_token(key: bytes, gram: str) -> str:
+    return hmac.new(key, gram.encode('utf-8'), hashlib.sha256).hexdigest()
+
+
+def _trigrams(text: str) -> set:
+    n = BLIND_INDEX_GRAM
+    return {text[i:i + n] for i in range(len(text) - n + 1)}
+
+
+def blind_index_tokens(value: str, field: str) -> set:
+    """Return the keyed HMAC tokens for every BLIND_INDEX_GRAM-gram of one
+    PHI field's value, used to maintain the substring search index."""
+    if not value:
+        return set()
+    key = _blind_index_key(field)
+    return {_blind_token(key, g) for g in _trigrams(value.strip().lower())}
+
+
+def blind_index_query_tokens(term: str, field: str) -> set:
+    """Return the tokens a stored value of field must contain to match a
+    search term; empty for terms shorter than BLIND_INDEX_GRAM."""
+    key = _blind_index_key(field)
+    return {_blind_token(key, g) for g in _trigrams((term or '').strip().lower())}
@@ -1,19 +1,214 @@
 """
 Export utilities for CSV and PDF generation.
 """
+import atexit
 import csv
 import io
 import json
 import logging
+import multiprocessing
+import os
+import re
+import threading
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 from datetime import datetime, timezone
+from functools import lru_cache
+from itertools import islice
 from reportlab.lib import colors
 from reportlab.lib.pagesizes import letter
 from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
 from reportlab.lib.units import inch
 from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle
+from app.models.reading import classify_bp
 
 logger = logging.getLogger(__name__)
 
+# Rows fetched, decrypted and written per chunk by the streaming exporters
+EXPORT_BATCH_SIZE = 500
+
+# Bulk patient PDFs: render processes and patients prefetched per batch
+PDF_WORKERS = int(os.getenv('PDF_WORKERS', min(4, os.cpu_count() or 1)))
+PDF_BATCH_SIZE = 50
+
+USER_FIELDNAMES = [
+    'id', 'union_name', 'gender', 'race', 'ethnicity', 'work_status', 'rank',
+    'height_inches', 'weight_lbs', 'chronic_conditions', 'has_high_blood_pressure',
+    'smoking_status', 'on_bp_medication', 'missed_doses',
+    'is_active', 'user_status', 'is_email_verified', 'is_flagged', 'created_at',
+    'exercise_days_per_week', 'exercise_minutes_per_session', 'financial_stress',
+    'stress_level', 'loneliness', 'sleep_quality',
+]
+USER_PHI_FIELDNAMES = ['name', 'email', 'dob', 'phone', 'address', 'medications']
+
+READING_FIELDNAMES = [
+    'id', 'user_id', 'user_name', 'systolic', 'diastolic', 'heart_rate',
+    'bp_category', 'reading_date', 'created_at'
+]
+
+CALL_REPORT_FIELDNAMES = [
+    'id', 'patient_id', 'patient_name', 'list_type', 'outcome',
+    'follow_up_needed', 'follow_up_date', 'materials_sent', 'materials_desc',
+    'referral_made', 'referral_to', 'admin_id', 'created_at'
+]
+
+
+def iter_batches(query, batch_size=EXPORT_BATCH_SIZE):
+    """Yield lists of up to batch_size rows from a query.
+
+    Rows are fetched with yield_per (a server-side cursor on PostgreSQL), so
+    only one batch of ORM objects is alive at a time."""
+    rows = iter(query.yield_per(batch_size))
+    while True:
+        batch = list(islice(rows, batch_size))
+        if not batch:
+            return
+        yield batch
+
+
+def _stream_csv(fieldnames, batches, build_rows, progress=None):
+    """Yield CSV text one batch at a time.
+
+    build_rows(batch) returns the row dicts for a batch. progress, if given,
+    is a dict whose 'rows' count is kept current as rows are written."""
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=fieldnames)
+
+    def drain():
+        chunk = buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+        return chunk
+
+    writer.writeheader()
+    yield drain()
+    for batch in batches:
+        rows = build_rows(batch)
+        writer.writerows(rows)
+        if progress is not None:
+            progress['rows'] = progress.get('rows', 0) + len(rows)
+        yield drain()
+
+
+def _user_row(user, phi=None):
+    row = {
+        'id': user.id,
+        'union_name': user.union.name if user.union else '',
+        'gender': user.gender or '',
+        'race': user.race or '',
+        'ethnicity': user.ethnicity or '',
+        'work_status': user.work_status or '',
+        'rank': user.rank or '',
+        'height_inches': user.height_inches or '',
+        'weight_lbs': user.weight_lbs or '',
+        'chronic_conditions': user.chronic_conditions or '',
+        'has_high_blood_pressure': user.has_high_blood_pressure if user.has_high_blood_pressure is not None else '',
+        'smoking_status': user.smoking_status or '',
+        'on_bp_medication': user.on_bp_medication if user.on_bp_medication is not None else '',
+        'missed_doses': user.missed_doses if user.missed_doses is not None else '',
+        'is_active': user.is_active,
+        'user_status': user.user_status,
+        'is_email_verified': user.is_email_verified,
+        'is_flagged': user.is_flagged,
+        'created_at': user.created_at.isoformat() if user.created_at else '',
+        'exercise_days_per_week': user.exercise_days_per_week if user.exercise_days_per_week is not None else '',
+        'exercise_minutes_per_session': user.exercise_minutes_per_session if user.exercise_minutes_per_session is not None else '',
+        'financial_stress': user.financial_stress or '',
+        'stress_level': user.stress_level or '',
+        'loneliness': user.loneliness or '',
+        'sleep_quality': user.sleep_quality if user.sleep_quality is not None else '',
+    }
+
+    if phi is not None:
+        # Fields that failed to decrypt come back as None and were logged
+        for field, value in phi.items():
+            row[field] = value or ''
+        if not row['name']:
+            row['name'] = f'User #{user.id}'
+
+    return row
+
+
+def iter_users_csv(batches, include_phi=True, progress=None):
+    """Stream a users CSV from batches of User objects.
+
+    PHI is decrypted column by column for each batch."""
+    from app.models.user import User
+
+    fieldnames = USER_FIELDNAMES
+    if include_phi:
+        fieldnames = USER_PHI_FIELDNAMES + fieldnames
+
+    def build_rows(users):
+        if not include_phi:
+            return [_user_row(u) for u in users]
+        phi = User.bulk_decrypt(users, fields=USER_PHI_FIELDNAMES)
+        return [_user_row(u, phi[u.id]) for u in users]
+
+    return _stream_csv(fieldnames, batches, build_rows, progress)
+
+
+def _reading_row(reading, user_names):
+    return {
+        'id': reading.id,
+        'user_id': reading.user_id,
+        'user_name': user_names.get(reading.user_id, f'User #{reading.user_id}'),
+        'systolic': reading.systolic,
+        'diastolic': reading.diastolic,
+        'heart_rate': reading.heart_rate or '',
+        'bp_category': reading.bp_category,
+        'reading_date': reading.reading_date.isoformat() if reading.reading_date else '',
+        'created_at': reading.created_at.isoformat() if reading.created_at else '',
+    }
+
+
+def iter_readings_csv(batches, resolve_names=None, progress=None):
+    """Stream a readings CSV from batches of BloodPressureReading objects.
+
+    resolve_names(user_ids) returns {user_id: name} for one batch's users."""
+    def build_rows(readings):
+        names = resolve_names({r.user_id for r in readings}) if resolve_names else {}
+        return [_reading_row(r, names) for r in readings]
+
+    return _stream_csv(READING_FIELDNAMES, batches, build_rows, progress)
+
+
+def _call_report_row(attempt, user_names):
+    return {
+        'id': attempt.id,
+        'patient_id': attempt.user_id,
+        'patient_name': user_names.get(attempt.user_id, f'User #{attempt.user_id}'),
+        'list_type': attempt.call_list_item.list_type if attempt.call_list_item else '',
+        'outcome': attempt.outcome or '',
+        'follow_up_needed': attempt.follow_up_needed if attempt.follow_up_needed is not None else '',
+        'follow_up_date': attempt.follow_up_date.isoformat() if attempt.follow_up_date else '',
+        'materials_sent': attempt.materials_sent if attempt.materials_sent is not None else '',
+        'materials_desc': attempt.materials_desc or '',
+        'referral_made': attempt.referral_made if attempt.referral_made is not None else '',
+        'referral_to': attempt.referral_to or '',
+        'admin_id': attempt.admin_id or '',
+        'created_at': attempt.created_at.isoformat() if attempt.created_at else '',
+    }
+
+
+def iter_call_reports_csv(batches, resolve_names=None, progress=None):
+    """Stream a call reports CSV from batches of CallAttempt objects.
+
+    resolve_names(user_ids) returns {user_id: name} for one batch's patients."""
+    def build_rows(attempts):
+        names = resolve_names({a.user_id for a in attempts}) if resolve_names else {}
+        return [_call_report_row(a, names) for a in attempts]
+
+    return _stream_csv(CALL_REPORT_FIELDNAMES, batches, build_rows, progress)
+
+
+def _to_stringio(chunks):
+    output = io.StringIO()
+    output.writelines(chunks)
+    output.seek(0)
+    return output
+
 
 def generate_users_csv(users, include_phi=True):
     """Generate CSV export of users.
@@ -25,73 +220,7 @@ def generate_users_csv(users, include_phi=True):
     Returns:
         StringIO object containing CSV data
     """
-    output = io.StringIO()
-
-    fieldnames = [
-        'id', 'union_name', 'gender', 'race', 'ethnicity', 'work_status', 'rank',
-        'height_inches', 'weight_lbs', 'chronic_conditions', 'has_high_blood_pressure',
-        'smoking_status', 'on_bp_medication', 'missed_doses',
-        'is_active', 'user_status', 'is_email_verified', 'is_flagged', 'created_at',
-        'exercise_days_per_week', 'exercise_minutes_per_session', 'financial_stress',
-        'stress_level', 'loneliness', 'sleep_quality',
-    ]
-
-    if include_phi:
-        fieldnames = ['name', 'email', 'dob', 'phone', 'address', 'medications'] + fieldnames
-
-    writer = csv.DictWriter(output, fieldnames=fieldnames)
-    writer.writeheader()
-
-    for user in users:
-        row = {
-            'id': user.id,
-            'union_name': user.union.name if user.union else '',
-            'gender': user.gender or '',
-            'race': user.race or '',
-            'ethnicity': user.ethnicity or '',
-            'work_status': user.work_status or '',
-            'rank': user.rank or '',
-            'height_inches': user.height_inches or '',
-            'weight_lbs': user.weight_lbs or '',
-            'chronic_conditions': user.chronic_conditions or '',
-            'has_high_blood_pressure': user.has_high_blood_pressure if user.has_high_blood_pressure is not None else '',
-            'smoking_status': user.smoking_status or '',
-            'on_bp_medication': user.on_bp_medication if user.on_bp_medication is not None else '',
-            'missed_doses': user.missed_doses if user.missed_doses is not None else '',
-            'is_active': user.is_active,
-            'user_status': user.user_status,
-            'is_email_verified': user.is_email_verified,
-            'is_flagged': user.is_flagged,
-            'created_at': user.created_at.isoformat() if user.created_at else '',
-            'exercise_days_per_week': user.exercise_days_per_week if user.exercise_days_per_week is not None else '',
-            'exercise_minutes_per_session': user.exercise_minutes_per_session if user.exercise_minutes_per_session is not None else '',
-            'financial_stress': user.financial_stress or '',
-            'stress_level': user.stress_level or '',
-            'loneliness': user.loneliness or '',
-            'sleep_quality': user.sleep_quality if user.sleep_quality is not None else '',
-        }
-
-        if include_phi:
-            try:
-                row['name'] = user.name or ''
-                row['email'] = user.email or ''
-                row['dob'] = user.dob or ''
-                row['phone'] = user.phone or ''
-                row['address'] = user.address or ''
-                row['medications'] = user.medications or ''
-            except Exception as e:
-                logger.error(f"Error decrypting PHI for user {user.id}: {e}")
-                row['name'] = f'User #{user.id}'
-                row['email'] = ''
-                row['dob'] = ''
-                row['phone'] = ''
-                row['address'] = ''
-                row['medications'] = ''
-
-        writer.writerow(row)
-
-    output.seek(0)
-    return output
+    return _to_stringio(iter_users_csv([list(users)], include_phi=include_phi))
 
 
 def generate_readings_csv(readings, user_names=None):
@@ -104,34 +233,8 @@ def generate_readings_csv(readings, user_names=None):
     Returns:
         StringIO object containing CSV data
     """
-    output = io.StringIO()
-
-    fieldnames = [
-        'id', 'user_id', 'user_name', 'systolic', 'diastolic', 'heart_rate',
-        'bp_category', 'reading_date', 'created_at'
-    ]
-
-    writer = csv.DictWriter(output, fieldnames=fieldnames)
-    writer.writeheader()
-
     user_names = user_names or {}
-
-    for reading in readings:
-        row = {
-            'id': reading.id,
-            'user_id': reading.user_id,
-            'user_name': user_names.get(reading.user_id, f'User #{reading.user_id}'),
-            'systolic': reading.systolic,
-            'diastolic': reading.diastolic,
-            'heart_rate': reading.heart_rate or '',
-            'bp_category': _classify_bp(reading.systolic, reading.diastolic),
-            'reading_date': reading.reading_date.isoformat() if reading.reading_date else '',
-            'created_at': reading.created_at.isoformat() if reading.created_at else '',
-        }
-        writer.writerow(row)
-
-    output.seek(0)
-    return output
+    return _to_stringio(iter_readings_csv([list(readings)], lambda ids: user_names))
 
 
 def generate_call_reports_csv(attempts, user_names=None):
@@ -144,79 +247,121 @@ def generate_call_reports_csv(attempts, user_names=None):
     Returns:
         StringIO object containing CSV data
     """
-    output = io.StringIO()
-
-    fieldnames = [
-        'id', 'patient_id', 'patient_name', 'list_type', 'outcome',
-        'follow_up_needed', 'follow_up_date', 'materials_sent', 'materials_desc',
-        'referral_made', 'referral_to', 'admin_id', 'created_at'
-    ]
+    user_names = user_names or {}
+    return _to_stringio(iter_call_reports_csv([list(attempts)], lambda ids: user_names))
 
-    writer = csv.DictWriter(output, fieldnames=fieldnames)
-    writer.writeheader()
 
-    user_names = user_names or {}
+def _label_table_style():
+    return TableStyle([
+        ('FONTNAME', (0, 0), (0, -1), 'Helvetica-Bold'),
+        ('ALIGN', (0, 0), (0, -1), 'RIGHT'),
+        ('ALIGN', (1, 0), (1, -1), 'LEFT'),
+        ('BOTTOMPADDING', (0, 0), (-1, -1), 5),
+    ])
 
-    for attempt in attempts:
-        row = {
-            'id': attempt.id,
-            'patient_id': attempt.user_id,
-            'patient_name': user_names.get(attempt.user_id, f'User #{attempt.user_id}'),
-            'list_type': attempt.call_list_item.list_type if attempt.call_list_item else '',
-            'outcome': attempt.outcome or '',
-            'follow_up_needed': attempt.follow_up_needed if attempt.follow_up_needed is not None else '',
-            'follow_up_date': attempt.follow_up_date.isoformat() if attempt.follow_up_date else '',
-            'materials_sent': attempt.materials_sent if attempt.materials_sent is not None else '',
-            'materials_desc': attempt.materials_desc or '',
-            'referral_made': attempt.referral_made if attempt.referral_made is not None else '',
-            'referral_to': attempt.referral_to or '',
-            'admin_id': attempt.admin_id or '',
-            'created_at': attempt.created_at.isoformat() if attempt.created_at else '',
-        }
-        writer.writerow(row)
 
-    output.seek(0)
-    return output
+@lru_cache(maxsize=1)
+def _pdf_styles():
+    """Paragraph and table styles shared by every report a process renders."""
+    styles = getSampleStyleSheet()
+    return {
+        'title': ParagraphStyle(
+            'CustomTitle',
+            parent=styles['Heading1'],
+            fontSize=18,
+            spaceAfter=20,
+        ),
+        'heading': ParagraphStyle(
+            'CustomHeading',
+            parent=styles['Heading2'],
+            fontSize=14,
+            spaceBefore=15,
+            spaceAfter=10,
+        ),
+        'normal': styles['Normal'],
+        'label_table': _label_table_style(),
+        'readings_table': TableStyle([
+            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+            ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
+            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+            ('GRID', (0, 0), (-1, -1), 0.5, colors.black),
+            ('BOTTOMPADDING', (0, 0), (-1, -1), 5),
+            ('TOPPADDING', (0, 0), (-1, -1), 5),
+        ]),
+    }
 
 
-def generate_patient_pdf(user, readings, avg_7=None, avg_30=None):
-    """Generate a PDF report for an individual patient.
+def patient_report_data(user, readings, avg_7=None, avg_30=None, phi=None, reading_count=None):
+    """Collect everything a patient PDF shows into plain, picklable values.
 
     Args:
         user: User model object
-        readings: List of BloodPressureReading objects for this user
+        readings: BloodPressureReading objects for this user, newest first
+            (only the first 20 are listed)
         avg_7: Optional dict with 7-day average {'systolic': x, 'diastolic': y}
         avg_30: Optional dict with 30-day average
-
-    Returns:
-        BytesIO object containing PDF data
+        phi: Optional pre-decrypted PHI from User.bulk_decrypt
+        reading_count: Total readings (default len(readings))
     """
+    if phi is None:
+        phi = {}
+        for field in ('name', 'email', 'phone', 'dob', 'medications'):
+            try:
+                phi[field] = getattr(user, field)
+            except Exception:
+                logger.error('Decryption error for user_id=%s field=%s', user.id, field, exc_info=True)
+                phi[field] = None
+
+    try:
+        chronic = json.loads(user.chronic_conditions) if user.chronic_conditions else []
+        chronic_text = ', '.join(chronic) if chronic else 'None reported'
+    except Exception:
+        chronic_text = 'N/A'
+
+    return {
+        'id': user.id,
+        'name': phi.get('name'),
+        'email': phi.get('email'),
+        'phone': phi.get('phone'),
+        'dob': phi.get('dob'),
+        'medications': phi.get('medications'),
+        'gender': user.gender,
+        'union_name': user.union.name if user.union else None,
+        'work_status': user.work_status,
+        'rank': user.rank,
+        'height_inches': user.height_inches,
+        'weight_lbs': user.weight_lbs,
+        'chronic_conditions': chronic_text,
+        'has_high_blood_pressure': user.has_high_blood_pressure,
+        'on_bp_medication': user.on_bp_medication,
+        'missed_doses': user.missed_doses,
+        'smoking_status': user.smoking_status,
+        'reading_count': len(readings) if reading_count is None else reading_count,
+        'avg_7': avg_7,
+        'avg_30': avg_30,
+        'readings': [
+            (r.reading_date, r.systolic, r.diastolic, r.heart_rate) for r in readings[:20]
+        ],
+    }
+
+
+def render_patient_pdf(data):
+    """Render a report from patient_report_data() output. Returns PDF bytes.
+
+    Module-level and free of ORM objects so it can run in a process pool."""
     output = io.BytesIO()
     doc = SimpleDocTemplate(output, pagesize=letter, topMargin=0.5*inch, bottomMargin=0.5*inch)
 
-    styles = getSampleStyleSheet()
-    title_style = ParagraphStyle(
-        'CustomTitle',
-        parent=styles['Heading1'],
-        fontSize=18,
-        spaceAfter=20,
-    )
-    heading_style = ParagraphStyle(
-        'CustomHeading',
-        parent=styles['Heading2'],
-        fontSize=14,
-        spaceBefore=15,
-        spaceAfter=10,
-    )
-    normal_style = styles['Normal']
+    styles = _pdf_styles()
+    title_style = styles['title']
+    heading_style = styles['heading']
+    normal_style = styles['normal']
 
     elements = []
 
     # Title
-    try:
-        patient_name = user.name or f'Patient #{user.id}'
-    except Exception:
-        patient_name = f'Patient #{user.id}'
+    patient_name = data['name'] or f"Patient #{data['id']}"
 
     elements.append(Paragraph(f"Patient Report: {patient_name}", title_style))
     elements.append(Paragraph(f"Generated: {datetime.now(timezone.utc).strftime('%B %d, %Y at %H:%M UTC')}", normal_style))
@@ -226,76 +371,56 @@ def generate_patient_pdf(user, readings, avg_7=None, avg_30=None):
     elements.append(Paragraph("Patient Information", heading_style))
 
     demo_data = []
-    try:
-        demo_data.append(['Name:', user.name or 'N/A'])
-        demo_data.append(['Email:', user.email or 'N/A'])
-        demo_data.append(['Phone:', user.phone or 'N/A'])
-        demo_data.append(['Date of Birth:', user.dob or 'N/A'])
-    except Exception:
-        demo_data.append(['Name:', f'Patient #{user.id}'])
-        demo_data.append(['Email:', 'N/A'])
-        demo_data.append(['Phone:', 'N/A'])
-        demo_data.append(['Date of Birth:', 'N/A'])
-
-    demo_data.append(['Gender:', user.gender or 'N/A'])
-    demo_data.append(['Union:', user.union.name if user.union else 'N/A'])
-    demo_data.append(['Work Status:', user.work_status or 'N/A'])
-    demo_data.append(['Rank:', user.rank or 'N/A'])
-
-    if user.height_inches:
-        feet = user.height_inches // 12
-        inches = user.height_inches % 12
+    demo_data.append(['Name:', data['name'] or 'N/A'])
+    demo_data.append(['Email:', data['email'] or 'N/A'])
+    demo_data.append(['Phone:', data['phone'] or 'N/A'])
+    demo_data.append(['Date of Birth:', data['dob'] or 'N/A'])
+    demo_data.append(['Gender:', data['gender'] or 'N/A'])
+    demo_data.append(['Union:', data['union_name'] or 'N/A'])
+    demo_data.append(['Work Status:', data['work_status'] or 'N/A'])
+    demo_data.append(['Rank:', data['rank'] or 'N/A'])
+
+    if data['height_inches']:
+        feet = data['height_inches'] // 12
+        inches = data['height_inches'] % 12
         demo_data.append(['Height:', f"{feet}' {inches}\""])
     else:
         demo_data.append(['Height:', 'N/A'])
 
-    demo_data.append(['Weight:', f"{user.weight_lbs} lbs" if user.weight_lbs else 'N/A'])
+    demo_data.append(['Weight:', f"{data['weight_lbs']} lbs" if data['weight_lbs'] else 'N/A'])
 
     demo_table = Table(demo_data, colWidths=[2*inch, 4*inch])
-    demo_table.setStyle(TableStyle([
-        ('FONTNAME', (0, 0), (0, -1), 'Helvetica-Bold'),
-        ('ALIGN', (0, 0), (0, -1), 'RIGHT'),
-        ('ALIGN', (1, 0), (1, -1), 'LEFT'),
-        ('BOTTOMPADDING', (0, 0), (-1, -1), 5),
-    ]))
+    demo_table.setStyle(styles['label_table'])
     elements.append(demo_table)
     elements.append(Spacer(1, 15))
 
     # Health Information
     elements.append(Paragraph("Health Information", heading_style))
 
+    hbp = data['has_high_blood_pressure']
+    on_med = data['on_bp_medication']
     health_data = []
-    try:
-        chronic = json.loads(user.chronic_conditions) if user.chronic_conditions else []
-        health_data.append(['Chronic Conditions:', ', '.join(chronic) if chronic else 'None reported'])
-    except Exception:
-        health_data.append(['Chronic Conditions:', 'N/A'])
-
-    health_data.append(['High Blood Pressure:', 'Yes' if user.has_high_blood_pressure else 'No' if user.has_high_blood_pressure is False else 'N/A'])
-    health_data.append(['On BP Medication:', 'Yes' if user.on_bp_medication else 'No' if user.on_bp_medication is False else 'N/A'])
-    health_data.append(['Missed Doses:', str(user.missed_doses) if user.missed_doses is not None else 'N/A'])
-    health_data.append(['Smoking Status:', user.smoking_status or 'N/A'])
-
-    try:
-        health_data.append(['Medications:', user.medications or 'None reported'])
-    except Exception:
-        health_data.append(['Medications:', 'N/A'])
+    health_data.append(['Chronic Conditions:', data['chronic_conditions']])
+    health_data.append(['High Blood Pressure:', 'Yes' if hbp else 'No' if hbp is False else 'N/A'])
+    health_data.append(['On BP Medication:', 'Yes' if on_med else 'No' if on_med is False else 'N/A'])
+    health_data.append(['Missed Doses:', str(data['missed_doses']) if data['missed_doses'] is not None else 'N/A'])
+    health_data.append(['Smoking Status:', data['smoking_status'] or 'N/A'])
+    health_data.append(['Medications:', data['medications'] or 'None reported'])
 
     health_table = Table(health_data, colWidths=[2*inch, 4*inch])
-    health_table.setStyle(TableStyle([
-        ('FONTNAME', (0, 0), (0, -1), 'Helvetica-Bold'),
-        ('ALIGN', (0, 0), (0, -1), 'RIGHT'),
-        ('ALIGN', (1, 0), (1, -1), 'LEFT'),
-        ('BOTTOMPADDING', (0, 0), (-1, -1), 5),
-    ]))
+    health_table.setStyle(styles['label_table'])
     elements.append(health_table)
     elements.append(Spacer(1, 15))
 
     # BP Summary
     elements.append(Paragraph("Blood Pressure Summary", heading_style))
 
+    avg_7 = data['avg_7']
+    avg_30 = data['avg_30']
+    readings = data['readings']
+
     bp_summary = []
-    bp_summary.append(['Total Readings:', str(len(readings))])
+    bp_summary.append(['Total Readings:', str(data['reading_count'])])
 
     if avg_7:
         bp_summary.append(['7-Day Average:', f"{avg_7['systolic']}/{avg_7['diastolic']} mmHg"])
@@ -308,17 +433,12 @@ def generate_patient_pdf(user, readings, avg_7=None, avg_30=None):
         bp_summary.append(['30-Day Average:', 'Insufficient data'])
 
     if readings:
-        latest = readings[0]
-        bp_summary.append(['Latest Reading:', f"{latest.systolic}/{latest.diastolic} mmHg ({_classify_bp(latest.systolic, latest.diastolic)})"])
-        bp_summary.append(['Latest Date:', latest.reading_date.strftime('%B %d, %Y') if latest.reading_date else 'N/A'])
+        latest_date, latest_sys, latest_dia, _ = readings[0]
+        bp_summary.append(['Latest Reading:', f"{latest_sys}/{latest_dia} mmHg ({classify_bp(latest_sys, latest_dia)})"])
+        bp_summary.append(['Latest Date:', latest_date.strftime('%B %d, %Y') if latest_date else 'N/A'])
 
     bp_table = Table(bp_summary, colWidths=[2*inch, 4*inch])
-    bp_table.setStyle(TableStyle([
-        ('FONTNAME', (0, 0), (0, -1), 'Helvetica-Bold'),
-        ('ALIGN', (0, 0), (0, -1), 'RIGHT'),
-        ('ALIGN', (1, 0), (1, -1), 'LEFT'),
-        ('BOTTOMPADDING', (0, 0), (-1, -1), 5),
-    ]))
+    bp_table.setStyle(styles['label_table'])
     elements.append(bp_table)
     elements.append(Spacer(1, 15))
 
@@ -327,40 +447,178 @@ def generate_patient_pdf(user, readings, avg_7=None, avg_30=None):
         elements.append(Paragraph("Recent Readings (Last 20)", heading_style))
 
         reading_data = [['Date', 'Systolic', 'Diastolic', 'Heart Rate', 'Category']]
-        for r in readings[:20]:
+        for reading_date, systolic, diastolic, heart_rate in readings:
             reading_data.append([
-                r.reading_date.strftime('%m/%d/%Y %H:%M') if r.reading_date else 'N/A',
-                str(r.systolic),
-                str(r.diastolic),
-                str(r.heart_rate) if r.heart_rate else 'N/A',
-                _classify_bp(r.systolic, r.diastolic),
+                reading_date.strftime('%m/%d/%Y %H:%M') if reading_date else 'N/A',
+                str(systolic),
+                str(diastolic),
+                str(heart_rate) if heart_rate else 'N/A',
+                classify_bp(systolic, diastolic),
             ])
 
         reading_table = Table(reading_data, colWidths=[1.5*inch, 1*inch, 1*inch, 1*inch, 1*inch])
-        reading_table.setStyle(TableStyle([
-            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-            ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
-            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-            ('GRID', (0, 0), (-1, -1), 0.5, colors.black),
-            ('BOTTOMPADDING', (0, 0), (-1, -1), 5),
-            ('TOPPADDING', (0, 0), (-1, -1), 5),
-        ]))
+        reading_table.setStyle(styles['readings_table'])
         elements.append(reading_table)
 
     doc.build(elements)
-    output.seek(0)
-    return output
+    return output.getvalue()
+
 
+def generate_patient_pdf(user, readings, avg_7=None, avg_30=None):
+    """Generate a PDF report for an individual patient.
 
-def _classify_bp(systolic, diastolic):
-    """Classify blood pressure reading into a category."""
-    if systolic > 180 or diastolic > 120:
-        return 'Crisis'
-    if systolic >= 140 or diastolic >= 90:
-        return 'Stage 2'
-    if systolic >= 130 or diastolic >= 80:
-        return 'Stage 1'
-    if systolic >= 120 and diastolic < 80:
-        return 'Elevated'
-    return 'Normal'
+    Args:
+        user: User model object
+        readings: List of BloodPressureReading objects for this user
+        avg_7: Optional dict with 7-day average {'systolic': x, 'diastolic': y}
+        avg_30: Optional dict with 30-day average
+
+    Returns:
+        BytesIO object containing PDF data
+    """
+    return io.BytesIO(render_patient_pdf(patient_report_data(user, readings, avg_7, avg_30)))
+
+
+def patient_pdf_filename(name, user_id):
+    """Download name for a patient's report: name sanitized to [A-Za-z0-9_-]."""
+    raw_name = name.replace(' ', '_') if name else f'patient_{user_id}'
+    # Sanitize: allow only alphanumeric, underscore, hyphen
+    patient_name = re.sub(r'[^a-zA-Z0-9_\-]', '', raw_name) or f'patient_{user_id}'
+    return f'{patient_name}_report_{datetime.now(timezone.utc).strftime("%Y%m%d")}.pdf'
+
+
+def prefetch_patient_reports(user_ids):
+    """Build patient_report_data() for many users with a fixed number of queries.
+
+    PHI is batch-decrypted, counts and averages come from the reading rollup,
+    and each patient's last 20 readings are fetched in one windowed query."""
+    from sqlalchemy import func
+    from sqlalchemy.orm import joinedload
+    from app import db
+    from app.models.user import User
+    from app.models.reading import BloodPressureReading as R
+    from app.models.user_reading_stats import UserReadingStats
+
+    users = (User.query.options(joinedload(User.union))
+             .filter(User.id.in_(user_ids))
+             .order_by(User.id)
+             .all())
+    ids = [u.id for u in users]
+    phi = User.bulk_decrypt(users, fields=('name', 'email', 'phone', 'dob', 'medications'))
+    stats = UserReadingStats.for_users(ids)
+
+    rn = func.row_number().over(partition_by=R.user_id, order_by=R.reading_date.desc()).label('rn')
+    ranked = (db.session.query(R.user_id, R.reading_date, R.systolic, R.diastolic, R.heart_rate, rn)
+              .filter(R.user_id.in_(ids))
+              .subquery())
+    recent = {}
+    for row in (db.session.query(ranked)
+                .filter(ranked.c.rn <= 20)
+                .order_by(ranked.c.user_id, ranked.c.rn)):
+        recent.setdefault(row.user_id, []).append(row)
+
+    reports = []
+    for user in users:
+        user_stats = stats.get(user.id)
+        reports.append(patient_report_data(
+            user, recent.get(user.id, []),
+            avg_7=user_stats.avg_7_day if user_stats else None,
+            avg_30=user_stats.avg_30_day if user_stats else None,
+            phi=phi[user.id],
+            reading_count=user_stats.reading_count if user_stats else 0,
+        ))
+    return reports
+
+
+class _ZipStream:
+    """Write-only, unseekable sink so zipfile emits a streamable archive."""
+
+    def __init__(self):
+        self._chunks = []
+        self._offset = 0
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        self._offset += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._offset
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b''.join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+# workers -> (pid, ProcessPoolExecutor), shared by every export in a process
+_pdf_pools = {}
+_pdf_pools_lock = threading.Lock()
+
+
+def _pdf_pool(workers):
+    """The process's render pool for workers processes, created on first use.
+
+    Spawning interpreters and importing ReportLab takes longer than rendering
+    a small export, so the pool outlives requests. spawn, not fork: the
+    parent may be a threaded gunicorn worker. The initializer builds the
+    shared styles once per process."""
+    entry = _pdf_pools.get(workers)
+    if entry is not None and entry[0] == os.getpid():
+        return entry[1]
+    with _pdf_pools_lock:
+        entry = _pdf_pools.get(workers)
+        # A forked child inherits the entry but not the pool's processes
+        if entry is None or entry[0] != os.getpid():
+            pool = ProcessPoolExecutor(max_workers=workers,
+                                       mp_context=multiprocessing.get_context('spawn'),
+                                       initializer=_pdf_styles)
+            entry = _pdf_pools[workers] = (os.getpid(), pool)
+        return entry[1]
+
+
+def _discard_pdf_pool(workers, pool):
+    with _pdf_pools_lock:
+        if _pdf_pools.get(workers, (None, None))[1] is pool:
+            del _pdf_pools[workers]
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+@atexit.register
+def _shutdown_pdf_pools():
+    for pid, pool in list(_pdf_pools.values()):
+        if pid == os.getpid():
+            pool.shutdown(wait=False, cancel_futures=True)
+
+
+def iter_patient_pdfs_zip(user_ids, workers=None, progress=None):
+    """Stream a ZIP of patient PDF reports, one entry per user id.
+
+    Users are prefetched PDF_BATCH_SIZE at a time and rendered across a
+    process pool (ReportLab is CPU-bound and holds the GIL). Yields bytes.
+    progress, if given, is a callable receiving the number of reports added."""
+    workers = PDF_WORKERS if workers is None else workers
+    user_ids = list(user_ids)
+    pool = _pdf_pool(workers) if workers > 1 and len(user_ids) > 1 else None
+    stream = _ZipStream()
+    try:
+        with zipfile.ZipFile(stream, 'w', compression=zipfile.ZIP_STORED) as archive:
+            for start in range(0, len(user_ids), PDF_BATCH_SIZE):
+                reports = prefetch_patient_reports(user_ids[start:start + PDF_BATCH_SIZE])
+                # Closing map()'s iterator (e.g. on client disconnect) cancels
+                # the batch's pending renders
+                pdfs = pool.map(render_patient_pdf, reports) if pool else map(render_patient_pdf, reports)
+                for report, pdf in zip(reports, pdfs):
+                    name = patient_pdf_filename(report['name'], report['id'])
+                    archive.writestr(f"{report['id']}_{name}", pdf)
+                    yield stream.drain()
+                if progress is not None:
+                    progress(len(reports))
+        yield stream.drain()
+    except BrokenProcessPool:
+        # A render process died; the next export gets a fresh pool
+        _discard_pdf_pool(workers, pool)
+        raise
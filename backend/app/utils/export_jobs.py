@@ -0,0 +1,295 @@
+"""
+Background export jobs.
+
+Exports that can outlive a gunicorn worker timeout are queued as ExportJob
+rows and run on a small per-process thread pool. Each job writes its artifact
+under EXPORT_JOB_DIR (shared by the workers on a host), so any worker can
+answer progress polls and serve the download. Artifacts are PHI: the
+directory is owner-only (0700), each file is created 0600, and the contents
+are encrypted with the PHI key (see PHIFileWriter).
+
+A running job stamps heartbeat_at every EXPORT_JOB_HEARTBEAT_SECONDS. The
+sweep, run at most once a minute per process from the export job routes and
+by `flask cleanup-export-jobs`, fails jobs whose worker stopped heartbeating,
+hands queued jobs nobody started to the local pool, and deletes jobs and
+their PHI artifacts after EXPORT_JOB_RETENTION_HOURS.
+"""
+import glob
+import logging
+import os
+import secrets
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from flask import current_app
+from sqlalchemy.exc import OperationalError
+from app import db
+from app.utils.audit_logger import audit_log
+from app.utils.encryption import PHIFileWriter
+
+logger = logging.getLogger(__name__)
+
+EXPORT_JOB_DIR = os.getenv('EXPORT_JOB_DIR', 'exports')
+EXPORT_JOB_WORKERS = int(os.getenv('EXPORT_JOB_WORKERS', 2))
+EXPORT_JOB_RETENTION_HOURS = int(os.getenv('EXPORT_JOB_RETENTION_HOURS', 24))
+EXPORT_JOB_HEARTBEAT_SECONDS = int(os.getenv('EXPORT_JOB_HEARTBEAT_SECONDS', 30))
+# A running job whose heartbeat is older than this lost its worker
+STALE_HEARTBEATS = 4
+# A queued job nobody has started after this long is re-submitted locally
+REQUEUE_AFTER_SECONDS = 300
+SWEEP_INTERVAL_SECONDS = 60
+
+# kind -> fn(params, out, progress) returning (download_name, mimetype)
+_exporters = {}
+
+_pool = None
+_pool_lock = threading.Lock()
+# Job ids waiting in or running on this process's pool
+_local_jobs = set()
+_next_sweep = 0
+
+
+def exporter(kind):
+    """Register the function that produces a job kind's artifact.
+
+    The function receives the job's params dict, a binary file to write to
+    and a JobProgress, and returns (download_name, mimetype)."""
+    def decorator(fn):
+        _exporters[kind] = fn
+        return fn
+    return decorator
+
+
+def export_kinds():
+    return sorted(_exporters)
+
+
+def _get_pool():
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ThreadPoolExecutor(max_workers=EXPORT_JOB_WORKERS,
+                                           thread_name_prefix='export-job')
+    return _pool
+
+
+def artifact_path(job):
+    return os.path.join(EXPORT_JOB_DIR, job.artifact_name) if job.artifact_name else None
+
+
+def _update_job(job_id, **values):
+    """Write job state on its own connection.
+
+    The exporter's session may be mid-way through a server-side cursor, which
+    a commit on that session would invalidate."""
+    from app.models.export_job import ExportJob
+    with db.engine.begin() as conn:
+        conn.execute(
+            ExportJob.__table__.update().where(ExportJob.__table__.c.id == job_id).values(**values)
+        )
+
+
+class JobProgress:
+    """Progress reporter handed to exporters; updates are best-effort."""
+
+    def __init__(self, job_id):
+        self.job_id = job_id
+        self.done = 0
+
+    def total(self, rows_total):
+        self._write(rows_total=rows_total)
+
+    def advance(self, rows):
+        self.done += rows
+        self._write(rows_done=self.done)
+
+    def track(self, batches):
+        """Pass batches through, counting their rows as they are consumed."""
+        for batch in batches:
+            yield batch
+            self.advance(len(batch))
+
+    def _write(self, **values):
+        try:
+            _update_job(self.job_id, **values)
+        except OperationalError:
+            # SQLite in development can't take the write while the export
+            # cursor is open; the final status update still lands.
+            logger.debug('Skipped progress update for export job %s', self.job_id, exc_info=True)
+
+
+def submit_export(kind, params, user_id):
+    """Queue an export and return its ExportJob (already committed)."""
+    import json
+    from app.models.export_job import ExportJob
+    if kind not in _exporters:
+        raise ValueError(f'Unknown export kind: {kind}')
+    job = ExportJob(kind=kind, params=json.dumps(params or {}), status='queued', requested_by=user_id)
+    db.session.add(job)
+    db.session.commit()
+    _enqueue_local(current_app._get_current_object(), job.id)
+    return job
+
+
+def _enqueue_local(app, job_id):
+    _local_jobs.add(job_id)
+    _get_pool().submit(_run_job, app, job_id)
+
+
+def _claim(job_id):
+    """Move a job from queued to running; False if another worker has it."""
+    from app.models.export_job import ExportJob
+    table = ExportJob.__table__
+    now = datetime.utcnow()
+    with db.engine.begin() as conn:
+        result = conn.execute(
+            table.update()
+            .where(table.c.id == job_id, table.c.status == 'queued')
+            .values(status='running', started_at=now, heartbeat_at=now)
+        )
+    return result.rowcount == 1
+
+
+def _heartbeat(app, job_id, stop):
+    with app.app_context():
+        while not stop.wait(EXPORT_JOB_HEARTBEAT_SECONDS):
+            try:
+                _update_job(job_id, heartbeat_at=datetime.utcnow())
+            except OperationalError:
+                logger.debug('Skipped heartbeat for export job %s', job_id, exc_info=True)
+
+
+def _make_export_dir():
+    os.makedirs(EXPORT_JOB_DIR, mode=0o700, exist_ok=True)
+    # makedirs' mode is masked by the umask and skipped for an existing dir
+    os.chmod(EXPORT_JOB_DIR, 0o700)
+
+
+def _run_job(app, job_id):
+    from app.models.export_job import ExportJob
+    with app.app_context():
+        try:
+            if not _claim(job_id):
+                return
+            job = db.session.get(ExportJob, job_id)
+            kind, params, user_id = job.kind, job.params_dict, job.requested_by
+        finally:
+            _local_jobs.discard(job_id)
+        artifact_name = f'{job_id}_{secrets.token_hex(8)}'
+        final_path = os.path.join(EXPORT_JOB_DIR, artifact_name)
+        tmp_path = final_path + '.part'
+        progress = JobProgress(job_id)
+        stop = threading.Event()
+        threading.Thread(target=_heartbeat, args=(app, job_id, stop),
+                         name=f'export-job-{job_id}-heartbeat', daemon=True).start()
+        try:
+            _make_export_dir()
+            fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+            with os.fdopen(fd, 'wb') as raw:
+                out = PHIFileWriter(raw)
+                download_name, mimetype = _exporters[kind](params, out, progress)
+                out.close()
+            os.replace(tmp_path, final_path)
+            db.session.rollback()  # end the exporter's read transaction
+            _update_job(job_id, status='succeeded', rows_done=progress.done,
+                        artifact_name=artifact_name, download_name=download_name,
+                        mimetype=mimetype, size_bytes=out.size,
+                        finished_at=datetime.utcnow())
+            audit_log('EXPORT', kind, details={'count': progress.done, 'job_id': job_id,
+                                               'params': params}, user_id=user_id)
+        except Exception as e:
+            logger.exception('Export job %s (%s) failed', job_id, kind)
+            db.session.rollback()
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            _update_job(job_id, status='failed', error=type(e).__name__,
+                        rows_done=progress.done, finished_at=datetime.utcnow())
+        finally:
+            stop.set()
+            db.session.remove()
+
+
+def reap_stale_jobs(now=None, requeue=True):
+    """Fail running jobs whose worker stopped heartbeating and, with
+    requeue, re-submit queued jobs that no worker has started to this
+    process's pool.
+
+    Returns:
+        (failed, requeued) counts
+    """
+    from app.models.export_job import ExportJob
+    table = ExportJob.__table__
+    now = now or datetime.utcnow()
+    stale = now - timedelta(seconds=EXPORT_JOB_HEARTBEAT_SECONDS * STALE_HEARTBEATS)
+    failed = 0
+    lost_ids = [job_id for (job_id,) in db.session.query(ExportJob.id).filter(
+        ExportJob.status == 'running', ExportJob.heartbeat_at < stale)]
+    for job_id in lost_ids:
+        with db.engine.begin() as conn:
+            result = conn.execute(
+                table.update()
+                .where(table.c.id == job_id, table.c.status == 'running', table.c.heartbeat_at < stale)
+                .values(status='failed', error='WorkerLost', finished_at=now)
+            )
+        if result.rowcount:
+            failed += 1
+            logger.warning('Export job %s lost its worker; marked failed', job_id)
+            for path in glob.glob(os.path.join(EXPORT_JOB_DIR, f'{job_id}_*.part')):
+                os.remove(path)
+
+    # The atomic claim in _run_job makes a duplicate submission harmless
+    unstarted = now - timedelta(seconds=REQUEUE_AFTER_SECONDS)
+    queued_ids = [job_id for (job_id,) in db.session.query(ExportJob.id).filter(
+        ExportJob.status == 'queued', ExportJob.created_at < unstarted)] if requeue else []
+    app = current_app._get_current_object()
+    requeued = 0
+    for job_id in queued_ids:
+        if job_id not in _local_jobs:
+            _enqueue_local(app, job_id)
+            requeued += 1
+    return failed, requeued
+
+
+def sweep_export_jobs():
+    """Reap stale jobs and expire old artifacts, at most once per
+    SWEEP_INTERVAL_SECONDS per process."""
+    global _next_sweep
+    now = time.monotonic()
+    if now < _next_sweep:
+        return
+    _next_sweep = now + SWEEP_INTERVAL_SECONDS
+    try:
+        reap_stale_jobs()
+        cleanup_export_jobs()
+    except Exception:
+        logger.exception('Export job sweep failed')
+        db.session.rollback()
+
+
+def is_expired(job, now=None):
+    """Whether a job is past EXPORT_JOB_RETENTION_HOURS (its artifact is due
+    for deletion even if the sweep hasn't run yet)."""
+    now = now or datetime.utcnow()
+    return job.created_at is not None and job.created_at < now - timedelta(hours=EXPORT_JOB_RETENTION_HOURS)
+
+
+def cleanup_export_jobs(retention_hours=None):
+    """Delete jobs (and artifacts) older than the retention period.
+
+    Returns the number of jobs removed."""
+    from app.models.export_job import ExportJob
+    hours = EXPORT_JOB_RETENTION_HOURS if retention_hours is None else retention_hours
+    cutoff = datetime.utcnow() - timedelta(hours=hours)
+    removed = 0
+    for job in ExportJob.query.filter(ExportJob.created_at < cutoff).all():
+        if job.status == 'running':
+            continue  # reaped first if its worker is gone
+        path = artifact_path(job)
+        if path and os.path.exists(path):
+            os.remove(path)
+        db.session.delete(job)
+        removed += 1
+    db.session.commit()
+    return removed
@@ -0,0 +1,291 @@
+"""
+Transactional notification outbox.
+
+Routes don't send email or push notifications themselves. They call
+enqueue(), which adds an OutboxMessage to the current session, so the
+notification commits (or rolls back) with the change that triggered it. A
+dispatcher then delivers due messages:
+- a per-process thread, started by the first commit that enqueues a message
+  and woken by every such commit, so OTP emails still go out immediately
+- or `flask dispatch-outbox`, for running delivery in a dedicated worker
+  (OUTBOX_DISPATCHER=cli keeps web workers from delivering at all)
+
+Messages are claimed with SELECT ... FOR UPDATE SKIP LOCKED and leased for
+OUTBOX_LEASE_SECONDS, so several dispatchers can run at once and a crashed
+one's messages become due again. Failures are retried with exponential
+backoff; after OUTBOX_MAX_ATTEMPTS a message is kept as a dead letter.
+"""
+import json
+import logging
+import os
+import random
+import threading
+from datetime import datetime, timedelta
+from flask import current_app
+from sqlalchemy import event, func
+from sqlalchemy.orm import Session
+from app import db
+
+logger = logging.getLogger(__name__)
+
+OUTBOX_DISPATCHER = os.getenv('OUTBOX_DISPATCHER', 'thread')  # thread | cli
+OUTBOX_BATCH_SIZE = int(os.getenv('OUTBOX_BATCH_SIZE', 50))
+OUTBOX_MAX_ATTEMPTS = int(os.getenv('OUTBOX_MAX_ATTEMPTS', 8))
+OUTBOX_BACKOFF_SECONDS = int(os.getenv('OUTBOX_BACKOFF_SECONDS', 30))
+OUTBOX_POLL_SECONDS = float(os.getenv('OUTBOX_POLL_SECONDS', 5))
+OUTBOX_LEASE_SECONDS = 300
+MAX_BACKOFF_SECONDS = 3600
+
+# kind -> fn(**payload); raising marks the attempt failed
+_handlers = {}
+
+_dispatcher = None
+_dispatcher_pid = None
+_dispatcher_lock = threading.Lock()
+_wake = threading.Event()
+
+
+def handler(kind):
+    """Register the function that delivers an outbox message kind."""
+    def decorator(fn):
+        _handlers[kind] = fn
+        return fn
+    return decorator
+
+
+def enqueue(kind, **payload):
+    """Add a notification to the current transaction.
+
+    payload must be JSON-serializable ids; the handler loads everything else
+    when it runs. Nothing is sent unless the transaction commits."""
+    from app.models.outbox_message import OutboxMessage
+    if kind not in _handlers:
+        raise ValueError(f'Unknown outbox message kind: {kind}')
+    message = OutboxMessage(kind=kind, payload=json.dumps(payload), status='pending',
+                            attempts=0, next_attempt_at=datetime.utcnow())
+    db.session.add(message)
+    if OUTBOX_DISPATCHER == 'thread':
+        db.session.info['outbox_app'] = current_app._get_current_object()
+    return message
+
+
+@event.listens_for(Session, 'after_commit')
+def _wake_dispatcher(session):
+    app = session.info.pop('outbox_app', None)
+    if app is not None:
+        _ensure_dispatcher(app)
+        _wake.set()
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_wake(session):
+    session.info.pop('outbox_app', None)
+
+
+def _ensure_dispatcher(app):
+    global _dispatcher, _dispatcher_pid
+
+    def running():
+        # A forked worker inherits the variable but not the thread
+        return _dispatcher is not None and _dispatcher.is_alive() and _dispatcher_pid == os.getpid()
+
+    if running():
+        return
+    with _dispatcher_lock:
+        if not running():
+            _dispatcher = threading.Thread(target=_run_dispatcher, args=(app,),
+                                           name='outbox-dispatcher', daemon=True)
+            _dispatcher_pid = os.getpid()
+            _dispatcher.start()
+
+
+def _run_dispatcher(app):
+    while True:
+        _wake.wait(OUTBOX_POLL_SECONDS)
+        _wake.clear()
+        with app.app_context():
+            try:
+                while dispatch_due()['claimed'] >= OUTBOX_BATCH_SIZE:
+                    pass
+            except Exception:
+                logger.exception('Outbox dispatch failed')
+                db.session.rollback()
+            finally:
+                db.session.remove()
+
+
+def _backoff(attempts):
+    delay = min(OUTBOX_BACKOFF_SECONDS * 2 ** (attempts - 1), MAX_BACKOFF_SECONDS)
+    return timedelta(seconds=delay * random.uniform(0.8, 1.2))
+
+
+def _claim(now, limit):
+    """Lease up to limit due messages; returns [(id, kind, payload, attempts)]."""
+    from app.models.outbox_message import OutboxMessage
+    messages = (OutboxMessage.query
+                .filter(OutboxMessage.status == 'pending', OutboxMessage.next_attempt_at <= now)
+                .order_by(OutboxMessage.next_attempt_at, OutboxMessage.id)
+                .limit(limit)
+                .with_for_update(skip_locked=True)
+                .all())
+    claimed = []
+    for message in messages:
+        message.attempts += 1
+        message.next_attempt_at = now + timedelta(seconds=OUTBOX_LEASE_SECONDS)
+        claimed.append((message.id, message.kind, message.payload_dict, message.attempts))
+    db.session.commit()
+    return claimed
+
+
+def _settle(message_id, **values):
+    from app.models.outbox_message import OutboxMessage
+    query = OutboxMessage.query.filter(OutboxMessage.id == message_id)
+    if values:
+        query.update(values, synchronize_session=False)
+    else:
+        query.delete(synchronize_session=False)
+    db.session.commit()
+
+
+def dispatch_due(limit=None):
+    """Deliver one batch of due messages.
+
+    Returns:
+        dict of claimed, sent, retried and dead counts
+    """
+    now = datetime.utcnow()
+    counts = dict.fromkeys(('claimed', 'sent', 'retried', 'dead'), 0)
+    claimed = _claim(now, limit or OUTBOX_BATCH_SIZE)
+    counts['claimed'] = len(claimed)
+    for message_id, kind, payload, attempts in claimed:
+        try:
+            fn = _handlers.get(kind)
+            if fn is None:
+                raise LookupError(f'No handler for outbox message kind {kind}')
+            fn(**payload)
+        except Exception as e:
+            db.session.rollback()  # drop whatever the handler left half-done
+            error = f'{type(e).__name__}: {e}'
+            if isinstance(e, LookupError) or attempts >= OUTBOX_MAX_ATTEMPTS:
+                logger.error('Outbox message %s (%s) dead-lettered after %d attempt(s): %s',
+                             message_id, kind, attempts, error)
+                _settle(message_id, status='dead', last_error=error)
+                counts['dead'] += 1
+            else:
+                logger.warning('Outbox message %s (%s) failed, attempt %d: %s',
+                               message_id, kind, attempts, error)
+                _settle(message_id, last_error=error,
+                        next_attempt_at=datetime.utcnow() + _backoff(attempts))
+                counts['retried'] += 1
+            continue
+        _settle(message_id)
+        counts['sent'] += 1
+    return counts
+
+
+def requeue_dead():
+    """Make every dead letter due again with a fresh retry budget.
+
+    Returns the number of messages requeued."""
+    from app.models.outbox_message import OutboxMessage
+    count = (OutboxMessage.query
+             .filter(OutboxMessage.status == 'dead')
+             .update({OutboxMessage.status: 'pending', OutboxMessage.attempts: 0,
+                      OutboxMessage.next_attempt_at: datetime.utcnow()},
+                     synchronize_session=False))
+    db.session.commit()
+    return count
+
+
+def outbox_counts():
+    """{status: count} over the whole outbox."""
+    from app.models.outbox_message import OutboxMessage
+    rows = (db.session.query(OutboxMessage.status, func.count(OutboxMessage.id))
+            .group_by(OutboxMessage.status).all())
+    return {status: count for status, count in rows}
+
+
+# Handlers. Each re-reads current state, so a message for a code that has
+# since been used, expired or replaced is dropped rather than sent.
+
+def _is_past(expires_at):
+    # Stored as UTC; SQLite hands them back naive
+    return expires_at is not None and expires_at.replace(tzinfo=None) <= datetime.utcnow()
+
+
+@handler('login_otp_email')
+def _send_login_otp(mfa_session_id):
+    from app.models import MfaSession, User
+    from app.utils.email_sender import send_login_otp_email
+    mfa_session = db.session.get(MfaSession, mfa_session_id)
+    if mfa_session is None or mfa_session.is_verified or _is_past(mfa_session.expires_at):
+        return
+    user = db.session.get(User, mfa_session.user_id)
+    if user:
+        send_login_otp_email(user.email, mfa_session.otp_code)
+
+
+@handler('verification_email')
+def _send_verification(verification_id):
+    from app.models import EmailVerification, User
+    from app.utils.email_sender import send_verification_email
+    verification = db.session.get(EmailVerification, verification_id)
+    if verification is None or verification.used_at is not None or _is_past(verification.expires_at):
+        return
+    user = db.session.get(User, verification.user_id)
+    if user:
+        send_verification_email(user.email, verification.code)
+
+
+@handler('account_approved_email')
+def _send_account_approved_email(user_id):
+    from app.models import User
+    from app.utils.email_sender import send_account_approved_email
+    user = db.session.get(User, user_id)
+    if user:
+        send_account_approved_email(user.email, user.name)
+
+
+def _check_push(result):
+    """Raise if a push reached no device, so the message is retried.
+
+    send_to_users reports failures (FCM down, Firebase not configured) in its
+    result instead of raising. A user with no registered device is done."""
+    error = result.get('error')
+    if error == 'No device tokens':
+        return
+    if error:
+        raise RuntimeError(error)
+    if result.get('success_count', 0) == 0 and result.get('failure_count', 0) > 0:
+        raise RuntimeError(f"Push failed on all {result['failure_count']} device(s)")
+
+
+@handler('account_approved_push')
+def _send_account_approved_push(user_id):
+    from app.utils.push_notifications import notify_account_approved
+    _check_push(notify_account_approved(user_id))
+
+
+@handler('cuff_approved_push')
+def _send_cuff_approved_push(user_id):
+    from app.utils.push_notifications import notify_cuff_approved
+    _check_push(notify_cuff_approved(user_id))
+
+
+@handler('cuff_shipped_push')
+def _send_cuff_shipped_push(cuff_request_id):
+    from app.models import CuffRequest
+    from app.utils.push_notifications import notify_cuff_shipped
+    cuff_request = db.session.get(CuffRequest, cuff_request_id)
+    if cuff_request:
+        _check_push(notify_cuff_shipped(cuff_request.user_id, cuff_request.tracking_number))
+
+
+@handler('cuff_shipped_email')
+def _send_cuff_shipped_email(cuff_request_id):
+    from app.models import CuffRequest, User
+    from app.utils.email_sender import send_cuff_shipped_email
+    cuff_request = db.session.get(CuffRequest, cuff_request_id)
+    user = db.session.get(User, cuff_request.user_id) if cuff_request else None
+    if user:
+        send_cuff_shipped_email(user.email, user.name, cuff_request.tracking_number)
@@ -0,0 +1,200 @@
+"""
+Keyset (seek) pagination helpers.
+
+A keyset page filters on the sort key of the last row already returned
+instead of using OFFSET, so every page costs the same however deep the
+client has scrolled. Cursors are opaque to clients: a URL-safe base64 JSON
+list of the last row's sort values.
+
+List endpoints accept either a cursor (keyset mode; pass cursor= for the
+first page) or the older offset/page parameters, which are kept for
+compatibility. Totals are optional and memoized per process for a short
+TTL, so paging through a list doesn't re-count it on every page.
+"""
+import base64
+import binascii
+import json
+import os
+from datetime import datetime
+from sqlalchemy import func, literal, tuple_
+from app.utils.cache import TTLCache
+
+# Cached totals; routes register clear_on_commit() for the models they count
+total_cache = TTLCache(ttl_seconds=int(os.getenv('LIST_TOTAL_CACHE_TTL', 30)), max_entries=256)
+
+# Most candidate rows paginate_filtered() checks for one page
+FILTERED_SCAN_LIMIT = int(os.getenv('FILTERED_SCAN_LIMIT', 1000))
+
+
+def encode_cursor(values):
+    """Encode a row's sort values as an opaque cursor string."""
+    payload = [v.isoformat() if isinstance(v, datetime) else v for v in values]
+    raw = json.dumps(payload, separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(cursor, types):
+    """Decode a cursor into values converted by types (e.g. (datetime, int)).
+
+    Raises ValueError if the cursor is malformed."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        payload = json.loads(raw)
+    except (binascii.Error, ValueError, UnicodeDecodeError) as e:
+        raise ValueError('Invalid cursor') from e
+    if not isinstance(payload, list) or len(payload) != len(types):
+        raise ValueError('Invalid cursor')
+    values = []
+    for value, type_ in zip(payload, types):
+        try:
+            values.append(datetime.fromisoformat(value) if type_ is datetime else type_(value))
+        except (TypeError, ValueError) as e:
+            raise ValueError('Invalid cursor') from e
+    return values
+
+
+def keyset_page(query, columns, cursor, limit, descending=True, types=None, row_key=None):
+    """Fetch one keyset page of query ordered by columns.
+
+    Args:
+        query: Unordered query to page through
+        columns: Sort columns; the last must be unique (e.g. the primary key)
+        cursor: Cursor from the previous page, or None for the first page
+        limit: Page size
+        descending: Sort direction for every column
+        types: Value types for decoding the cursor (default: the columns'
+            python types)
+        row_key: fn(row) -> sort values (default: the columns' attributes)
+
+    Returns:
+        (rows, next_cursor); next_cursor is None on the last page
+
+    Raises:
+        ValueError: if cursor is malformed
+    """
+    if cursor:
+        types = types or [c.type.python_type for c in columns]
+        values = decode_cursor(cursor, types)
+        key = tuple_(*columns)
+        bound = tuple_(*[literal(v, c.type) for v, c in zip(values, columns)])
+        query = query.filter(key < bound if descending else key > bound)
+    query = query.order_by(*[c.desc() if descending else c.asc() for c in columns])
+    rows = query.limit(limit + 1).all()
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    row_key = row_key or (lambda row: [getattr(row, c.key) for c in columns])
+    return rows, encode_cursor(row_key(rows[-1]))
+
+
+def sort_columns(column, tiebreaker, null_value=None):
+    """Keyset sort columns and matching row_key for ordering by column, then
+    by the unique tiebreaker.
+
+    NULL never satisfies a keyset comparison, so nullable columns need a
+    null_value to sort their NULLs as.
+
+    Returns:
+        (columns, row_key) for keyset_page() / paginate()
+    """
+    if column is tiebreaker:
+        return (column,), lambda row: [getattr(row, column.key)]
+    key = column if null_value is None else func.coalesce(column, null_value)
+
+    def row_key(row):
+        value = getattr(row, column.key)
+        return [null_value if value is None else value, getattr(row, tiebreaker.key)]
+    return (key, tiebreaker), row_key
+
+
+def cached_count(query):
+    """query.count(), memoized in total_cache on the query's SQL and parameters."""
+    query = query.order_by(None)
+    compiled = query.statement.compile()
+    key = (str(compiled), repr(sorted(compiled.params.items())))
+    total = total_cache.get(key)
+    if total is None:
+        total = query.count()
+        total_cache.set(key, total)
+    return total
+
+
+def paginate(query, columns, cursor=None, offset=0, limit=50, descending=True,
+             row_key=None, with_total=True):
+    """Fetch one page of query in keyset or offset mode.
+
+    Keyset mode is used when cursor is not None (an empty cursor is the first
+    page); otherwise the page starts at offset. The total is only computed
+    when with_total is set, and in keyset mode only for the first page.
+
+    Returns:
+        (rows, next_cursor, total); next_cursor is always None in offset
+        mode, total is None when it wasn't computed
+
+    Raises:
+        ValueError: if cursor is malformed
+    """
+    total = None
+    if with_total and not cursor:
+        total = cached_count(query)
+    if cursor is None:
+        order = [c.desc() if descending else c.asc() for c in columns]
+        rows = query.order_by(*order).offset(max(offset, 0)).limit(limit).all()
+        return rows, None, total
+    rows, next_cursor = keyset_page(query, columns, cursor, limit,
+                                    descending=descending, row_key=row_key)
+    return rows, next_cursor, total
+
+
+def paginate_filtered(query, columns, keep, cursor=None, offset=0, limit=50, descending=True,
+                      row_key=None, with_total=True, scan_limit=FILTERED_SCAN_LIMIT):
+    """paginate() for a filter that can only be checked in Python.
+
+    Candidates from query are fetched limit at a time and passed through
+    keep(rows), which returns the rows to keep in order, until the page holds
+    limit rows, the candidates run out, or scan_limit candidates have been
+    scanned. A capped page is short but its next_cursor resumes after the
+    last scanned row. In offset mode offset counts kept rows, so the scan
+    starts from the beginning. total counts candidates, an upper bound.
+
+    Returns:
+        (rows, next_cursor, total), as paginate()
+
+    Raises:
+        ValueError: if cursor is malformed
+    """
+    total = None
+    if with_total and not cursor:
+        total = cached_count(query)
+    row_key = row_key or (lambda row: [getattr(row, c.key) for c in columns])
+    keyset = cursor is not None
+    skip = 0 if keyset else max(offset, 0)
+    page = []
+    scanned = 0
+    position = cursor
+    while True:
+        rows, more = keyset_page(query, columns, position, limit,
+                                 descending=descending, row_key=row_key)
+        scanned += len(rows)
+        kept = {id(row) for row in keep(rows)}
+        for i, row in enumerate(rows):
+            if id(row) not in kept:
+                continue
+            if skip:
+                skip -= 1
+                continue
+            page.append(row)
+            if len(page) == limit:
+                if not keyset or (more is None and i == len(rows) - 1):
+                    return page, None, total
+                return page, encode_cursor(row_key(row)), total
+        if more is None:
+            return page, None, total
+        if scanned >= scan_limit:
+            return page, more if keyset else None, total
+        position = more
+
+
+def wants_total(args):
+    """include_total=false skips counting (e.g. infinite scroll)."""
+    return args.get('include_total', 'true').lower() not in ('false', '0', 'no')
@@ -0,0 +1,113 @@
+"""
+Request-scoped memo of decrypted PHI.
+
+Model PHI properties decrypt through this module so repeated reads of the same
+field within one request (user.name in a route, then in an email helper, then
+in to_dict) pay for base64 + AES-GCM once. Entries are keyed by ciphertext and
+live on flask.g, so plaintext is dropped by the teardown_request hook and never
+outlives the request. Outside a request (CLI commands, workers) nothing is
+memoized.
+"""
+import logging
+import threading
+from flask import g, has_request_context
+from app.utils.encryption import encrypt_phi, decrypt_phi
+
+logger = logging.getLogger(__name__)
+
+_stats = {'hits': 0, 'misses': 0}
+_stats_lock = threading.Lock()
+
+
+def _memo():
+    if not has_request_context():
+        return None
+    memo = g.get('_phi_memo')
+    if memo is None:
+        memo = g._phi_memo = {}
+        g._phi_memo_stats = {'hits': 0, 'misses': 0}
+    return memo
+
+
+def _count(outcome):
+    g._phi_memo_stats[outcome] += 1
+    with _stats_lock:
+        _stats[outcome] += 1
+
+
+def cached_decrypt(ciphertext):
+    """Decrypt a PHI column value, reusing this request's plaintext if seen."""
+    if not ciphertext:
+        return None
+    memo = _memo()
+    if memo is None:
+        return decrypt_phi(ciphertext)
+    plaintext = memo.get(ciphertext)
+    if plaintext is not None:
+        _count('hits')
+        return plaintext
+    _count('misses')
+    plaintext = memo[ciphertext] = decrypt_phi(ciphertext)
+    return plaintext
+
+
+def cached_encrypt(plaintext, previous=None):
+    """Encrypt a PHI value for a setter, writing the plaintext through.
+
+    previous is the column's old ciphertext; its memo entry is dropped."""
+    ciphertext = encrypt_phi(plaintext) if plaintext else None
+    memo = _memo()
+    if memo is not None:
+        if previous:
+            memo.pop(previous, None)
+        if ciphertext:
+            memo[ciphertext] = plaintext
+    return ciphertext
+
+
+def remember(ciphertexts, plaintexts):
+    """Seed the memo with values decrypted elsewhere (e.g. a batch decrypt)."""
+    memo = _memo()
+    if memo is None:
+        return
+    for ciphertext, plaintext in zip(ciphertexts, plaintexts):
+        if ciphertext and plaintext is not None:
+            memo[ciphertext] = plaintext
+
+
+def request_cache(name):
+    """A named dict on flask.g for other request-scoped PHI caches.
+
+    It is dropped together with the memo at teardown. Returns None outside
+    a request."""
+    if not has_request_context():
+        return None
+    caches = g.get('_phi_request_caches')
+    if caches is None:
+        caches = g._phi_request_caches = {}
+    return caches.setdefault(name, {})
+
+
+def clear_phi_cache(exc=None):
+    """Drop this request's plaintext memo and request caches."""
+    g.pop('_phi_memo', None)
+    g.pop('_phi_request_caches', None)
+    stats = g.pop('_phi_memo_stats', None)
+    if stats and (stats['hits'] or stats['misses']):
+        logger.debug('PHI memo: %(hits)d hits, %(misses)d misses', stats)
+
+
+def phi_cache_stats(reset=False):
+    """Process-wide hit/miss counters, for profiling."""
+    with _stats_lock:
+        stats = dict(_stats)
+        if reset:
+            _stats['hits'] = _stats['misses'] = 0
+    total = stats['hits'] + stats['misses']
+    stats['hit_rate'] = round(stats['hits'] / total, 3) if total else None
+    return stats
+
+
+def init_phi_cache(app):
+    """Register the teardown hook that clears the memo after every request."""
+    app.teardown_request(clear_phi_cache)
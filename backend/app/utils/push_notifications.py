@@ -3,9 +3,16 @@ Push notification utilities using Firebase Cloud Messaging (FCM).
 """
 import os
 import logging
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
 
 logger = logging.getLogger(__name__)
 
+# FCM accepts at most 500 tokens per multicast
+FCM_MULTICAST_BATCH = 500
+FCM_MULTICAST_WORKERS = int(os.getenv('FCM_MULTICAST_WORKERS', 4))
+TOKEN_QUERY_CHUNK = 500
+
 # Firebase Admin SDK instance (lazy initialized)
 _firebase_app = None
 
@@ -50,74 +57,150 @@ def _get_firebase_app():
         return None
 
 
-def send_notification(user_id, title, body, data=None):
-    """Send a push notification to all active devices for a user.
+def _get_messaging():
+    """firebase_admin.messaging, or None when Firebase isn't available."""
+    if not _get_firebase_app():
+        return None
+    try:
+        from firebase_admin import messaging
+    except ImportError:
+        return None
+    return messaging
+
+
+def _active_tokens(user_ids):
+    """[(token id, user id, token)] for every active device of user_ids, in
+    one query per TOKEN_QUERY_CHUNK ids."""
+    from app import db
+    from app.models.device_token import DeviceToken
+    user_ids = list(dict.fromkeys(user_ids))
+    rows = []
+    for start in range(0, len(user_ids), TOKEN_QUERY_CHUNK):
+        chunk = user_ids[start:start + TOKEN_QUERY_CHUNK]
+        rows.extend(
+            db.session.query(DeviceToken.id, DeviceToken.user_id, DeviceToken.token)
+            .filter(DeviceToken.user_id.in_(chunk), DeviceToken.is_active == True)
+            .order_by(DeviceToken.id)
+            .all()
+        )
+    return rows
+
+
+def _bulk_update_tokens(token_ids, values):
+    from app.models.device_token import DeviceToken
+    for start in range(0, len(token_ids), TOKEN_QUERY_CHUNK):
+        (DeviceToken.query
+         .filter(DeviceToken.id.in_(token_ids[start:start + TOKEN_QUERY_CHUNK]))
+         .update(values, synchronize_session=False))
+
+
+def send_to_users(user_ids, title, body, data=None, messaging=None, workers=None):
+    """Send one push notification to every active device of user_ids.
+
+    Tokens are loaded in bulk and sent as send_each_for_multicast batches of
+    FCM_MULTICAST_BATCH tokens, spread over a thread pool of workers
+    (default FCM_MULTICAST_WORKERS). A batch whose call raises (network or
+    FCM error) counts all its tokens as failed; the other batches' results
+    still stand. Unregistered tokens are deactivated and the rest get
+    last_used_at, each in one bulk UPDATE, then committed.
 
     Args:
-        user_id: The user ID to send notification to
+        user_ids: Users to notify
         title: Notification title
         body: Notification body text
         data: Optional dict of custom data to include
+        messaging: FCM messaging module (default firebase_admin.messaging);
+            tests pass a stand-in
+        workers: Concurrent multicast batches
 
     Returns:
-        dict with 'success_count' and 'failure_count'
+        dict with 'success_count', 'failure_count', 'deactivated' and
+        'by_user' ({user_id: devices reached}, users without an active
+        device omitted), plus 'error' when nothing could be sent
     """
-    from app.models.device_token import DeviceToken
-
-    app = _get_firebase_app()
-    if not app:
-        logger.warning(f"Cannot send notification to user {user_id}: Firebase not configured")
-        return {'success_count': 0, 'failure_count': 0, 'error': 'Firebase not configured'}
-
-    try:
-        from firebase_admin import messaging
-    except ImportError:
-        return {'success_count': 0, 'failure_count': 0, 'error': 'firebase-admin not installed'}
+    from app import db
 
-    # Get active tokens for user
-    tokens = DeviceToken.query.filter_by(user_id=user_id, is_active=True).all()
+    messaging = messaging or _get_messaging()
+    if messaging is None:
+        logger.warning("Cannot send notifications: Firebase not configured")
+        return {'success_count': 0, 'failure_count': 0, 'deactivated': 0, 'by_user': {},
+                'error': 'Firebase not configured'}
 
+    tokens = _active_tokens(user_ids)
     if not tokens:
-        logger.info(f"No active device tokens for user {user_id}")
-        return {'success_count': 0, 'failure_count': 0, 'error': 'No device tokens'}
+        logger.info("No active device tokens for %d user(s)", len(set(user_ids)))
+        return {'success_count': 0, 'failure_count': 0, 'deactivated': 0, 'by_user': {},
+                'error': 'No device tokens'}
 
-    success_count = 0
-    failure_count = 0
+    batches = [tokens[start:start + FCM_MULTICAST_BATCH]
+               for start in range(0, len(tokens), FCM_MULTICAST_BATCH)]
 
-    for device_token in tokens:
+    def send_batch(batch):
         try:
-            message = messaging.Message(
-                notification=messaging.Notification(
-                    title=title,
-                    body=body,
-                ),
+            message = messaging.MulticastMessage(
+                notification=messaging.Notification(title=title, body=body),
                 data=data or {},
-                token=device_token.token,
+                tokens=[token for _, _, token in batch],
             )
+            return messaging.send_each_for_multicast(message)
+        except Exception as e:
+            logger.error(f"Multicast batch of {len(batch)} token(s) failed: {e}")
+            return None
+
+    workers = min(workers or FCM_MULTICAST_WORKERS, len(batches))
+    if workers > 1:
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='fcm-multicast') as pool:
+            results = list(pool.map(send_batch, batches))
+    else:
+        results = [send_batch(batch) for batch in batches]
 
-            response = messaging.send(message)
-            logger.info(f"Sent notification to user {user_id}, response: {response}")
-            success_count += 1
+    delivered, unregistered = [], []
+    failure_count = 0
+    by_user = {}
+    for batch, result in zip(batches, results):
+        if result is None:
+            for _, user_id, _ in batch:
+                by_user.setdefault(user_id, 0)
+            failure_count += len(batch)
+            continue
+        for (token_id, user_id, _), response in zip(batch, result.responses):
+            by_user.setdefault(user_id, 0)
+            if response.success:
+                delivered.append(token_id)
+                by_user[user_id] += 1
+            else:
+                failure_count += 1
+                if isinstance(response.exception, messaging.UnregisteredError):
+                    unregistered.append(token_id)
+                else:
+                    logger.error(f"Failed to send notification to token {token_id}: {response.exception}")
+
+    if unregistered:
+        logger.warning(f"Marking {len(unregistered)} unregistered token(s) inactive")
+        _bulk_update_tokens(unregistered, {'is_active': False})
+    if delivered:
+        _bulk_update_tokens(delivered, {'last_used_at': datetime.now(timezone.utc)})
+    db.session.commit()
 
-            # Update last used timestamp
-            from datetime import datetime, timezone
-            device_token.last_used_at = datetime.now(timezone.utc)
+    logger.info(f"Sent notification to {len(delivered)} of {len(tokens)} device(s) "
+                f"in {len(batches)} batch(es)")
+    return {'success_count': len(delivered), 'failure_count': failure_count,
+            'deactivated': len(unregistered), 'by_user': by_user}
 
-        except messaging.UnregisteredError:
-            # Token is no longer valid, mark as inactive
-            logger.warning(f"Token {device_token.id} is unregistered, marking inactive")
-            device_token.is_active = False
-            failure_count += 1
 
-        except Exception as e:
-            logger.error(f"Failed to send notification to token {device_token.id}: {e}")
-            failure_count += 1
+def send_notification(user_id, title, body, data=None):
+    """Send a push notification to all active devices for a user.
 
-    # Commit token updates
-    from app import db
-    db.session.commit()
+    Args:
+        user_id: The user ID to send notification to
+        title: Notification title
+        body: Notification body text
+        data: Optional dict of custom data to include
 
-    return {'success_count': success_count, 'failure_count': failure_count}
+    Returns:
+        dict with 'success_count' and 'failure_count'
+    """
+    return send_to_users([user_id], title, body, data=data)
 
 
 def notify_account_approved(user_id):
@@ -152,11 +235,17 @@ def notify_cuff_approved(user_id):
 
 def notify_reading_reminder(user_id):
     """Send a reminder to take blood pressure reading."""
-    return send_notification(
-        user_id=user_id,
+    return notify_reading_reminders([user_id])
+
+
+def notify_reading_reminders(user_ids, messaging=None):
+    """Send the reading reminder to many users in multicast batches."""
+    return send_to_users(
+        user_ids,
         title="Time to Check Your BP",
         body="Don't forget to take your blood pressure reading today!",
-        data={'type': 'reading_reminder'}
+        data={'type': 'reading_reminder'},
+        messaging=messaging,
     )
 
 
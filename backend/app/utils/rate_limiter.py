@@ -1,49 +1,341 @@
 """
-Persistent DB-backed rate limiter for API endpoints.
+Rate limiting for API endpoints with pluggable storage backends.
+
+RATE_LIMIT_BACKEND selects where attempts are counted:
+- db (default): the application database (rate_limit_entries table), shared
+  by every worker on every host; also used as the fallback when the SQLite
+  store can't be opened
+- sqlite: a local SQLite file in WAL mode shared by every worker on one host
+  (RATE_LIMIT_SQLITE_PATH); only for single-host deployments, since each
+  host counts separately
+- memory: per-process sliding window; fastest, but each worker counts
+  separately, so the effective limit is multiplied by the worker count
 """
+import logging
+import os
+from abc import ABC, abstractmethod
+import sqlite3
+import threading
+import time
+from collections import deque
 from datetime import datetime, timedelta, timezone
 from functools import wraps
 from flask import request, jsonify
 
+logger = logging.getLogger(__name__)
 
-class DBRateLimiter:
-    """Database-backed rate limiter that persists across server restarts."""
 
-    def __init__(self, max_attempts=5, window_seconds=60, endpoint_name='default'):
-        self.max_attempts = max_attempts
-        self.window_seconds = window_seconds
-        self.endpoint_name = endpoint_name
+class RateLimitBackend(ABC):
+    """Storage for rate limit attempts, keyed by (endpoint, key).
 
-    def is_limited(self, key):
+    Subclasses must implement count() and add(); an incomplete backend fails
+    when it is constructed rather than on the first limited request."""
+
+    name = 'base'
+
+    @abstractmethod
+    def count(self, endpoint, key, window_seconds):
+        """Number of attempts recorded within the last window_seconds."""
+
+    @abstractmethod
+    def add(self, endpoint, key, window_seconds):
+        """Record one attempt."""
+
+    def hit(self, endpoint, key, max_attempts, window_seconds):
+        """Record an attempt unless the limit is reached.
+
+        Returns True if the caller is limited (nothing recorded)."""
+        if self.count(endpoint, key, window_seconds) >= max_attempts:
+            return True
+        self.add(endpoint, key, window_seconds)
+        return False
+
+    def cleanup(self, older_than_seconds):
+        """Drop attempts older than older_than_seconds; returns rows removed."""
+        return 0
+
+
+class MemoryBackend(RateLimitBackend):
+    """In-process sliding window log.
+
+    Each (endpoint, key) keeps at most max_attempts timestamps, so a check is
+    O(1): the caller is limited when the deque is full and its oldest entry
+    is still inside the window."""
+
+    name = 'memory'
+    PRUNE_EVERY = 1024
+
+    def __init__(self):
+        self._hits = {}
+        self._windows = {}
+        self._lock = threading.Lock()
+        self._calls = 0
+
+    def _live(self, endpoint, key, window_seconds, now):
+        hits = self._hits.get((endpoint, key))
+        if hits is None:
+            return None
+        cutoff = now - window_seconds
+        while hits and hits[0] <= cutoff:
+            hits.popleft()
+        return hits
+
+    def count(self, endpoint, key, window_seconds):
+        with self._lock:
+            hits = self._live(endpoint, key, window_seconds, time.monotonic())
+            return len(hits) if hits else 0
+
+    def add(self, endpoint, key, window_seconds):
+        now = time.monotonic()
+        with self._lock:
+            self._windows[endpoint] = window_seconds
+            hits = self._live(endpoint, key, window_seconds, now)
+            if hits is None:
+                hits = self._hits[(endpoint, key)] = deque()
+            hits.append(now)
+            self._maybe_prune(now)
+
+    def hit(self, endpoint, key, max_attempts, window_seconds):
+        now = time.monotonic()
+        with self._lock:
+            self._windows[endpoint] = window_seconds
+            hits = self._hits.get((endpoint, key))
+            if hits is None or hits.maxlen != max_attempts:
+                hits = deque(hits or (), maxlen=max_attempts)
+                self._hits[(endpoint, key)] = hits
+            if len(hits) >= max_attempts and hits[0] > now - window_seconds:
+                return True
+            hits.append(now)
+            self._maybe_prune(now)
+            return False
+
+    def _maybe_prune(self, now):
+        # Caller holds the lock
+        self._calls += 1
+        if self._calls % self.PRUNE_EVERY:
+            return
+        stale = [
+            k for k, hits in self._hits.items()
+            if not hits or hits[-1] <= now - self._windows.get(k[0], 0)
+        ]
+        for k in stale:
+            del self._hits[k]
+
+    def cleanup(self, older_than_seconds):
+        now = time.monotonic()
+        with self._lock:
+            stale = [k for k, hits in self._hits.items()
+                     if not hits or hits[-1] <= now - older_than_seconds]
+            for k in stale:
+                del self._hits[k]
+        return len(stale)
+
+
+class SQLiteBackend(RateLimitBackend):
+    """Host-local store shared by all workers through a SQLite file in WAL mode.
+
+    Each check-and-record runs in one BEGIN IMMEDIATE transaction, so
+    concurrent workers can't both slip under the limit. Expired rows for a
+    key are deleted on every hit and globally every PRUNE_EVERY hits."""
+
+    name = 'sqlite'
+    PRUNE_EVERY = 1000
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        self._calls = 0
+        self._calls_lock = threading.Lock()
+        self._conn()  # fail fast if the file can't be opened
+
+    def _conn(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS rate_limit_hits ('
+                ' endpoint TEXT NOT NULL, key TEXT NOT NULL,'
+                ' ts REAL NOT NULL, expires_at REAL NOT NULL)'
+            )
+            conn.execute(
+                'CREATE INDEX IF NOT EXISTS ix_rate_limit_hits_endpoint_key_ts'
+                ' ON rate_limit_hits (endpoint, key, ts)'
+            )
+            conn.execute(
+                'CREATE INDEX IF NOT EXISTS ix_rate_limit_hits_expires_at'
+                ' ON rate_limit_hits (expires_at)'
+            )
+            self._local.conn = conn
+        return conn
+
+    def count(self, endpoint, key, window_seconds):
+        row = self._conn().execute(
+            'SELECT COUNT(*) FROM rate_limit_hits WHERE endpoint = ? AND key = ? AND ts > ?',
+            (endpoint, key, time.time() - window_seconds),
+        ).fetchone()
+        return row[0]
+
+    def add(self, endpoint, key, window_seconds):
+        now = time.time()
+        self._conn().execute(
+            'INSERT INTO rate_limit_hits (endpoint, key, ts, expires_at) VALUES (?, ?, ?, ?)',
+            (endpoint, key, now, now + window_seconds),
+        )
+
+    def hit(self, endpoint, key, max_attempts, window_seconds):
+        conn = self._conn()
+        now = time.time()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            conn.execute(
+                'DELETE FROM rate_limit_hits WHERE endpoint = ? AND key = ? AND ts <= ?',
+                (endpoint, key, now - window_seconds),
+            )
+            count = conn.execute(
+                'SELECT COUNT(*) FROM rate_limit_hits WHERE endpoint = ? AND key = ?',
+                (endpoint, key),
+            ).fetchone()[0]
+            limited = count >= max_attempts
+            if not limited:
+                conn.execute(
+                    'INSERT INTO rate_limit_hits (endpoint, key, ts, expires_at) VALUES (?, ?, ?, ?)',
+                    (endpoint, key, now, now + window_seconds),
+                )
+            with self._calls_lock:
+                self._calls += 1
+                prune = self._calls % self.PRUNE_EVERY == 0
+            if prune:
+                conn.execute('DELETE FROM rate_limit_hits WHERE expires_at <= ?', (now,))
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+        return limited
+
+    def cleanup(self, older_than_seconds):
+        cur = self._conn().execute(
+            'DELETE FROM rate_limit_hits WHERE ts < ?', (time.time() - older_than_seconds,)
+        )
+        return cur.rowcount
+
+
+class DBBackend(RateLimitBackend):
+    """Application database backend (rate_limit_entries); persists across restarts."""
+
+    name = 'db'
+
+    def count(self, endpoint, key, window_seconds):
         from app.models.rate_limit_entry import RateLimitEntry
-        cutoff = datetime.now(timezone.utc) - timedelta(seconds=self.window_seconds)
-        count = RateLimitEntry.query.filter(
+        cutoff = datetime.now(timezone.utc) - timedelta(seconds=window_seconds)
+        return RateLimitEntry.query.filter(
             RateLimitEntry.key == key,
-            RateLimitEntry.endpoint == self.endpoint_name,
+            RateLimitEntry.endpoint == endpoint,
             RateLimitEntry.timestamp > cutoff
         ).count()
-        return count >= self.max_attempts
 
-    def record(self, key):
+    def add(self, endpoint, key, window_seconds):
         from app import db
         from app.models.rate_limit_entry import RateLimitEntry
         entry = RateLimitEntry(
             key=key,
-            endpoint=self.endpoint_name,
+            endpoint=endpoint,
             timestamp=datetime.now(timezone.utc)
         )
         db.session.add(entry)
         db.session.commit()
 
+    def cleanup(self, older_than_seconds):
+        from app.models.rate_limit_entry import RateLimitEntry
+        return RateLimitEntry.cleanup_older_than(older_than_seconds)
+
+
+BACKENDS = {
+    'memory': MemoryBackend,
+    'sqlite': SQLiteBackend,
+    'db': DBBackend,
+}
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def create_backend(name=None):
+    """Build the backend named by RATE_LIMIT_BACKEND (or name)."""
+    name = (name or os.getenv('RATE_LIMIT_BACKEND', 'db')).lower()
+    if name not in BACKENDS:
+        raise ValueError(f'Unknown RATE_LIMIT_BACKEND {name!r}; expected one of {sorted(BACKENDS)}')
+    if name == 'sqlite':
+        path = os.getenv('RATE_LIMIT_SQLITE_PATH', 'rate_limits.db')
+        try:
+            return SQLiteBackend(path)
+        except (sqlite3.Error, OSError):
+            logger.warning('Rate limit store %s unavailable; falling back to the database backend',
+                           path, exc_info=True)
+            return DBBackend()
+    return BACKENDS[name]()
+
+
+def get_backend():
+    """The process-wide backend, created on first use."""
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                _backend = create_backend()
+    return _backend
+
+
+def set_backend(backend):
+    """Replace the process-wide backend (benchmarks, alternate deployments)."""
+    global _backend
+    with _backend_lock:
+        _backend = backend
+
+
+class RateLimiter:
+    """Allow max_attempts per window_seconds per key for one endpoint."""
+
+    def __init__(self, max_attempts=5, window_seconds=60, endpoint_name='default', backend=None):
+        self.max_attempts = max_attempts
+        self.window_seconds = window_seconds
+        self.endpoint_name = endpoint_name
+        self._backend = backend
+
+    @property
+    def backend(self):
+        return self._backend or get_backend()
+
+    def is_limited(self, key):
+        return self.backend.count(self.endpoint_name, key, self.window_seconds) >= self.max_attempts
+
+    def record(self, key):
+        self.backend.add(self.endpoint_name, key, self.window_seconds)
+
+    def hit(self, key):
+        """Check and record one attempt; True if the caller is limited."""
+        return self.backend.hit(self.endpoint_name, key, self.max_attempts, self.window_seconds)
+
+
+class DBRateLimiter(RateLimiter):
+    """Rate limiter pinned to the application database backend."""
+
+    def __init__(self, max_attempts=5, window_seconds=60, endpoint_name='default'):
+        super().__init__(max_attempts, window_seconds, endpoint_name, backend=DBBackend())
+
 
 # Global login limiter: 5 attempts per minute per IP
-login_limiter = DBRateLimiter(max_attempts=5, window_seconds=60, endpoint_name='login')
+login_limiter = RateLimiter(max_attempts=5, window_seconds=60, endpoint_name='login')
 
 # Registration limiter: 3 attempts per minute per IP
-registration_limiter = DBRateLimiter(max_attempts=3, window_seconds=60, endpoint_name='registration')
+registration_limiter = RateLimiter(max_attempts=3, window_seconds=60, endpoint_name='registration')
 
 # MFA verification limiter: 5 attempts per 10 minutes per IP
-mfa_verify_limiter = DBRateLimiter(max_attempts=5, window_seconds=600, endpoint_name='mfa_verify')
+mfa_verify_limiter = RateLimiter(max_attempts=5, window_seconds=600, endpoint_name='mfa_verify')
 
 
 def rate_limit(limiter):
@@ -52,9 +344,8 @@ def rate_limit(limiter):
         @wraps(f)
         def wrapper(*args, **kwargs):
             client_ip = request.remote_addr or 'unknown'
-            if limiter.is_limited(client_ip):
+            if limiter.hit(client_ip):
                 return jsonify({'error': 'Too many requests. Try again later.'}), 429
-            limiter.record(client_ip)
             return f(*args, **kwargs)
         return wrapper
     return decorator
@@ -65,8 +356,7 @@ def rate_limit_login(f):
     @wraps(f)
     def wrapper(*args, **kwargs):
         client_ip = request.remote_addr or 'unknown'
-        if login_limiter.is_limited(client_ip):
+        if login_limiter.hit(client_ip):
             return jsonify({'error': 'Too many login attempts. Try again later.'}), 429
-        login_limiter.record(client_ip)
         return f(*args, **kwargs)
     return wrapper
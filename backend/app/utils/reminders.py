@@ -0,0 +1,208 @@
+"""
+Reading reminder campaign.
+
+run_reminders() reminds active patients who haven't submitted a reading in
+REMINDER_AFTER_DAYS days, before they age onto the no-reading call list:
+- candidates come from the reading-stats rollup's indexed last_reading_date,
+  plus active users with no readings at all whose account is older than
+  REMINDER_AFTER_DAYS; either way a reading inside the window (checked on
+  the (user_id, reading_date) index) rules a user out, so a missing or
+  out-of-date rollup row can't cause a wrong reminder
+- users who opted out, are inside their quiet hours (in their timezone, or
+  REMINDER_DEFAULT_TIMEZONE), were reminded within
+  REMINDER_MIN_INTERVAL_HOURS, or already had REMINDER_MAX_PER_WEEK
+  reminders in the last 7 days are skipped
+- the rest get a push reminder through FCM multicast, REMINDER_BATCH_SIZE
+  users at a time; users no device was reached on get an email instead,
+  when a delivering email backend is configured (never the console one)
+- batches are paced to REMINDER_RATE_PER_MINUTE users so a large backlog
+  stays inside provider quotas
+- every delivery is recorded in reminder_deliveries, committed per batch, so
+  the caps hold across restarts
+
+`flask send-reading-reminders` runs it every REMINDER_INTERVAL_MINUTES.
+"""
+import os
+import time
+from datetime import datetime, timedelta, timezone
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+from sqlalchemy import case, func, text
+from app import db
+from app.models import User, UserReadingStats, ReminderDelivery, BloodPressureReading
+from app.utils.display_names import resolve_user_field
+from app.utils.email_sender import email_delivery_configured, reading_reminder_email, send_emails
+from app.utils.push_notifications import notify_reading_reminders
+
+REMINDER_AFTER_DAYS = int(os.getenv('REMINDER_AFTER_DAYS', 3))
+REMINDER_MIN_INTERVAL_HOURS = int(os.getenv('REMINDER_MIN_INTERVAL_HOURS', 48))
+REMINDER_MAX_PER_WEEK = int(os.getenv('REMINDER_MAX_PER_WEEK', 2))
+REMINDER_QUIET_START = int(os.getenv('REMINDER_QUIET_START', 21))
+REMINDER_QUIET_END = int(os.getenv('REMINDER_QUIET_END', 8))
+REMINDER_DEFAULT_TIMEZONE = os.getenv('REMINDER_DEFAULT_TIMEZONE', 'UTC')
+REMINDER_BATCH_SIZE = int(os.getenv('REMINDER_BATCH_SIZE', 500))
+REMINDER_RATE_PER_MINUTE = int(os.getenv('REMINDER_RATE_PER_MINUTE', 3000))
+REMINDER_INTERVAL_MINUTES = int(os.getenv('REMINDER_INTERVAL_MINUTES', 30))
+CAMPAIGN = 'reading_reminder'
+# pg_try_advisory_lock key, so only one scheduler sends at a time
+RUN_LOCK_KEY = 0x52454d44
+
+
+def _utcnow():
+    """Naive UTC now, matching how reading and delivery dates are stored."""
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def _zone(name):
+    try:
+        return ZoneInfo(name or REMINDER_DEFAULT_TIMEZONE)
+    except (ZoneInfoNotFoundError, ValueError):
+        return ZoneInfo(REMINDER_DEFAULT_TIMEZONE)
+
+
+def in_quiet_hours(now, tz_name=None, start=None, end=None):
+    """Whether naive-UTC now falls in the user's quiet hours.
+
+    Hours are local to tz_name; None falls back to the REMINDER_* defaults.
+    A window may wrap midnight (21-8); start == end means no quiet hours."""
+    start = REMINDER_QUIET_START if start is None else start
+    end = REMINDER_QUIET_END if end is None else end
+    if start == end:
+        return False
+    hour = now.replace(tzinfo=timezone.utc).astimezone(_zone(tz_name)).hour
+    if start < end:
+        return start <= hour < end
+    return hour >= start or hour < end
+
+
+def candidate_user_ids(now=None):
+    """Active, opted-in patients with no reading since REMINDER_AFTER_DAYS ago."""
+    now = now or _utcnow()
+    cutoff = now - timedelta(days=REMINDER_AFTER_DAYS)
+    recent_reading = db.exists().where(BloodPressureReading.user_id == User.id,
+                                       BloodPressureReading.reading_date >= cutoff)
+    base = (db.session.query(User.id)
+            .filter(User.user_status == 'active', User.is_admin == False,
+                    User.reading_reminders_enabled == True, ~recent_reading))
+    # Range scan on the rollup's last_reading_date index
+    stale = (base.join(UserReadingStats, UserReadingStats.user_id == User.id)
+             .filter(UserReadingStats.last_reading_date < cutoff))
+    # No readings yet: only once the account has had REMINDER_AFTER_DAYS to submit one
+    never = (base.outerjoin(UserReadingStats, UserReadingStats.user_id == User.id)
+             .filter(UserReadingStats.last_reading_date.is_(None), User.created_at < cutoff))
+    return sorted({row.id for row in stale} | {row.id for row in never})
+
+
+def _eligible(user_ids, now, counts):
+    """user_ids minus those in quiet hours or over a frequency cap.
+
+    The weekly cap counts only 'sent' reminders. The minimum interval runs
+    from the last attempt of either status, so a user no channel reaches is
+    retried every REMINDER_MIN_INTERVAL_HOURS without using up the cap."""
+    prefs = (db.session.query(User.id, User.timezone, User.quiet_hours_start, User.quiet_hours_end)
+             .filter(User.id.in_(user_ids)).all())
+    recent = dict(
+        (row.user_id, (row.count, row.last))
+        for row in db.session.query(ReminderDelivery.user_id,
+                                    func.sum(case((ReminderDelivery.status == 'sent', 1), else_=0))
+                                    .label('count'),
+                                    func.max(ReminderDelivery.sent_at).label('last'))
+        .filter(ReminderDelivery.user_id.in_(user_ids),
+                ReminderDelivery.campaign == CAMPAIGN,
+                ReminderDelivery.sent_at >= now - timedelta(days=7))
+        .group_by(ReminderDelivery.user_id)
+    )
+    min_interval = timedelta(hours=REMINDER_MIN_INTERVAL_HOURS)
+    eligible = []
+    for user_id, tz_name, quiet_start, quiet_end in prefs:
+        if in_quiet_hours(now, tz_name, quiet_start, quiet_end):
+            counts['quiet_hours'] += 1
+            continue
+        sent_this_week, last_sent = recent.get(user_id, (0, None))
+        if sent_this_week >= REMINDER_MAX_PER_WEEK or (last_sent and now - last_sent < min_interval):
+            counts['capped'] += 1
+            continue
+        eligible.append(user_id)
+    return eligible
+
+
+def _send_batch(user_ids, now, counts, messaging=None):
+    """Push to user_ids, email the ones no device was reached on, and record
+    one ReminderDelivery per user."""
+    result = notify_reading_reminders(user_ids, messaging=messaging)
+    reached = result.get('by_user', {})
+    deliveries = []
+    email_ids = []
+    for user_id in user_ids:
+        if reached.get(user_id):
+            deliveries.append(ReminderDelivery(user_id=user_id, campaign=CAMPAIGN, channel='push',
+                                               status='sent', detail=f'{reached[user_id]} device(s)',
+                                               sent_at=now))
+        else:
+            email_ids.append(user_id)
+    counts['push'] += len(deliveries)
+
+    if email_ids and not email_delivery_configured():
+        # The console backend would print names and addresses to stdout
+        deliveries.extend(ReminderDelivery(user_id=user_id, campaign=CAMPAIGN, channel='email',
+                                           status='failed', detail='Email delivery not configured',
+                                           sent_at=now)
+                          for user_id in email_ids)
+        counts['failed'] += len(email_ids)
+    elif email_ids:
+        emails = resolve_user_field(email_ids, 'email', cache={})
+        names = resolve_user_field(email_ids, 'name', cache={})
+        to_send = [(user_id, emails[user_id]) for user_id in email_ids if emails.get(user_id)]
+        failures = dict(send_emails([(address, *reading_reminder_email(names.get(user_id) or 'there'))
+                                     for user_id, address in to_send]))
+        for user_id in email_ids:
+            address = emails.get(user_id)
+            error = 'No email address' if not address else failures.get(address)
+            deliveries.append(ReminderDelivery(
+                user_id=user_id, campaign=CAMPAIGN, channel='email',
+                status='failed' if error else 'sent',
+                detail=f'{type(error).__name__}: {error}'[:255] if isinstance(error, Exception) else error,
+                sent_at=now))
+            counts['failed' if error else 'email'] += 1
+
+    db.session.add_all(deliveries)
+    db.session.commit()
+
+
+def run_reminders(now=None, dry_run=False, messaging=None):
+    """One scheduler pass over every candidate.
+
+    Returns:
+        dict of candidates, quiet_hours, capped, push, email and failed
+        counts (plus eligible ids when dry_run), or None if another
+        scheduler holds the run lock
+    """
+    now = now or _utcnow()
+    lock_conn = None
+    if db.engine.dialect.name == 'postgresql':
+        lock_conn = db.engine.connect()
+        if not lock_conn.execute(text('SELECT pg_try_advisory_lock(:key)'), {'key': RUN_LOCK_KEY}).scalar():
+            lock_conn.close()
+            return None
+    try:
+        counts = dict.fromkeys(('candidates', 'quiet_hours', 'capped', 'push', 'email', 'failed'), 0)
+        candidates = candidate_user_ids(now)
+        counts['candidates'] = len(candidates)
+        eligible = []
+        for start in range(0, len(candidates), REMINDER_BATCH_SIZE):
+            eligible.extend(_eligible(candidates[start:start + REMINDER_BATCH_SIZE], now, counts))
+        if dry_run:
+            counts['eligible'] = eligible
+            return counts
+
+        started = time.monotonic()
+        for start in range(0, len(eligible), REMINDER_BATCH_SIZE):
+            if start:
+                # Pace to REMINDER_RATE_PER_MINUTE users
+                due = started + start / REMINDER_RATE_PER_MINUTE * 60
+                time.sleep(max(0.0, due - time.monotonic()))
+            _send_batch(eligible[start:start + REMINDER_BATCH_SIZE], now, counts, messaging=messaging)
+        return counts
+    finally:
+        if lock_conn is not None:
+            lock_conn.execute(text('SELECT pg_advisory_unlock(:key)'), {'key': RUN_LOCK_KEY})
+            lock_conn.close()
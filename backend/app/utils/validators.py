@@ -3,6 +3,7 @@ Input validation for registration, readings, and profile updates.
 """
 import re
 from datetime import datetime
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
 from email_validator import validate_email, EmailNotValidError
 
 
@@ -112,6 +113,27 @@ def validate_profile_update(data: dict) -> list:
     if data.get('loneliness') not in valid_loneliness:
         errors.append('Invalid loneliness value')
 
+    # Reading reminder preferences
+    if 'reading_reminders_enabled' in data and not isinstance(data['reading_reminders_enabled'], bool):
+        errors.append('reading_reminders_enabled must be true or false')
+
+    tz = data.get('timezone')
+    if tz not in (None, ''):
+        try:
+            ZoneInfo(str(tz))
+        except (ZoneInfoNotFoundError, ValueError):
+            errors.append('Timezone must be an IANA name such as America/Chicago')
+
+    for field in ('quiet_hours_start', 'quiet_hours_end'):
+        hour = data.get(field)
+        if hour is not None:
+            try:
+                h = int(hour)
+                if h < 0 or h > 23:
+                    errors.append(f'{field} must be between 0 and 23')
+            except (ValueError, TypeError):
+                errors.append(f'{field} must be an integer')
+
     return errors
 
 
@@ -0,0 +1,71 @@
+"""
+Throughput comparison of the rate limiter backends.
+Hammers POST /consumer/login through the Flask test client with each backend
+and checks the limit is still enforced. Uses a throwaway SQLite database, so
+it never touches DATABASE_URL.
+Run from backend/: python bench_rate_limiter.py [requests]
+"""
+import sys
+import os
+import base64
+import secrets
+import tempfile
+import time
+sys.path.insert(0, os.path.dirname(__file__))
+
+_tmp = tempfile.mkdtemp(prefix='bench_rate_limiter_')
+os.environ['DATABASE_URL'] = f'sqlite:///{os.path.join(_tmp, "bench.db")}'
+os.environ['FLASK_ENV'] = 'development'
+os.environ.setdefault('SECRET_KEY', secrets.token_hex(32))
+os.environ.setdefault('JWT_SECRET_KEY', secrets.token_hex(32))
+os.environ.setdefault('PHI_ENCRYPTION_KEY', base64.b64encode(secrets.token_bytes(32)).decode())
+os.environ.setdefault('AUDIT_LOG_FILE', os.path.join(_tmp, 'audit.log'))
+
+from app import create_app, db
+from app.utils.rate_limiter import MemoryBackend, SQLiteBackend, DBBackend, login_limiter, set_backend
+
+
+def hammer(client, requests):
+    """Send requests from rotating client IPs so few of them are limited."""
+    start = time.perf_counter()
+    for i in range(requests):
+        client.post('/consumer/login', json={},
+                    environ_base={'REMOTE_ADDR': f'10.{i // 65536 % 256}.{i // 256 % 256}.{i % 256}'})
+    return time.perf_counter() - start
+
+
+def enforced(client):
+    """A single IP gets max_attempts requests through, then 429s."""
+    statuses = [
+        client.post('/consumer/login', json={}, environ_base={'REMOTE_ADDR': '192.0.2.1'}).status_code
+        for _ in range(login_limiter.max_attempts + 2)
+    ]
+    return statuses.count(429) == 2
+
+
+def main():
+    requests = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    app = create_app()
+    with app.app_context():
+        db.create_all()
+        client = app.test_client()
+        backends = [
+            MemoryBackend(),
+            SQLiteBackend(os.path.join(_tmp, 'rate_limits.db')),
+            DBBackend(),
+        ]
+        print(f"POST /consumer/login x {requests}")
+        baseline = None
+        for backend in backends:
+            set_backend(backend)
+            hammer(client, 50)  # warm up
+            elapsed = hammer(client, requests)
+            baseline = baseline or elapsed
+            ok = 'yes' if enforced(client) else 'NO'
+            print(f"  {backend.name:<8} {requests / elapsed:9,.0f} req/s  "
+                  f"{elapsed / baseline:6.2f}x time vs memory  limit enforced: {ok}")
+        set_backend(None)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,108 @@
+"""
+Throughput comparison of SMTP delivery strategies.
+Runs a local SMTP sink (accepts AUTH, discards mail) and sends through
+SMTPBackend three ways: a new session per message (the old behaviour,
+SMTP_POOL_SIZE=0), pooled send() calls, and one send_many() batch. The sink
+waits connect_delay_ms before greeting each new session to stand in for the
+TCP, STARTTLS and AUTH round trips of a real server.
+Run from backend/: python bench_smtp.py [messages] [connect_delay_ms]
+"""
+import sys
+import os
+import socketserver
+import threading
+import time
+sys.path.insert(0, os.path.dirname(__file__))
+
+from app.utils.email_sender import SMTPBackend, SMTPConnectionPool
+
+
+class SinkHandler(socketserver.StreamRequestHandler):
+    """Just enough SMTP for smtplib: EHLO, AUTH, MAIL, RCPT, DATA, NOOP, RSET, QUIT."""
+
+    def reply(self, line):
+        self.wfile.write(line.encode() + b'\r\n')
+
+    def handle(self):
+        time.sleep(self.server.connect_delay)
+        self.reply('220 sink ESMTP')
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            verb = line.split(b' ', 1)[0].strip().upper()
+            if verb == b'EHLO':
+                self.reply('250-sink')
+                self.reply('250 AUTH PLAIN LOGIN')
+            elif verb == b'AUTH':
+                self.reply('235 2.7.0 Authentication successful')
+            elif verb == b'DATA':
+                self.reply('354 End data with <CR><LF>.<CR><LF>')
+                while self.rfile.readline() not in (b'.\r\n', b''):
+                    pass
+                self.server.received += 1
+                self.reply('250 OK')
+            elif verb == b'QUIT':
+                self.reply('221 Bye')
+                return
+            else:
+                self.reply('250 OK')
+
+
+class Sink(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, connect_delay):
+        super().__init__(('127.0.0.1', 0), SinkHandler)
+        self.connect_delay = connect_delay
+        self.received = 0
+
+
+def make_backend(port, pool_size):
+    os.environ.update({'SMTP_HOST': '127.0.0.1', 'SMTP_PORT': str(port), 'SMTP_USER': 'bench',
+                       'SMTP_PASS': 'bench', 'SMTP_USE_TLS': 'false'})
+    backend = SMTPBackend()
+    backend.pool = SMTPConnectionPool(backend._connect, size=pool_size)
+    return backend
+
+
+def main():
+    messages = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    connect_delay_ms = float(sys.argv[2]) if len(sys.argv) > 2 else 20
+    sink = Sink(connect_delay_ms / 1000)
+    threading.Thread(target=sink.serve_forever, daemon=True).start()
+    port = sink.server_address[1]
+    batch = [(f'patient{i}@example.com', 'Reminder', 'Time to check your BP.', None)
+             for i in range(messages)]
+
+    print(f"{messages} messages, {connect_delay_ms:g} ms session setup")
+    runs = [
+        ('new session per message', make_backend(port, 0), False),
+        ('pooled send()', make_backend(port, 4), False),
+        ('send_many()', make_backend(port, 4), True),
+    ]
+    baseline = None
+    for name, backend, many in runs:
+        received = sink.received
+        start = time.perf_counter()
+        if many:
+            failures = backend.send_many(batch)
+        else:
+            failures = []
+            for message in batch:
+                try:
+                    backend.send(*message)
+                except Exception as e:
+                    failures.append((message[0], e))
+        elapsed = time.perf_counter() - start
+        backend.pool.close_all()
+        rate = messages / elapsed
+        baseline = baseline or rate
+        print(f"  {name:<26} {rate:>9.0f} msg/s  ({rate / baseline:.1f}x)  "
+              f"delivered {sink.received - received}, failed {len(failures)}")
+    sink.shutdown()
+
+
+if __name__ == '__main__':
+    main()
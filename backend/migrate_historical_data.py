@@ -34,7 +34,8 @@ sys.path.insert(0, os.path.dirname(__file__))
 
 from app import create_app, db
 from app.models.user import User
-from app.models.reading import BloodPressureReading
+from app.models.reading import BloodPressureReading, reading_dedupe_key
+from app.models.user_reading_stats import UserReadingStats
 from app.models.call_list_item import CallListItem
 from app.models.call_attempt import CallAttempt
 from app.models.union import Union
@@ -716,6 +717,8 @@ def run_migration():
         log.info('\n--- Importing BP readings ---')
         bp_imported = 0
         bp_skipped = 0
+        bp_duplicates = 0
+        seen_readings = set()
 
         for r in bp_readings:
             user = email_to_user.get(r['email'])
@@ -723,12 +726,21 @@ def run_migration():
                 bp_skipped += 1
                 continue
 
+            # Same values in the same minute would violate the unique dedupe key
+            reading_date = r['reading_date'] or datetime.utcnow()
+            dedupe_key = reading_dedupe_key(reading_date, r['systolic'], r['diastolic'])
+            if (r['email'], dedupe_key) in seen_readings:
+                bp_duplicates += 1
+                continue
+            seen_readings.add((r['email'], dedupe_key))
+
             reading = BloodPressureReading(
                 user_id=user.id if not DRY_RUN else 0,
                 systolic=r['systolic'],
                 diastolic=r['diastolic'],
                 heart_rate=r['heart_rate'],
-                reading_date=r['reading_date'] or datetime.utcnow(),
+                reading_date=reading_date,
+                dedupe_key=dedupe_key,
                 created_at=r['created_at'] or datetime.utcnow(),
                 device_id=r['device_id'],
             )
@@ -744,7 +756,9 @@ def run_migration():
 
         if not DRY_RUN:
             db.session.commit()
-        log.info(f'BP readings imported: {bp_imported}, skipped: {bp_skipped}')
+            UserReadingStats.rebuild()
+            db.session.commit()
+        log.info(f'BP readings imported: {bp_imported}, skipped: {bp_skipped}, duplicates: {bp_duplicates}')
 
         # ---------------------------------------------------------------
         # IMPORT CALL RECORDS
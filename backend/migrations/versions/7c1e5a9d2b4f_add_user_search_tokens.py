@@ -0,0 +1,37 @@
+"""add user_search_tokens blind index
+
+Revision ID: 7c1e5a9d2b4f
+Revises: d4e5f6a7b8c9
+Create Date: 2026-03-09 10:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7c1e5a9d2b4f'
+down_revision = 'd4e5f6a7b8c9'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('user_search_tokens',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('field', sa.String(10), nullable=False),
+        sa.Column('token', sa.String(64), nullable=False),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_user_search_tokens_user_id', 'user_search_tokens', ['user_id'])
+    op.create_index('ix_user_search_tokens_token_field', 'user_search_tokens', ['token', 'field'])
+
+    # Existing rows are populated with: flask rebuild-search-index
+
+
+def downgrade():
+    op.drop_index('ix_user_search_tokens_token_field', table_name='user_search_tokens')
+    op.drop_index('ix_user_search_tokens_user_id', table_name='user_search_tokens')
+    op.drop_table('user_search_tokens')
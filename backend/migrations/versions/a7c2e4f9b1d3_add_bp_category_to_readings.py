@@ -0,0 +1,44 @@
+"""add stored bp_category column to blood_pressure_readings
+
+Revision ID: a7c2e4f9b1d3
+Revises: f6b1d3e8a2c4
+Create Date: 2026-03-15 09:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a7c2e4f9b1d3'
+down_revision = 'f6b1d3e8a2c4'
+branch_labels = None
+depends_on = None
+
+# Snapshot of BP_CATEGORY_SQL in app/models/reading.py
+BP_CATEGORY_SQL = (
+    "CASE"
+    " WHEN systolic > 180 OR diastolic > 120 THEN 'Crisis'"
+    " WHEN systolic >= 140 OR diastolic >= 90 THEN 'Stage 2'"
+    " WHEN systolic >= 130 OR diastolic >= 80 THEN 'Stage 1'"
+    " WHEN systolic >= 120 AND diastolic < 80 THEN 'Elevated'"
+    " ELSE 'Normal' END"
+)
+
+
+def upgrade():
+    # Adding a stored generated column computes it for every existing row, so
+    # no separate backfill is needed. SQLite can't add a stored column in
+    # place; batch mode recreates the table there instead.
+    recreate = 'always' if op.get_bind().dialect.name == 'sqlite' else 'auto'
+    with op.batch_alter_table('blood_pressure_readings', schema=None, recreate=recreate) as batch_op:
+        batch_op.add_column(sa.Column('bp_category', sa.String(length=10),
+                                      sa.Computed(BP_CATEGORY_SQL, persisted=True), nullable=True))
+    op.create_index('ix_bp_readings_bp_category_reading_date', 'blood_pressure_readings',
+                    ['bp_category', 'reading_date'])
+
+
+def downgrade():
+    op.drop_index('ix_bp_readings_bp_category_reading_date', table_name='blood_pressure_readings')
+    with op.batch_alter_table('blood_pressure_readings', schema=None) as batch_op:
+        batch_op.drop_column('bp_category')
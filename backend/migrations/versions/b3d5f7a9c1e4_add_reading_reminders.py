@@ -0,0 +1,49 @@
+"""add reading reminder preferences to users and reminder_deliveries table
+
+Revision ID: b3d5f7a9c1e4
+Revises: a7c9e1b3d5f2
+Create Date: 2026-03-21 09:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b3d5f7a9c1e4'
+down_revision = 'a7c9e1b3d5f2'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('users', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('reading_reminders_enabled', sa.Boolean(), nullable=False,
+                                      server_default=sa.true()))
+        batch_op.add_column(sa.Column('timezone', sa.String(length=64), nullable=True))
+        batch_op.add_column(sa.Column('quiet_hours_start', sa.SmallInteger(), nullable=True))
+        batch_op.add_column(sa.Column('quiet_hours_end', sa.SmallInteger(), nullable=True))
+
+    op.create_table('reminder_deliveries',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('campaign', sa.String(length=30), nullable=False),
+        sa.Column('channel', sa.String(length=10), nullable=False),
+        sa.Column('status', sa.String(length=10), nullable=False),
+        sa.Column('detail', sa.String(length=255), nullable=True),
+        sa.Column('sent_at', sa.DateTime(), nullable=False),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id']),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_reminder_deliveries_user_id_sent_at', 'reminder_deliveries',
+                    ['user_id', 'sent_at'])
+
+
+def downgrade():
+    op.drop_index('ix_reminder_deliveries_user_id_sent_at', table_name='reminder_deliveries')
+    op.drop_table('reminder_deliveries')
+    with op.batch_alter_table('users', schema=None) as batch_op:
+        batch_op.drop_column('quiet_hours_end')
+        batch_op.drop_column('quiet_hours_start')
+        batch_op.drop_column('timezone')
+        batch_op.drop_column('reading_reminders_enabled')
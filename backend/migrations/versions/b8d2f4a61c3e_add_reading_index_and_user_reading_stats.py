@@ -0,0 +1,55 @@
+"""add (user_id, reading_date) index and user_reading_stats rollup
+
+Revision ID: b8d2f4a61c3e
+Revises: 7c1e5a9d2b4f
+Create Date: 2026-03-10 09:30:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b8d2f4a61c3e'
+down_revision = '7c1e5a9d2b4f'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index('ix_bp_readings_user_id_reading_date', 'blood_pressure_readings',
+                    ['user_id', 'reading_date'])
+
+    op.create_table('user_reading_stats',
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('reading_count', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('last_reading_date', sa.DateTime(), nullable=True),
+        sa.Column('count_7d', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('sum_systolic_7d', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('sum_diastolic_7d', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('count_30d', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('sum_systolic_30d', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('sum_diastolic_30d', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('windows_valid_until', sa.DateTime(), nullable=True),
+        sa.Column('updated_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id']),
+        sa.PrimaryKeyConstraint('user_id')
+    )
+    op.create_index('ix_user_reading_stats_last_reading_date', 'user_reading_stats', ['last_reading_date'])
+    op.create_index('ix_user_reading_stats_windows_valid_until', 'user_reading_stats', ['windows_valid_until'])
+
+    # Backfill counts and last reading date. The 7/30-day windows are marked
+    # stale (epoch) so they are computed on first use.
+    op.execute("""
+        INSERT INTO user_reading_stats (user_id, reading_count, last_reading_date, windows_valid_until)
+        SELECT user_id, COUNT(id), MAX(reading_date), '1970-01-01 00:00:00'
+        FROM blood_pressure_readings
+        GROUP BY user_id
+    """)
+
+
+def downgrade():
+    op.drop_index('ix_user_reading_stats_windows_valid_until', table_name='user_reading_stats')
+    op.drop_index('ix_user_reading_stats_last_reading_date', table_name='user_reading_stats')
+    op.drop_table('user_reading_stats')
+    op.drop_index('ix_bp_readings_user_id_reading_date', table_name='blood_pressure_readings')
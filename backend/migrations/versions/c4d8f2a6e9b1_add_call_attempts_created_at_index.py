@@ -0,0 +1,23 @@
+"""add (created_at, id) index on call_attempts for keyset pagination
+
+Revision ID: c4d8f2a6e9b1
+Revises: a7c2e4f9b1d3
+Create Date: 2026-03-16 11:00:00.000000
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = 'c4d8f2a6e9b1'
+down_revision = 'a7c2e4f9b1d3'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index('ix_call_attempts_created_at_id', 'call_attempts', ['created_at', 'id'])
+
+
+def downgrade():
+    op.drop_index('ix_call_attempts_created_at_id', table_name='call_attempts')
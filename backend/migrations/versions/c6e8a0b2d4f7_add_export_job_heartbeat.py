@@ -0,0 +1,26 @@
+"""add heartbeat_at to export_jobs
+
+Revision ID: c6e8a0b2d4f7
+Revises: b3d5f7a9c1e4
+Create Date: 2026-03-22 09:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c6e8a0b2d4f7'
+down_revision = 'b3d5f7a9c1e4'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('export_jobs', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('heartbeat_at', sa.DateTime(), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table('export_jobs', schema=None) as batch_op:
+        batch_op.drop_column('heartbeat_at')
@@ -0,0 +1,27 @@
+"""add (user_id, created_at, id) index on blood_pressure_readings for the changes feed
+
+Revision ID: d8f0a2c4e6b9
+Revises: c6e8a0b2d4f7
+Create Date: 2026-03-22 10:00:00.000000
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = 'd8f0a2c4e6b9'
+down_revision = 'c6e8a0b2d4f7'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # The feed pages on (created_at, id); rows from before created_at was
+    # always set would never compare greater than a watermark
+    op.execute('UPDATE blood_pressure_readings SET created_at = reading_date WHERE created_at IS NULL')
+    op.create_index('ix_bp_readings_user_id_created_at_id', 'blood_pressure_readings',
+                    ['user_id', 'created_at', 'id'])
+
+
+def downgrade():
+    op.drop_index('ix_bp_readings_user_id_created_at_id', table_name='blood_pressure_readings')
@@ -0,0 +1,83 @@
+"""add unique (user_id, dedupe_key) idempotency key to blood_pressure_readings
+
+Existing readings get the derived key (UTC minute, systolic, diastolic) and
+rows that collapse onto the same key are removed, keeping the earliest. The
+affected users' rollup rows get their reading_count and last_reading_date
+recomputed here; their 7/30-day windows and call list assignment are marked
+due, so the next refresh (or reading) recomputes them.
+
+Revision ID: d9e3a7b5c1f8
+Revises: c4d8f2a6e9b1
+Create Date: 2026-03-17 10:00:00.000000
+
+"""
+from datetime import datetime
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd9e3a7b5c1f8'
+down_revision = 'c4d8f2a6e9b1'
+branch_labels = None
+depends_on = None
+
+# Snapshot of reading_dedupe_key() in app/models/reading.py
+EPOCH_MINUTE_SQL = {
+    'postgresql': "CAST(floor(extract(epoch FROM reading_date) / 60) AS BIGINT)",
+    'sqlite': "(CAST(strftime('%s', reading_date) AS INTEGER) / 60)",
+}
+
+
+# windows_valid_until / call_list_due_at for rollup rows whose users lost
+# duplicate readings: in the past, so refresh_stale() and the call list's
+# due refresh pick them up
+DUE = datetime(1970, 1, 1)
+
+
+def upgrade():
+    bind = op.get_bind()
+    op.add_column('blood_pressure_readings', sa.Column('dedupe_key', sa.String(length=80), nullable=True))
+
+    minute = EPOCH_MINUTE_SQL[bind.dialect.name]
+    op.execute(
+        "UPDATE blood_pressure_readings SET dedupe_key = "
+        f"'v:' || {minute} || ':' || systolic || ':' || diastolic"
+    )
+    duplicates = (
+        "SELECT {column} FROM ("
+        " SELECT id, user_id, ROW_NUMBER() OVER (PARTITION BY user_id, dedupe_key ORDER BY id) AS rn"
+        " FROM blood_pressure_readings"
+        ") ranked WHERE rn > 1"
+    )
+    # Mark the affected rollup rows before their duplicates disappear
+    bind.execute(
+        sa.text(
+            "UPDATE user_reading_stats SET windows_valid_until = :due, call_list_due_at = :due "
+            f"WHERE user_id IN ({duplicates.format(column='user_id')})"
+        ),
+        {'due': DUE},
+    )
+    op.execute(f"DELETE FROM blood_pressure_readings WHERE id IN ({duplicates.format(column='id')})")
+    bind.execute(
+        sa.text(
+            "UPDATE user_reading_stats SET"
+            " reading_count = (SELECT count(*) FROM blood_pressure_readings r"
+            "  WHERE r.user_id = user_reading_stats.user_id),"
+            " last_reading_date = (SELECT max(r.reading_date) FROM blood_pressure_readings r"
+            "  WHERE r.user_id = user_reading_stats.user_id)"
+            " WHERE windows_valid_until = :due"
+        ),
+        {'due': DUE},
+    )
+
+    with op.batch_alter_table('blood_pressure_readings', schema=None) as batch_op:
+        batch_op.alter_column('dedupe_key', existing_type=sa.String(length=80), nullable=False)
+    op.create_index('uq_bp_readings_user_id_dedupe_key', 'blood_pressure_readings',
+                    ['user_id', 'dedupe_key'], unique=True)
+
+
+def downgrade():
+    op.drop_index('uq_bp_readings_user_id_dedupe_key', table_name='blood_pressure_readings')
+    with op.batch_alter_table('blood_pressure_readings', schema=None) as batch_op:
+        batch_op.drop_column('dedupe_key')
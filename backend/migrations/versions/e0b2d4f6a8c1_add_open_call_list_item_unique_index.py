@@ -0,0 +1,43 @@
+"""add partial unique index on open call_list_items (user_id, list_type)
+
+Users with more than one open item on a list keep the earliest; the others
+are closed (their call reports stay attached).
+
+Revision ID: e0b2d4f6a8c1
+Revises: d8f0a2c4e6b9
+Create Date: 2026-03-24 10:00:00.000000
+
+"""
+from datetime import datetime
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e0b2d4f6a8c1'
+down_revision = 'd8f0a2c4e6b9'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    bind = op.get_bind()
+    bind.execute(
+        sa.text(
+            "UPDATE call_list_items SET status = 'closed', close_reason = 'other',"
+            " close_note = 'Duplicate open item', closed_at = :now, updated_at = :now"
+            " WHERE id IN (SELECT id FROM ("
+            "  SELECT id, ROW_NUMBER() OVER (PARTITION BY user_id, list_type ORDER BY id) AS rn"
+            "  FROM call_list_items WHERE status = 'open'"
+            " ) ranked WHERE rn > 1)"
+        ),
+        {'now': datetime.utcnow()},
+    )
+    op.create_index('uq_call_list_items_open_user_id_list_type', 'call_list_items',
+                    ['user_id', 'list_type'], unique=True,
+                    postgresql_where=sa.text("status = 'open'"),
+                    sqlite_where=sa.text("status = 'open'"))
+
+
+def downgrade():
+    op.drop_index('uq_call_list_items_open_user_id_list_type', table_name='call_list_items')
@@ -0,0 +1,48 @@
+"""add export_jobs table
+
+Revision ID: e3a9c5d7f1b2
+Revises: b8d2f4a61c3e
+Create Date: 2026-03-12 14:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e3a9c5d7f1b2'
+down_revision = 'b8d2f4a61c3e'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('export_jobs',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('kind', sa.String(length=30), nullable=False),
+        sa.Column('params', sa.Text(), nullable=True),
+        sa.Column('status', sa.String(length=10), nullable=False, server_default='queued'),
+        sa.Column('rows_done', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('rows_total', sa.Integer(), nullable=True),
+        sa.Column('artifact_name', sa.String(length=255), nullable=True),
+        sa.Column('download_name', sa.String(length=255), nullable=True),
+        sa.Column('mimetype', sa.String(length=50), nullable=True),
+        sa.Column('size_bytes', sa.Integer(), nullable=True),
+        sa.Column('error', sa.Text(), nullable=True),
+        sa.Column('requested_by', sa.Integer(), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.Column('started_at', sa.DateTime(), nullable=True),
+        sa.Column('finished_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['requested_by'], ['users.id']),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_export_jobs_status', 'export_jobs', ['status'])
+    op.create_index('ix_export_jobs_requested_by', 'export_jobs', ['requested_by'])
+    op.create_index('ix_export_jobs_created_at', 'export_jobs', ['created_at'])
+
+
+def downgrade():
+    op.drop_index('ix_export_jobs_created_at', table_name='export_jobs')
+    op.drop_index('ix_export_jobs_requested_by', table_name='export_jobs')
+    op.drop_index('ix_export_jobs_status', table_name='export_jobs')
+    op.drop_table('export_jobs')
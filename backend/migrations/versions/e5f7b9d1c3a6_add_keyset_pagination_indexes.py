@@ -0,0 +1,27 @@
+"""add (sort key, id) indexes for keyset pagination of user, reading and cuff request lists
+
+Revision ID: e5f7b9d1c3a6
+Revises: d9e3a7b5c1f8
+Create Date: 2026-03-18 09:00:00.000000
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = 'e5f7b9d1c3a6'
+down_revision = 'd9e3a7b5c1f8'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index('ix_users_created_at_id', 'users', ['created_at', 'id'])
+    op.create_index('ix_bp_readings_reading_date_id', 'blood_pressure_readings', ['reading_date', 'id'])
+    op.create_index('ix_cuff_requests_created_at_id', 'cuff_requests', ['created_at', 'id'])
+
+
+def downgrade():
+    op.drop_index('ix_cuff_requests_created_at_id', table_name='cuff_requests')
+    op.drop_index('ix_bp_readings_reading_date_id', table_name='blood_pressure_readings')
+    op.drop_index('ix_users_created_at_id', table_name='users')
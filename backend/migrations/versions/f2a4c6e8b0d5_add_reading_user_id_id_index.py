@@ -0,0 +1,23 @@
+"""add (user_id, id) index on blood_pressure_readings for the consumer changes feed and ETags
+
+Revision ID: f2a4c6e8b0d5
+Revises: e5f7b9d1c3a6
+Create Date: 2026-03-19 09:00:00.000000
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = 'f2a4c6e8b0d5'
+down_revision = 'e5f7b9d1c3a6'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index('ix_bp_readings_user_id_id', 'blood_pressure_readings', ['user_id', 'id'])
+
+
+def downgrade():
+    op.drop_index('ix_bp_readings_user_id_id', table_name='blood_pressure_readings')
@@ -0,0 +1,30 @@
+"""purge blind search index tokens from before per-field trigram keys
+
+The index used to hold 1- and 2-gram tokens under one key for both fields,
+whose frequencies leak letters and bigrams of names and emails. Tokens need
+PHI_ENCRYPTION_KEY to compute, so they are only deleted here: run
+`flask rebuild-search-index` after upgrading to index users again.
+
+Revision ID: f4c6e8a0b2d3
+Revises: e0b2d4f6a8c1
+Create Date: 2026-03-25 10:00:00.000000
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = 'f4c6e8a0b2d3'
+down_revision = 'e0b2d4f6a8c1'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.execute('DELETE FROM user_search_tokens')
+
+
+def downgrade():
+    # The old tokens can't be recreated here; rebuild-search-index on the
+    # older code restores them
+    pass
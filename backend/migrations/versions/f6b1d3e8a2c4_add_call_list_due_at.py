@@ -0,0 +1,30 @@
+"""add user_reading_stats.call_list_due_at for incremental call list refresh
+
+Revision ID: f6b1d3e8a2c4
+Revises: e3a9c5d7f1b2
+Create Date: 2026-03-14 10:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f6b1d3e8a2c4'
+down_revision = 'e3a9c5d7f1b2'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('user_reading_stats', sa.Column('call_list_due_at', sa.DateTime(), nullable=True))
+    op.create_index('ix_user_reading_stats_call_list_due_at', 'user_reading_stats', ['call_list_due_at'])
+
+    # Every existing user is due once so the first refresh evaluates them all;
+    # users without a rollup row are picked up as never evaluated.
+    op.execute("UPDATE user_reading_stats SET call_list_due_at = '1970-01-01 00:00:00'")
+
+
+def downgrade():
+    op.drop_index('ix_user_reading_stats_call_list_due_at', table_name='user_reading_stats')
+    op.drop_column('user_reading_stats', 'call_list_due_at')